@@ -0,0 +1,140 @@
+"""
+Registro de clientes Groq compartidos por todo el proceso.
+
+Construye el cliente una sola vez (lee entorno y descifra la clave solo la
+primera vez), mantiene un pool acotado de conexiones keep-alive y se
+reconstruye automáticamente en procesos hijos (workers de gunicorn tras fork).
+"""
+import os
+import threading
+from typing import Callable, Dict
+
+import httpx
+
+# Tamaño del pool de conexiones HTTPS hacia api.groq.com
+POOL_MAX_CONNECTIONS = int(os.getenv("GROQ_POOL_MAX_CONNECTIONS", "10"))
+POOL_MAX_KEEPALIVE = int(os.getenv("GROQ_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_POOL_KEEPALIVE_EXPIRY", "30"))
+
+
+class ClientRegistry:
+    """Guarda un cliente por nombre y cuenta aciertos/fallos y reutilización de conexiones."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[str, object] = {}
+        self._http_clients: Dict[str, httpx.Client] = {}
+        self._pid = os.getpid()
+        self._seen_streams: Dict[int, int] = {}
+        self._counters = {
+            "client_hits": 0,
+            "client_misses": 0,
+            "requests": 0,
+            "connections_new": 0,
+            "connections_reused": 0,
+        }
+
+    def _on_response(self, response: httpx.Response):
+        """Hook de httpx: detecta si la respuesta llegó por una conexión ya abierta."""
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self._counters["requests"] += 1
+            if stream is None:
+                return
+            key = id(stream)
+            if key in self._seen_streams:
+                self._counters["connections_reused"] += 1
+            else:
+                self._counters["connections_new"] += 1
+                # Mantiene acotado el registro de conexiones vistas
+                if len(self._seen_streams) >= POOL_MAX_CONNECTIONS * 4:
+                    self._seen_streams.clear()
+            self._seen_streams[key] = self._seen_streams.get(key, 0) + 1
+
+    def _make_http_client(self) -> httpx.Client:
+        limits = httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        )
+        return httpx.Client(limits=limits, event_hooks={"response": [self._on_response]})
+
+    def _check_fork(self):
+        """Si cambió el PID (fork), descarta los clientes heredados del padre."""
+        if os.getpid() != self._pid:
+            self.reset()
+
+    def get(self, name: str, factory: Callable[[httpx.Client], object]):
+        """Devuelve el cliente `name`; lo construye con `factory(http_client)` la primera vez."""
+        self._check_fork()
+        client = self._clients.get(name)
+        if client is not None:
+            with self._lock:
+                self._counters["client_hits"] += 1
+            return client
+        with self._lock:
+            client = self._clients.get(name)
+            if client is not None:
+                self._counters["client_hits"] += 1
+                return client
+            http_client = self._make_http_client()
+            try:
+                client = factory(http_client)
+            except Exception:
+                http_client.close()
+                raise
+            self._http_clients[name] = http_client
+            self._clients[name] = client
+            self._counters["client_misses"] += 1
+            return client
+
+    def reset(self):
+        """Olvida todos los clientes (se usa tras fork o para forzar reconstrucción)."""
+        # No se adquiere el lock: tras un fork puede haber quedado tomado por otro hilo del padre
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._http_clients = {}
+        self._seen_streams = {}
+        self._pid = os.getpid()
+
+    def close(self):
+        """Cierra las conexiones abiertas del proceso actual."""
+        with self._lock:
+            for http_client in self._http_clients.values():
+                try:
+                    http_client.close()
+                except Exception:
+                    pass
+            self._clients = {}
+            self._http_clients = {}
+            self._seen_streams = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._counters)
+            data["pid"] = self._pid
+            data["clients"] = sorted(self._clients)
+            data["pool_max_connections"] = POOL_MAX_CONNECTIONS
+            data["pool_max_keepalive"] = POOL_MAX_KEEPALIVE
+            return data
+
+
+_registry = ClientRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_registry.reset)
+
+
+def get_client(name: str, factory: Callable[[httpx.Client], object]):
+    """Cliente compartido del proceso para `name`."""
+    return _registry.get(name, factory)
+
+
+def pool_stats() -> dict:
+    """Contadores de aciertos/fallos del registro y reutilización de conexiones."""
+    return _registry.stats()
+
+
+def close_clients():
+    """Cierra los clientes del proceso (por ejemplo al apagar el servidor)."""
+    _registry.close()
@@ -1,17 +1,19 @@
 import os
-from flask import Flask, request, Response
+from flask import Flask, request, Response, jsonify
 from dotenv import load_dotenv
 from groq import Groq
 from gtts import gTTS
 import tempfile
 
+from groq_pool import get_client, pool_stats
+
 app = Flask(__name__)
 
 load_dotenv()
 
 # Utilidad: cliente Groq
 
-def make_client() -> Groq:
+def make_client(http_client=None) -> Groq:
     api_key = os.getenv("GROQ_API_KEY_ENCRYPTED")
     if api_key:
         try:
@@ -26,7 +28,7 @@ def make_client() -> Groq:
     
     if not api_key:
         raise RuntimeError("Falta GROQ_API_KEY o GROQ_API_KEY_ENCRYPTED en entorno o .env")
-    return Groq(api_key=api_key)
+    return Groq(api_key=api_key, http_client=http_client)
 
 # Modelos de fallback
 CANDIDATE_MODELS = [
@@ -47,7 +49,8 @@ SYSTEM_PROMPT = (
 
 
 def groq_chat(messages: list[dict]) -> str:
-    client = make_client()
+    # Cliente único por proceso (pool keep-alive); solo se construye en la primera llamada
+    client = get_client("groq", make_client)
     last_err = None
     for m in [cm for cm in CANDIDATE_MODELS if cm]:
         try:
@@ -140,6 +143,12 @@ def voice_respond():
     return Response(twiml, mimetype="text/xml")
 
 
+@app.get("/metrics/pool")
+def metrics_pool():
+    # Contadores del registro de clientes: si connections_new no crece por turno, no hay handshakes
+    return jsonify(pool_stats())
+
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "5000"))
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
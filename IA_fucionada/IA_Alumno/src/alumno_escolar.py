@@ -1,11 +1,16 @@
-import pyttsx3
-import speech_recognition as sr
 import time
 import random
-import requests
 import os
+import sys
 from dotenv import load_dotenv
 
+# Entrada de audio compartida con la profesora (IA_Maestro/src)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'IA_Maestro', 'src'))
+from asr import NoSpeechError, SpeechRecognizer
+from audio_input import AudioInput, MicrophoneSource
+from llm_transport import get_transport
+from tts_worker import Persona, Pyttsx3Worker
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -26,8 +31,9 @@ class AlumnoEscolar:
         self.configurar_voz()
         
         # Configurar reconocimiento de voz
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        # Backend de ASR_BACKEND (google por defecto) con su pool de hilos para toda la llamada
+        self.recognizer = SpeechRecognizer()
+        self.entrada = None
         self.configurar_microfono()
         
         # Preguntas escolares apropiadas para primaria/secundaria
@@ -75,48 +81,35 @@ class AlumnoEscolar:
             "¿Cómo funciona la biblioteca de la escuela?"
         ]
 
-    def crear_motor_voz_fresco(self):
-        """Crea un NUEVO motor de voz fresco para cada mensaje"""
+    def configurar_voz(self):
+        """Un solo motor de voz para toda la llamada, en su propio hilo (ver tts_worker.py)"""
+        print("🔊 CONFIGURANDO AUDIO...")
         try:
-            engine = pyttsx3.init()
-            engine.setProperty('rate', 160)
-            engine.setProperty('volume', 1.0)
-            
-            voices = engine.getProperty('voices')
-            for voice in voices:
-                if 'spanish' in voice.name.lower() or 'español' in voice.name.lower():
-                    engine.setProperty('voice', voice.id)
-                    break
-            
-            return engine
+            # Primera voz en español, elegida una sola vez
+            self.voz = Pyttsx3Worker({"alumno": Persona(rate=160, volume=1.0)}).start()
         except Exception as e:
             print(f"❌ Error creando motor de voz: {e}")
-            return None
-
-    def configurar_voz(self):
-        """Configuración inicial de voz"""
-        print("🔊 CONFIGURANDO AUDIO...")
+            self.voz = None
 
     def configurar_microfono(self):
-        """Configura el micrófono"""
+        """Abre el micrófono para toda la llamada; el ruido ambiente se sigue midiendo en segundo plano"""
         try:
             print("🎤 Calibrando micrófono...")
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=2)
+            # whisper.cpp necesita 16 kHz; los demás usan la frecuencia del micrófono
+            fuente = MicrophoneSource(sample_rate=getattr(self.recognizer.backend, "SAMPLE_RATE", None))
+            self.entrada = AudioInput(fuente, calibration_s=2.0).start()
+            self.recognizer.attach(self.entrada)
+            self.entrada.wait_ready()
             print("✅ Micrófono calibrado")
         except Exception as e:
             print(f"Error con el micrófono: {e}")
 
     def hablar(self, texto):
-        """El alumno habla - CREANDO MOTOR NUEVO cada vez"""
+        """El alumno habla con el motor compartido (espera a que termine la frase)"""
         print(f"🎓 Alumno: {texto}")
         
         try:
-            engine = self.crear_motor_voz_fresco()
-            if engine:
-                engine.say(texto)
-                engine.runAndWait()
-                engine.stop()
+            if self.voz and self.voz.speak(texto, "alumno"):
                 print("✅ Audio entregado")
                 return
         except Exception as e:
@@ -125,15 +118,19 @@ class AlumnoEscolar:
     def escuchar_profesor_sin_limites(self):
         """Escucha al profesor SIN LÍMITES"""
         print(f"\n🎤 ESCUCHANDO... Hable cuando guste profesora")
+        if self.entrada is None:
+            print("❌ Micrófono no disponible")
+            return ""
         
         while True:
             try:
-                with self.microphone as source:
-                    self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                    print("🔊 Hable ahora...")
-                    audio = self.recognizer.listen(source)
+                print("🔊 Hable ahora...")
+                frase = self.entrada.listen()
+                if frase is None:
+                    print("❌ El micrófono dejó de entregar audio")
+                    return ""
                 
-                texto = self.recognizer.recognize_google(audio, language='es-ES')
+                texto = self.recognizer.transcribe(frase)
                 print(f"👩‍🏫 Profesora: {texto}")
                 
                 if texto.strip():
@@ -141,7 +138,7 @@ class AlumnoEscolar:
                 else:
                     self.hablar("Le escuché pero no entendí. ¿Podría repetir?")
                     
-            except sr.UnknownValueError:
+            except NoSpeechError:
                 self.hablar("No logré entenderle. ¿Podría repetir más claro?")
             except Exception as e:
                 print(f"❌ Error: {e}")
@@ -150,13 +147,6 @@ class AlumnoEscolar:
     def llamar_groq_api(self, mensaje):
         """Llama a la API de Groq"""
         try:
-            url = "https://api.groq.com/openai/v1/chat/completions"
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
             data = {
                 "messages": [{"role": "user", "content": mensaje}],
                 "model": "llama-3.1-8b-instant",
@@ -164,7 +154,8 @@ class AlumnoEscolar:
                 "max_tokens": 150
             }
             
-            response = requests.post(url, headers=headers, json=data, timeout=15)
+            # Cliente compartido del proceso: la conexión a Groq se reutiliza entre turnos
+            response = get_transport(self.api_key).post_chat(data, read_timeout=15)
             
             if response.status_code == 200:
                 result = response.json()
@@ -262,6 +253,22 @@ class AlumnoEscolar:
         except KeyboardInterrupt:
             self.hablar("¡Muchas gracias por su ayuda profesora García!")
             print("\n🎓 Llamada terminada")
+            self.reportar_microfono()
+
+    def reportar_microfono(self):
+        """Muestra cuánto silencio muerto se evitó al no recalibrar en cada escucha, y las métricas de voz"""
+        if self.voz is not None:
+            tts = self.voz.stats()
+            print(f"🔊 Voz: {tts['spoken']} frases, espera en cola p95 {tts['queue_wait']['p95_ms']} ms, "
+                  f"habla media {tts['speak']['mean_ms']} ms")
+            self.voz.stop()
+        self.recognizer.close()
+        if self.entrada is None:
+            return
+        stats = self.entrada.stats()
+        self.entrada.stop()
+        print(f"⏱️ Silencio muerto evitado: {stats['dead_air_saved_s']}s en {stats['turns']} escuchas "
+              f"({stats['dead_air_saved_per_turn_s']}s por turno)")
 
 # Ejecución directa
 if __name__ == "__main__":
@@ -1,8 +1,14 @@
 import pyttsx3
-import speech_recognition as sr
 import time
 import random
 import re
+import os
+import sys
+
+# Entrada de audio compartida con la profesora (IA_Maestro/src)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'IA_Maestro', 'src'))
+from asr import NoSpeechError, SpeechRecognizer
+from audio_input import AudioInput, MicrophoneSource
 
 class AlumnoExigente:
     def __init__(self):
@@ -14,8 +20,9 @@ class AlumnoExigente:
         self.configurar_voz()
         
         # Configurar reconocimiento de voz
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        # Backend de ASR_BACKEND (google por defecto) con su pool de hilos para toda la clase
+        self.recognizer = SpeechRecognizer()
+        self.entrada = None
         self.configurar_microfono()
         
         # Preguntas específicas con respuestas esperadas
@@ -81,11 +88,14 @@ class AlumnoExigente:
             print(f"⚠️  Error configurando voz: {e}")
 
     def configurar_microfono(self):
-        """Configura el micrófono"""
+        """Abre el micrófono para toda la clase; el ruido ambiente se sigue midiendo en segundo plano"""
         try:
             print("🎤 Calibrando micrófono...")
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
+            # whisper.cpp necesita 16 kHz; los demás usan la frecuencia del micrófono
+            fuente = MicrophoneSource(sample_rate=getattr(self.recognizer.backend, "SAMPLE_RATE", None))
+            self.entrada = AudioInput(fuente, calibration_s=1.0).start()
+            self.recognizer.attach(self.entrada)
+            self.entrada.wait_ready()
             print("✅ Micrófono calibrado")
         except Exception as e:
             print(f"❌ Error con el micrófono: {e}")
@@ -102,20 +112,21 @@ class AlumnoExigente:
     def escuchar_profesor(self, tiempo_maximo=8):
         """Escucha la respuesta del profesor"""
         print(f"\n🎤 Escuchando al profesor... ({tiempo_maximo}s)")
+        if self.entrada is None:
+            print("❌ Micrófono no disponible")
+            return ""
         
         try:
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                audio = self.recognizer.listen(source, timeout=tiempo_maximo, phrase_time_limit=tiempo_maximo)
+            frase = self.entrada.listen(timeout=tiempo_maximo, phrase_time_limit=tiempo_maximo)
+            if frase is None:
+                print("⏰ Tiempo de escucha agotado")
+                return ""
             
-            texto = self.recognizer.recognize_google(audio, language='es-ES')
+            texto = self.recognizer.transcribe(frase)
             print(f"👨‍🏫 Profesor: {texto}")
             return texto.lower()
             
-        except sr.WaitTimeoutError:
-            print("⏰ Tiempo de escucha agotado")
-            return ""
-        except sr.UnknownValueError:
+        except NoSpeechError:
             print("❌ No se pudo entender la respuesta")
             return ""
         except Exception as e:
@@ -269,6 +280,7 @@ class AlumnoExigente:
                 self.sintetizar_voz(mensaje)
             
             self.sintetizar_voz("¡Gracias por participar en el examen!")
+            self.reportar_microfono()
 
     def iniciar_modo_practica(self):
         """Modo práctica con preguntas continuas"""
@@ -293,6 +305,17 @@ class AlumnoExigente:
                 
         except KeyboardInterrupt:
             print("\n👋 Modo práctica terminado")
+            self.reportar_microfono()
+
+    def reportar_microfono(self):
+        """Muestra cuánto silencio muerto se evitó al no recalibrar en cada escucha"""
+        self.recognizer.close()
+        if self.entrada is None:
+            return
+        stats = self.entrada.stats()
+        self.entrada.stop()
+        print(f"⏱️ Silencio muerto evitado: {stats['dead_air_saved_s']}s en {stats['turns']} escuchas "
+              f"({stats['dead_air_saved_per_turn_s']}s por turno)")
 
 def main():
     print("🤖 ALUMNO EXIGENTE - EVALUADOR DE PROFESORES")
@@ -0,0 +1,336 @@
+"""
+Reconocimiento de voz intercambiable: Google (en línea), Vosk o whisper.cpp (locales, en CPU).
+
+Antes cada escucha llamaba a recognize_google(): un viaje de red por frase, sin
+resultados parciales, y profesor_llamada.py además creaba un ThreadPoolExecutor
+por turno. SpeechRecognizer mantiene un solo pool de hilos para toda la llamada y,
+con un backend de streaming (Vosk), se engancha a audio_input.AudioInput: el
+audio de cada frase se decodifica mientras llega, los parciales se reportan con
+on_partial y al terminar la frase el texto final está listo casi de inmediato,
+así el LLM puede empezar justo en el fin de la voz.
+
+Backend con ASR_BACKEND=google|vosk|whisper (por defecto google):
+
+- vosk:    pip install vosk. VOSK_MODEL_PATH apunta a un modelo descomprimido;
+           sin él, Vosk descarga el modelo pequeño de español.
+- whisper: pip install pywhispercpp numpy. WHISPER_MODEL (tiny, base, small...).
+           Sin parciales: transcribe la frase completa; necesita audio a 16 kHz.
+
+Comparación de WER y latencia con WAV de prueba: python -m bench.asr --fixtures DIR
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from lazy_import import lazy_import
+
+sr = lazy_import("speech_recognition")
+vosk = lazy_import("vosk")
+numpy = lazy_import("numpy")
+
+ASR_BACKEND = os.getenv("ASR_BACKEND", "google").lower()
+
+
+class RecognitionError(Exception):
+    """El servicio o el motor de reconocimiento falló."""
+
+
+class NoSpeechError(RecognitionError):
+    """Había audio pero no se entendió ninguna palabra."""
+
+
+class _BufferedSession:
+    """Sesión de un backend sin streaming: junta el audio y transcribe al final."""
+
+    def __init__(self, backend, sample_rate: int, sample_width: int):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self._chunks = []
+
+    def feed(self, data: bytes) -> Optional[str]:
+        self._chunks.append(data)
+        return None
+
+    def finish(self) -> str:
+        return self.backend.transcribe(b"".join(self._chunks), self.sample_rate, self.sample_width)
+
+
+class GoogleBackend:
+    """recognize_google() de speech_recognition: necesita red, sin parciales."""
+
+    name = "google"
+    streaming = False
+
+    def __init__(self, language: str = "es-ES"):
+        self.language = language
+        self._recognizer = None
+
+    def warm(self):
+        self._recognizer = self._recognizer or sr.Recognizer()
+
+    def session(self, sample_rate: int, sample_width: int) -> _BufferedSession:
+        return _BufferedSession(self, sample_rate, sample_width)
+
+    def transcribe(self, frame_data: bytes, sample_rate: int, sample_width: int) -> str:
+        self.warm()
+        try:
+            return self._recognizer.recognize_google(sr.AudioData(frame_data, sample_rate, sample_width),
+                                                     language=self.language)
+        except sr.UnknownValueError:
+            raise NoSpeechError() from None
+        except sr.RequestError as e:
+            raise RecognitionError(str(e)) from e
+
+
+class _VoskSession:
+    def __init__(self, model, sample_rate: int, sample_width: int):
+        if sample_width != 2:
+            raise ValueError("Vosk necesita PCM de 16 bits")
+        self._rec = vosk.KaldiRecognizer(model, sample_rate)
+        self._parts = []
+        self._partial = ""
+
+    def feed(self, data: bytes) -> Optional[str]:
+        if self._rec.AcceptWaveform(data):
+            # Vosk detectó una pausa dentro de la frase: ese tramo ya es definitivo
+            text = json.loads(self._rec.Result()).get("text", "")
+            if text:
+                self._parts.append(text)
+            partial = ""
+        else:
+            partial = json.loads(self._rec.PartialResult()).get("partial", "")
+        text = " ".join(self._parts + ([partial] if partial else []))
+        if text == self._partial:
+            return None
+        self._partial = text
+        return text
+
+    def finish(self) -> str:
+        text = json.loads(self._rec.FinalResult()).get("text", "")
+        return " ".join(self._parts + ([text] if text else []))
+
+
+class VoskBackend:
+    """Vosk (Kaldi) en CPU: decodifica mientras llega el audio y da parciales."""
+
+    name = "vosk"
+    streaming = True
+
+    def __init__(self, model_path: Optional[str] = None, lang: str = "es"):
+        self.model_path = model_path or os.getenv("VOSK_MODEL_PATH")
+        self.lang = lang
+        self._model = None
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """Carga el modelo (segundos la primera vez); se hace una sola vez por proceso."""
+        with self._lock:
+            if self._model is None:
+                vosk.SetLogLevel(-1)
+                self._model = vosk.Model(self.model_path) if self.model_path else vosk.Model(lang=self.lang)
+
+    def session(self, sample_rate: int, sample_width: int) -> _VoskSession:
+        self.warm()
+        return _VoskSession(self._model, sample_rate, sample_width)
+
+    def transcribe(self, frame_data: bytes, sample_rate: int, sample_width: int) -> str:
+        session = self.session(sample_rate, sample_width)
+        session.feed(frame_data)
+        return session.finish()
+
+
+class WhisperCppBackend:
+    """whisper.cpp (pywhispercpp) en CPU: más preciso que Vosk, pero transcribe la frase completa."""
+
+    name = "whisper"
+    streaming = False
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model: Optional[str] = None, language: str = "es", threads: Optional[int] = None):
+        self.model = model or os.getenv("WHISPER_MODEL", "base")
+        self.language = language
+        self.threads = threads or max(1, (os.cpu_count() or 2) - 1)
+        self._model = None
+        self._lock = threading.Lock()
+
+    def warm(self):
+        with self._lock:
+            if self._model is None:
+                from pywhispercpp.model import Model
+                self._model = Model(self.model, n_threads=self.threads, language=self.language,
+                                    print_progress=False, print_realtime=False)
+
+    def session(self, sample_rate: int, sample_width: int) -> _BufferedSession:
+        return _BufferedSession(self, sample_rate, sample_width)
+
+    def transcribe(self, frame_data: bytes, sample_rate: int, sample_width: int) -> str:
+        if sample_rate != self.SAMPLE_RATE or sample_width != 2:
+            raise ValueError(f"whisper.cpp necesita PCM de 16 bits a {self.SAMPLE_RATE} Hz "
+                             f"(abre el micrófono con MicrophoneSource(sample_rate={self.SAMPLE_RATE}))")
+        self.warm()
+        samples = numpy.frombuffer(frame_data, dtype="<i2").astype(numpy.float32) / 32768.0
+        with self._lock:
+            segments = self._model.transcribe(samples)
+        return " ".join(s.text.strip() for s in segments).strip()
+
+
+BACKENDS = {"google": GoogleBackend, "vosk": VoskBackend, "whisper": WhisperCppBackend}
+
+
+def make_backend(name: Optional[str] = None, **kwargs):
+    name = (name or ASR_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"ASR_BACKEND desconocido: {name} (opciones: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
+
+
+class SpeechRecognizer:
+    """Backend de ASR + un pool de hilos para toda la llamada.
+
+    Con attach(entrada) y un backend de streaming, cada frase se decodifica mientras
+    se captura (un solo hilo en orden) y transcribe() solo espera el final.
+    """
+
+    def __init__(self, backend=None, workers: int = 2, on_partial: Optional[Callable[[str], None]] = None):
+        self.backend = backend or make_backend()
+        self.on_partial = on_partial
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asr")
+        # Las sesiones de streaming necesitan el audio en orden: un solo hilo
+        self._stream = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr-stream") \
+            if self.backend.streaming else None
+        self._session = None
+        self._lock = threading.Lock()
+        self._stats = {"phrases": 0, "streamed": 0, "partials": 0, "errors": 0, "final_wait_s": 0.0}
+
+    def warm(self) -> Future:
+        """Carga el backend (modelo local o cliente) en el pool sin bloquear."""
+        return self._pool.submit(self.backend.warm)
+
+    # -- streaming desde AudioInput (se llama desde el hilo de captura) --
+
+    def attach(self, entrada) -> "SpeechRecognizer":
+        if self._stream is not None:
+            entrada.listener = self
+        return self
+
+    def phrase_started(self, frames, sample_rate: int, sample_width: int):
+        self._stream.submit(self._start_session, b"".join(frames), sample_rate, sample_width)
+
+    def phrase_audio(self, data: bytes):
+        self._stream.submit(self._feed, data)
+
+    def phrase_ended(self, phrase):
+        """phrase=None: la frase se descartó (muy corta); si no, su texto final queda en phrase.transcript."""
+        if phrase is None:
+            self._stream.submit(self._discard_session)
+        else:
+            phrase.transcript = self._stream.submit(self._finish_session)
+
+    def _discard_session(self):
+        self._session = None
+
+    def _start_session(self, data: bytes, sample_rate: int, sample_width: int):
+        try:
+            self._session = self.backend.session(sample_rate, sample_width)
+        except Exception as e:
+            self._session = e
+            return
+        self._feed(data)
+
+    def _feed(self, data: bytes):
+        session = self._session
+        if session is None or isinstance(session, Exception):
+            return
+        partial = session.feed(data)
+        if partial:
+            with self._lock:
+                self._stats["partials"] += 1
+            if self.on_partial is not None:
+                self.on_partial(partial)
+
+    def _finish_session(self) -> str:
+        session, self._session = self._session, None
+        if isinstance(session, Exception):
+            raise RecognitionError(str(session)) from session
+        if session is None:
+            raise NoSpeechError()
+        return session.finish()
+
+    # -- consumo --
+
+    def transcribe(self, phrase, timeout: Optional[float] = 10) -> str:
+        """Texto de una audio_input.Phrase. Lanza NoSpeechError o RecognitionError."""
+        future: Optional[Future] = getattr(phrase, "transcript", None)
+        with self._lock:
+            self._stats["phrases"] += 1
+            self._stats["streamed"] += future is not None
+        if future is None:
+            future = self._pool.submit(self.backend.transcribe, phrase.frame_data, phrase.sample_rate,
+                                       phrase.sample_width)
+        waited = time.perf_counter()
+        try:
+            text = future.result(timeout=timeout).strip()
+        except RecognitionError:
+            self._count_error()
+            raise
+        except Exception as e:
+            self._count_error()
+            raise RecognitionError(f"{type(e).__name__}: {e}") from e
+        finally:
+            with self._lock:
+                self._stats["final_wait_s"] += time.perf_counter() - waited
+        if not text:
+            raise NoSpeechError()
+        return text
+
+    def _count_error(self):
+        with self._lock:
+            self._stats["errors"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        phrases = stats["phrases"]
+        stats["backend"] = self.backend.name
+        stats["final_wait_ms"] = round(stats.pop("final_wait_s") / phrases * 1000, 1) if phrases else None
+        return stats
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.shutdown(wait=False)
+        self._pool.shutdown(wait=False)
+
+
+def main():
+    import argparse
+    import wave
+
+    parser = argparse.ArgumentParser(description="Transcribe un WAV mono de 16 bits con el backend elegido")
+    parser.add_argument("wav")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=ASR_BACKEND)
+    args = parser.parse_args()
+
+    with wave.open(args.wav, "rb") as f:
+        rate, width, data = f.getframerate(), f.getsampwidth(), f.readframes(f.getnframes())
+    backend = make_backend(args.backend)
+    start = time.perf_counter()
+    session = backend.session(rate, width)
+    step = rate * width // 10
+    for i in range(0, len(data), step):
+        partial = session.feed(data[i:i + step])
+        if partial:
+            print(f"   … {partial}")
+    try:
+        text = session.finish()
+    except NoSpeechError:
+        text = ""
+    print(f"📝 {text}")
+    print(f"⏱️ {time.perf_counter() - start:.2f}s para {len(data) / (rate * width):.2f}s de audio")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+"""
+Entrada de audio compartida: micrófono siempre abierto, umbral de ruido continuo y frases en una cola.
+
+Antes cada escucha hacía adjust_for_ambient_noise(source, duration=0.5): medio
+segundo de silencio muerto por turno, durante el cual lo que dijera el otro se
+perdía. AudioInput abre el stream una sola vez y un hilo de fondo:
+
+- ajusta el umbral de energía con los fragmentos sin voz (la misma fórmula que
+  speech_recognition usa con dynamic_energy_threshold),
+- detecta el inicio y el fin de cada frase por energía (pause_threshold) y
+- deja las frases en una cola; listen() solo espera la siguiente.
+
+Dúplex completo: mientras suena la profesora el código de reproducción se
+envuelve en `with entrada.playback(on_barge_in=detener):`. Lo que empieza a
+sonar durante la reproducción es eco y se descarta, salvo que sea voz clara
+(energía sobre barge_in_ratio × el nivel del eco durante barge_in_min_s): entonces se
+llama a `detener` una vez desde el hilo de captura (corta mixer/pyttsx3) y la
+frase del alumno se conserva desde su inicio, lista para el reconocedor.
+
+Fuentes: MicrophoneSource (PyAudio vía speech_recognition) y WavFileSource, que
+lee un WAV mono de 16 bits para probar sin micrófono:
+
+    python audio_input.py grabacion.wav
+    python audio_input.py --demo          # WAV sintético: ruido de fondo y tres frases
+"""
+import argparse
+import array
+import math
+import queue
+import sys
+import threading
+import time
+import wave
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from lazy_import import lazy_import
+
+sr = lazy_import("speech_recognition")
+
+# Lo que costaba cada escucha antes: adjust_for_ambient_noise(source, duration=0.5)
+LEGACY_CALIBRATION_S = 0.5
+
+_EOF = object()
+_TYPECODES = {2: "h", 4: "i"}
+
+
+def rms(frame: bytes, sample_width: int) -> float:
+    """Energía RMS de un fragmento PCM con signo (16 o 32 bits)."""
+    typecode = _TYPECODES.get(sample_width)
+    if typecode is None:
+        raise ValueError(f"Ancho de muestra no soportado: {sample_width} bytes")
+    samples = array.array(typecode)
+    samples.frombytes(frame[:len(frame) - len(frame) % sample_width])
+    if not samples:
+        return 0.0
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class MicrophoneSource:
+    """Micrófono de speech_recognition (PyAudio), abierto durante toda la llamada."""
+
+    realtime = True
+
+    def __init__(self, device_index: Optional[int] = None, sample_rate: Optional[int] = None,
+                 chunk_size: int = 1024):
+        self._mic = sr.Microphone(device_index=device_index, sample_rate=sample_rate, chunk_size=chunk_size)
+        self.sample_rate = 0
+        self.sample_width = 0
+        self.chunk = chunk_size
+
+    def open(self):
+        self._mic.__enter__()
+        self.sample_rate = self._mic.SAMPLE_RATE
+        self.sample_width = self._mic.SAMPLE_WIDTH
+        self.chunk = self._mic.CHUNK
+
+    def read(self) -> bytes:
+        return self._mic.stream.read(self.chunk)
+
+    def close(self):
+        self._mic.__exit__(None, None, None)
+
+
+class WavFileSource:
+    """Lee un WAV mono como si fuera el micrófono (realtime=True respeta el ritmo real)."""
+
+    def __init__(self, path: str, chunk_size: int = 1024, realtime: bool = False):
+        self.path = path
+        self.chunk = chunk_size
+        self.realtime = realtime
+        self.sample_rate = 0
+        self.sample_width = 0
+        self._wav = None
+        self._frames_read = 0
+        self._started = 0.0
+
+    def open(self):
+        self._wav = wave.open(self.path, "rb")
+        if self._wav.getnchannels() != 1:
+            self._wav.close()
+            raise ValueError(f"{self.path}: solo se admiten WAV mono")
+        self.sample_rate = self._wav.getframerate()
+        self.sample_width = self._wav.getsampwidth()
+        self._frames_read = 0
+        self._started = time.perf_counter()
+
+    def read(self) -> bytes:
+        data = self._wav.readframes(self.chunk)
+        if data and self.realtime:
+            self._frames_read += len(data) // self.sample_width
+            delay = self._started + self._frames_read / self.sample_rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return data
+
+    def close(self):
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+
+class Phrase:
+    """Una frase detectada: PCM crudo y su posición (segundos de audio desde que se abrió la fuente)."""
+
+    __slots__ = ("frame_data", "sample_rate", "sample_width", "start_s", "end_s", "energy_threshold", "transcript")
+
+    def __init__(self, frame_data: bytes, sample_rate: int, sample_width: int,
+                 start_s: float, end_s: float, energy_threshold: float):
+        self.frame_data = frame_data
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.start_s = start_s
+        self.end_s = end_s
+        self.energy_threshold = energy_threshold
+        # Future con el texto si un reconocedor de streaming la decodificó mientras llegaba (ver asr.py)
+        self.transcript = None
+
+    @property
+    def duration_s(self) -> float:
+        return self.end_s - self.start_s
+
+    def audio_data(self):
+        """sr.AudioData para recognize_google() y demás reconocedores."""
+        return sr.AudioData(self.frame_data, self.sample_rate, self.sample_width)
+
+
+class AudioInput:
+    """Mantiene la fuente abierta y entrega frases completas desde una cola."""
+
+    def __init__(self, source, energy_threshold: float = 300.0, dynamic_energy_threshold: bool = True,
+                 damping: float = 0.15, ratio: float = 1.5, pause_threshold: float = 0.8,
+                 phrase_threshold: float = 0.3, non_speaking_duration: float = 0.5,
+                 phrase_time_limit: Optional[float] = None, calibration_s: float = 1.0,
+                 drop_stale: Optional[bool] = None, max_queue: int = 16,
+                 barge_in_ratio: float = 3.0, barge_in_min_s: float = 0.25):
+        self.source = source
+        self.energy_threshold = energy_threshold
+        self.dynamic_energy_threshold = dynamic_energy_threshold
+        self.damping = damping
+        self.ratio = ratio
+        self.pause_threshold = pause_threshold
+        self.phrase_threshold = phrase_threshold
+        self.non_speaking_duration = non_speaking_duration
+        self.phrase_time_limit = phrase_time_limit
+        # Límite de listen(phrase_time_limit=...) solo mientras dura esa escucha
+        self._listen_limit: Optional[float] = None
+        self.calibration_s = calibration_s
+        # Voz del alumno encima de la reproducción: más fuerte que el eco y sostenida
+        self.barge_in_ratio = barge_in_ratio
+        self.barge_in_min_s = barge_in_min_s
+        # Con micrófono, una frase que terminó antes de llamar a listen() suele ser el eco
+        # de nuestra propia voz: se descarta. Un WAV leído a máxima velocidad no tiene "antes".
+        self.drop_stale = getattr(source, "realtime", True) if drop_stale is None else drop_stale
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.position_s = 0.0
+        self.noise_floor = 0.0
+        self.in_phrase = False
+        self.error: Optional[BaseException] = None
+        self._playing = False
+        self._on_barge_in: Optional[Callable[[], None]] = None
+        self._barged = False
+        # Oyente opcional que recibe el audio de cada frase mientras se captura (asr.SpeechRecognizer)
+        self.listener = None
+        self._stats = {"turns": 0, "phrases": 0, "stale_dropped": 0, "queue_dropped": 0,
+                       "ready_wait_s": 0.0, "dead_air_saved_s": 0.0,
+                       "echo_dropped": 0, "barge_ins": 0, "barge_in_detect_s": 0.0}
+
+    # -- ciclo de vida --
+
+    def start(self) -> "AudioInput":
+        self.source.open()
+        self._thread = threading.Thread(target=self._run, name="audio-input", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.source.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Espera la calibración inicial (calibration_s de audio)."""
+        return self._ready.wait(timeout)
+
+    # -- reproducción (dúplex) --
+
+    @contextmanager
+    def playback(self, on_barge_in: Optional[Callable[[], None]] = None):
+        """Marca que está sonando nuestra voz.
+
+        Las frases que empiezan dentro del bloque se tratan como eco. Si se pasa
+        on_barge_in, la voz clara del alumno lo dispara una sola vez por bloque
+        (desde el hilo de captura) y esa frase sí llega a listen().
+        """
+        self._barged = False
+        self._on_barge_in = on_barge_in
+        self._playing = True
+        try:
+            yield self
+        finally:
+            self._playing = False
+            self._on_barge_in = None
+
+    @property
+    def barged_in(self) -> bool:
+        """True si el alumno interrumpió la última reproducción."""
+        return self._barged
+
+    def _barge_in(self, loud_s: float):
+        self._barged = True
+        with self._lock:
+            self._stats["barge_ins"] += 1
+            self._stats["barge_in_detect_s"] += loud_s
+        callback = self._on_barge_in
+        if callback is not None:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Error deteniendo la reproducción: {e}")
+
+    # -- hilo de captura --
+
+    def _adapt(self, energy: float, seconds: float):
+        # Misma actualización que speech_recognition (adjust_for_ambient_noise / listen dinámico)
+        damping = self.damping ** seconds
+        self.energy_threshold = self.energy_threshold * damping + energy * self.ratio * (1 - damping)
+        self.noise_floor = energy if not self.noise_floor else self.noise_floor * damping + energy * (1 - damping)
+
+    def _run(self):
+        source = self.source
+        try:
+            spb = source.chunk / source.sample_rate
+            pause_chunks = math.ceil(self.pause_threshold / spb)
+            phrase_chunks = math.ceil(self.phrase_threshold / spb)
+            trailing_chunks = math.ceil(self.non_speaking_duration / spb)
+            preroll = deque(maxlen=trailing_chunks)
+            barge_chunks = max(1, math.ceil(self.barge_in_min_s / spb))
+            # Contexto que se conserva antes de la voz cuando la frase se recorta en un barge-in
+            context_chunks = min(trailing_chunks, 2)
+            frames = None
+            # Al empezar cada reproducción se mide el eco (su pico) antes de buscar voz encima
+            echo_warmup = 2 * barge_chunks
+            speech = pause = loud = played = 0
+            start_s = echo_level = 0.0
+            echo_damping = self.damping ** spb
+            echo = was_playing = False
+            while not self._stop.is_set():
+                data = source.read()
+                if not data:
+                    break
+                energy = rms(data, source.sample_width)
+                self.position_s += spb
+                if not self._ready.is_set():
+                    self._adapt(energy, spb)
+                    if self.position_s >= self.calibration_s:
+                        self._ready.set()
+                    continue
+                playing = self._playing
+                if was_playing and not playing and frames is not None and echo:
+                    # Terminó la reproducción a mitad de un "eco": lo último vuelve al preroll
+                    if speech >= phrase_chunks:
+                        with self._lock:
+                            self._stats["echo_dropped"] += 1
+                    preroll.extend(frames[-trailing_chunks:])
+                    frames = None
+                    self.in_phrase = False
+                was_playing = playing
+                if frames is None:
+                    if energy > self.energy_threshold:
+                        frames = list(preroll) + [data]
+                        preroll.clear()
+                        start_s = self.position_s - len(frames) * spb
+                        speech, pause = 1, 0
+                        echo = playing
+                        self.in_phrase = True
+                        if not echo:
+                            self._notify("phrase_started", frames, source.sample_rate, source.sample_width)
+                    else:
+                        preroll.append(data)
+                        # Con la bocina sonando el ruido medido no es el ambiente
+                        if self.dynamic_energy_threshold and not playing:
+                            self._adapt(energy, spb)
+                else:
+                    frames.append(data)
+                    if not echo:
+                        self._notify("phrase_audio", data)
+                    if energy > self.energy_threshold:
+                        speech += 1
+                        pause = 0
+                    else:
+                        pause += 1
+                if not playing:
+                    loud = played = 0
+                    echo_level = 0.0
+                elif played < echo_warmup:
+                    played += 1
+                    echo_level = max(echo_level, energy)
+                elif energy > max(self.energy_threshold, echo_level) * self.barge_in_ratio:
+                    loud += 1
+                else:
+                    # Nivel del eco de la bocina; la voz fuerte no lo sube
+                    loud = 0
+                    echo_level = echo_level * echo_damping + energy * (1 - echo_damping)
+                if echo and loud >= barge_chunks and not self._barged and self._on_barge_in is not None:
+                    # La frase del alumno empieza donde empezó la voz fuerte, sin el eco anterior
+                    keep = min(len(frames), loud + context_chunks)
+                    frames = frames[-keep:]
+                    start_s = self.position_s - keep * spb
+                    speech, pause, echo = loud, 0, False
+                    self._barge_in(loud * spb)
+                    self._notify("phrase_started", frames, source.sample_rate, source.sample_width)
+                if frames is None:
+                    continue
+                limit = self._listen_limit or self.phrase_time_limit
+                if pause >= pause_chunks or (limit and len(frames) * spb >= limit):
+                    self._finish(frames, speech, pause, phrase_chunks, trailing_chunks, start_s, spb, echo)
+                    frames = None
+                    self.in_phrase = False
+            if frames is not None:
+                self._finish(frames, speech, pause, phrase_chunks, trailing_chunks, start_s, spb, echo)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.in_phrase = False
+            self._ready.set()
+            self._put(_EOF)
+
+    def _finish(self, frames, speech, pause, phrase_chunks, trailing_chunks, start_s, spb, echo=False):
+        if echo:
+            if speech >= phrase_chunks:
+                with self._lock:
+                    self._stats["echo_dropped"] += 1
+            return
+        if speech < phrase_chunks:
+            self._notify("phrase_ended", None)
+            return  # un golpe o un clic, no una frase
+        # Igual que speech_recognition: se conserva solo non_speaking_duration de silencio final
+        keep = len(frames) - max(0, pause - trailing_chunks)
+        phrase = Phrase(b"".join(frames[:keep]), self.source.sample_rate, self.source.sample_width,
+                        start_s, start_s + keep * spb, self.energy_threshold)
+        with self._lock:
+            self._stats["phrases"] += 1
+        self._notify("phrase_ended", phrase)
+        self._put(phrase)
+
+    def _notify(self, event: str, *args):
+        listener = self.listener
+        if listener is None:
+            return
+        try:
+            getattr(listener, event)(*args)
+        except Exception as e:
+            print(f"⚠️ Error en el oyente de audio ({event}): {e}")
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Nadie está escuchando: se descarta la frase más vieja
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                self._stats["queue_dropped"] += 1
+            self._queue.put_nowait(item)
+
+    # -- consumo --
+
+    def listen(self, timeout: Optional[float] = None, phrase_time_limit: Optional[float] = None) -> Optional[Phrase]:
+        """Siguiente frase. None si nadie empieza a hablar en `timeout` segundos o se acabó la fuente.
+
+        Como en Recognizer.listen(), el timeout cuenta hasta que empieza la voz: una frase
+        ya empezada se espera hasta que termine (o hasta phrase_time_limit).
+        """
+        called = time.perf_counter()
+        # No cambia self.phrase_time_limit: la escucha siguiente vuelve al límite configurado
+        self._listen_limit = phrase_time_limit
+        try:
+            return self._next_phrase(called, timeout)
+        finally:
+            self._listen_limit = None
+
+    def _next_phrase(self, called: float, timeout: Optional[float]) -> Optional[Phrase]:
+        ready_wait = 0.0
+        if not self._ready.is_set():
+            self._ready.wait(timeout)
+            ready_wait = time.perf_counter() - called
+        cutoff = self.position_s if self.drop_stale else None
+        deadline = None if timeout is None else called + timeout
+        while True:
+            try:
+                item = self._queue.get(timeout=0.05)
+            except queue.Empty:
+                if deadline is not None and time.perf_counter() >= deadline and not self.in_phrase:
+                    self._record_turn(ready_wait)
+                    return None
+                continue
+            if item is _EOF:
+                self._queue.put(_EOF)
+                return None
+            if cutoff is not None and item.end_s < cutoff:
+                with self._lock:
+                    self._stats["stale_dropped"] += 1
+                continue
+            self._record_turn(ready_wait)
+            return item
+
+    def _record_turn(self, ready_wait: float):
+        # Antes cada escucha empezaba con LEGACY_CALIBRATION_S de calibración; ahora solo se
+        # espera si la calibración inicial de fondo todavía no terminó
+        with self._lock:
+            self._stats["turns"] += 1
+            self._stats["ready_wait_s"] += ready_wait
+            self._stats["dead_air_saved_s"] += max(0.0, LEGACY_CALIBRATION_S - ready_wait)
+
+    def clear(self):
+        """Descarta las frases pendientes."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is _EOF:
+                self._queue.put(_EOF)
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        turns = stats["turns"]
+        stats["dead_air_saved_s"] = round(stats["dead_air_saved_s"], 3)
+        stats["ready_wait_s"] = round(stats["ready_wait_s"], 3)
+        stats["dead_air_saved_per_turn_s"] = round(stats["dead_air_saved_s"] / turns, 3) if turns else 0.0
+        detect_s = stats.pop("barge_in_detect_s")
+        stats["barge_in_detect_ms"] = round(detect_s / stats["barge_ins"] * 1000, 1) if stats["barge_ins"] else None
+        stats["energy_threshold"] = round(self.energy_threshold, 1)
+        stats["noise_floor"] = round(self.noise_floor, 1)
+        return stats
+
+
+def write_demo_wav(path: str, sample_rate: int = 16000, seed: int = 3):
+    """WAV sintético: 1.5 s de ruido y tres "frases" (tonos) separadas por silencios con ruido."""
+    import random
+
+    rnd = random.Random(seed)
+    samples = array.array("h")
+
+    def noise(seconds: float, amplitude: int = 120):
+        samples.extend(rnd.randint(-amplitude, amplitude) for _ in range(int(seconds * sample_rate)))
+
+    def tone(seconds: float, freq: float, amplitude: int = 6000):
+        n = int(seconds * sample_rate)
+        samples.extend(int(amplitude * math.sin(2 * math.pi * freq * i / sample_rate)) + rnd.randint(-120, 120)
+                       for i in range(n))
+
+    noise(1.5)
+    for seconds, freq in ((1.2, 220), (0.8, 330), (2.0, 180)):
+        tone(seconds, freq)
+        noise(1.2)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecta frases en un WAV con la misma lógica que el micrófono")
+    parser.add_argument("wav", nargs="?", help="WAV mono de 16 bits")
+    parser.add_argument("--demo", action="store_true", help="Usa un WAV sintético con tres frases")
+    parser.add_argument("--realtime", action="store_true", help="Lee el archivo al ritmo real del audio")
+    args = parser.parse_args()
+
+    path = args.wav
+    if args.demo or not path:
+        import tempfile
+        path = tempfile.mkstemp(suffix=".wav")[1]
+        write_demo_wav(path)
+    with AudioInput(WavFileSource(path, realtime=args.realtime)) as audio:
+        while True:
+            phrase = audio.listen(timeout=5)
+            if phrase is None:
+                break
+            print(f"🗣️ frase {phrase.start_s:6.2f}s → {phrase.end_s:6.2f}s  ({phrase.duration_s:.2f}s, "
+                  f"umbral {phrase.energy_threshold:.0f})")
+        stats = audio.stats()
+    print(f"📊 {stats}")
+    print(f"⏱️ Silencio muerto evitado: {stats['dead_air_saved_per_turn_s']}s por turno "
+          f"({stats['dead_air_saved_s']}s en {stats['turns']} escuchas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Registro de llamadas para la página page_2 de main.py (esquema talkia).
+
+Lista sesiones_llamada de la más reciente a la más antigua con paginación por
+cursor (keyset): cada página pide "las 50 anteriores a (iniciada_en, sesion_id)"
+en lugar de LIMIT/OFFSET, así la página 1000 cuesta lo mismo que la primera. Los
+filtros usan índices:
+
+- alumno (alumno_id o external_id): ix_sesiones_alumno_iniciada (alumno_id, iniciada_en)
+- fechas: ix_sesiones_iniciada_en, o el mismo índice compuesto si hay alumno
+- tema: EXISTS sobre los turnos de cada sesión (ix_turnos_sesion_id)
+
+Los totales (COUNT) recorren todo lo que coincide con el filtro: se guardan en
+memoria CALL_LOG_COUNT_TTL_S segundos por combinación de filtros.
+
+Cada hilo reusa su conexión, pero cierra la transacción después de cada lectura:
+en MySQL (REPEATABLE READ) una transacción abierta seguiría viendo la foto de la
+primera consulta y nunca las llamadas nuevas. Si la conexión se cayó (p. ej.
+wait_timeout), la petición falla y la siguiente abre otra.
+
+    python call_log.py --url sqlite:///talkia.db
+    python call_log.py --url sqlite:///talkia.db --alumno alumno-17 --tema examen
+"""
+import argparse
+import base64
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from turn_store import TALKIA_DB_URL, connect
+
+CALL_LOG_PAGE_SIZE = int(os.getenv("CALL_LOG_PAGE_SIZE", "50"))
+CALL_LOG_COUNT_TTL_S = float(os.getenv("CALL_LOG_COUNT_TTL_S", "60"))
+
+_SESSION_COLUMNS = ("sesion_id", "alumno_id", "external_id", "nombre", "maestro_id", "iniciada_en",
+                    "finalizada_en")
+_TURN_COLUMNS = ("turno_id", "rol_emisor", "transcripcion", "tema", "duracion_audio", "modelo_ia_usado",
+                 "tokenes_consumidos", "fecha_turno")
+
+
+def encode_cursor(iniciada_en, sesion_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{iniciada_en}|{sesion_id}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[tuple]:
+    """(iniciada_en, sesion_id) de un cursor; None si falta o no es válido (se vuelve a la primera página)."""
+    if not token:
+        return None
+    try:
+        iniciada_en, sesion_id = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8").split("|", 1)
+    except ValueError:
+        return None
+    return iniciada_en, sesion_id
+
+
+def _date(value: Optional[str]) -> Optional[str]:
+    # AAAA-MM-DD o nada: un filtro mal escrito se ignora en lugar de romper la página
+    try:
+        return datetime.date.fromisoformat(value.strip()).isoformat() if value and value.strip() else None
+    except ValueError:
+        return None
+
+
+def _text(value) -> str:
+    # SQLite devuelve texto, MySQL datetime
+    return "" if value is None else str(value)
+
+
+class CountCache:
+    """Totales por clave durante `ttl` segundos (LRU acotado); seguro entre hilos."""
+
+    def __init__(self, ttl: float = CALL_LOG_COUNT_TTL_S, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, compute) -> tuple:
+        """(valor, segundos desde que se calculó); calcula con compute() si no está o venció."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], now - entry[1]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value, 0.0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CallLog:
+    """Consultas del registro de llamadas; una conexión por hilo (el servidor de web.py usa hilos)."""
+
+    def __init__(self, url: Optional[str] = TALKIA_DB_URL, page_size: int = CALL_LOG_PAGE_SIZE,
+                 count_ttl: float = CALL_LOG_COUNT_TTL_S):
+        self.url = url
+        self.page_size = page_size
+        self.counts = CountCache(count_ttl)
+        self._local = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    def _db(self):
+        if getattr(self._local, "db", None) is None:
+            self._local.db, self._local.ph = connect(self.url)
+        return self._local.db, self._local.ph
+
+    def _read(self, work):
+        """work(cur, ph) con la conexión del hilo; termina la transacción para que la próxima lectura vea datos nuevos."""
+        db, ph = self._db()
+        try:
+            return work(db.cursor(), ph)
+        except (db.OperationalError, db.InterfaceError):
+            # Conexión caída o cerrada por el servidor: la próxima petición se reconecta
+            self.close()
+            raise
+        finally:
+            if getattr(self._local, "db", None) is db:
+                try:
+                    db.rollback()
+                except (db.OperationalError, db.InterfaceError):
+                    self.close()
+
+    def _student_id(self, cur, ph: str, alumno: str) -> Optional[int]:
+        if alumno.isdigit():
+            return int(alumno)
+        cur.execute(f"SELECT alumno_id FROM alumnos WHERE external_id = {ph}", (alumno,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def _filters(self, cur, ph: str, desde, hasta, tema, alumno):
+        """(condiciones, parámetros, clave para la caché de totales); condiciones None = no hay resultados."""
+        where, params = [], []
+        alumno_id = None
+        if alumno:
+            alumno_id = self._student_id(cur, ph, alumno.strip())
+            if alumno_id is None:
+                return None, [], None
+            where.append(f"s.alumno_id = {ph}")
+            params.append(alumno_id)
+        desde, hasta = _date(desde), _date(hasta)
+        if desde:
+            where.append(f"s.iniciada_en >= {ph}")
+            params.append(desde)
+        if hasta:
+            # Fecha "hasta" inclusiva: todo lo anterior al día siguiente
+            where.append(f"s.iniciada_en < {ph}")
+            params.append((datetime.date.fromisoformat(hasta) + datetime.timedelta(days=1)).isoformat())
+        tema = (tema or "").strip() or None
+        if tema:
+            where.append(f"EXISTS (SELECT 1 FROM turnos_conversacion t WHERE t.sesion_id = s.sesion_id "
+                         f"AND t.tema = {ph})")
+            params.append(tema)
+        return where, params, (alumno_id, desde, hasta, tema)
+
+    def sessions(self, desde: Optional[str] = None, hasta: Optional[str] = None, tema: Optional[str] = None,
+                 alumno: Optional[str] = None, cursor: Optional[str] = None, limit: Optional[int] = None,
+                 with_total: bool = True) -> dict:
+        """Una página de sesiones (de la más reciente a la más antigua), con turnos, tokens y temas de cada una.
+
+        `siguiente` es el cursor de la página que sigue (None en la última).
+        """
+        limit = limit or self.page_size
+        start = time.perf_counter()
+        page = self._read(lambda cur, ph: self._page(cur, ph, desde, hasta, tema, alumno, cursor, limit, with_total))
+        page["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return page
+
+    def _page(self, cur, ph: str, desde, hasta, tema, alumno, cursor, limit: int, with_total: bool) -> dict:
+        where, params, count_key = self._filters(cur, ph, desde, hasta, tema, alumno)
+        page = {"sesiones": [], "siguiente": None, "total": 0, "total_hace_s": 0.0}
+        if where is None:
+            return page
+
+        after = decode_cursor(cursor)
+        page_where = list(where)
+        page_params = list(params)
+        if after:
+            # Keyset: solo las sesiones anteriores a la última mostrada; el índice llega directo
+            page_where.append(f"(s.iniciada_en, s.sesion_id) < ({ph}, {ph})")
+            page_params.extend(after)
+        sql = (f"SELECT s.sesion_id, s.alumno_id, a.external_id, a.nombre, s.maestro_id, s.iniciada_en, "
+               f"s.finalizada_en FROM sesiones_llamada s LEFT JOIN alumnos a ON a.alumno_id = s.alumno_id"
+               f"{' WHERE ' + ' AND '.join(page_where) if page_where else ''} "
+               f"ORDER BY s.iniciada_en DESC, s.sesion_id DESC LIMIT {int(limit) + 1}")
+        cur.execute(sql, page_params)
+        rows = cur.fetchall()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            page["siguiente"] = encode_cursor(rows[-1][5], rows[-1][0])
+        sessions = [dict(zip(_SESSION_COLUMNS, row)) for row in rows]
+
+        if sessions:
+            # Resumen de turnos solo de las sesiones de esta página (ix_turnos_sesion_id)
+            ids = [s["sesion_id"] for s in sessions]
+            cur.execute(f"SELECT sesion_id, COUNT(*), COALESCE(SUM(tokenes_consumidos), 0), "
+                        f"GROUP_CONCAT(DISTINCT tema) FROM turnos_conversacion "
+                        f"WHERE sesion_id IN ({', '.join([ph] * len(ids))}) GROUP BY sesion_id", ids)
+            totals = {row[0]: row[1:] for row in cur.fetchall()}
+            for s in sessions:
+                turns, tokens, topics = totals.get(s["sesion_id"], (0, 0, None))
+                s["turnos"] = turns
+                s["tokens"] = tokens
+                s["temas"] = ", ".join(sorted(topics.split(","))) if topics else ""
+                s["iniciada_en"] = _text(s["iniciada_en"])
+                s["finalizada_en"] = _text(s["finalizada_en"])
+        page["sesiones"] = sessions
+
+        if with_total:
+            def count():
+                cur.execute(f"SELECT COUNT(*) FROM sesiones_llamada s"
+                            f"{' WHERE ' + ' AND '.join(where) if where else ''}", params)
+                return cur.fetchone()[0]
+
+            page["total"], page["total_hace_s"] = self.counts.get(count_key, count)
+        return page
+
+    def turns(self, sesion_id: str, after: Optional[str] = None, limit: Optional[int] = None) -> dict:
+        """Turnos de una sesión en orden, paginados por turno_id (`siguiente` = turno_id para la página que sigue)."""
+        limit = limit or self.page_size
+        after_id = int(after) if after and str(after).isdigit() else 0
+
+        def fetch(cur, ph):
+            cur.execute(f"SELECT {', '.join(_TURN_COLUMNS)} FROM turnos_conversacion "
+                        f"WHERE sesion_id = {ph} AND turno_id > {ph} ORDER BY turno_id LIMIT {int(limit) + 1}",
+                        (sesion_id, after_id))
+            return cur.fetchall()
+
+        rows = self._read(fetch)
+        following = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            following = str(rows[-1][0])
+        turns = [dict(zip(_TURN_COLUMNS, row)) for row in rows]
+        for t in turns:
+            t["fecha_turno"] = _text(t["fecha_turno"])
+        return {"sesion_id": sesion_id, "turnos": turns, "siguiente": following}
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            self._local.db = None
+            try:
+                db.close()
+            except Exception:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Muestra una página del registro de llamadas")
+    parser.add_argument("--url", default=TALKIA_DB_URL, help="Base (por defecto TALKIA_DB_URL)")
+    parser.add_argument("--desde", default=None, metavar="AAAA-MM-DD")
+    parser.add_argument("--hasta", default=None, metavar="AAAA-MM-DD")
+    parser.add_argument("--tema", default=None)
+    parser.add_argument("--alumno", default=None, help="alumno_id o external_id")
+    parser.add_argument("--cursor", default=None)
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("falta TALKIA_DB_URL o --url")
+
+    log = CallLog(args.url)
+    page = log.sessions(args.desde, args.hasta, args.tema, args.alumno, args.cursor)
+    for s in page["sesiones"]:
+        print(f"📞 {s['iniciada_en']}  {s['sesion_id']}  alumno {s['external_id'] or s['alumno_id'] or '-'}  "
+              f"{s['turnos']} turnos, {s['tokens']} tokens  {s['temas']}")
+    print(f"📄 {len(page['sesiones'])} de {page['total']} sesiones en {page['ms']} ms")
+    if page["siguiente"]:
+        print(f"➡️ Siguiente página: --cursor {page['siguiente']}")
+    log.close()
+
+
+if __name__ == "__main__":
+    main()
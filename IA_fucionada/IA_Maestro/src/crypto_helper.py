@@ -1,50 +1,167 @@
 """
 Utilidad para cifrar/descifrar claves de API de forma segura.
 Usa XOR simple con clave aleatoria persistente.
+
+La clave maestra vive en IA_Maestro/.cipher_key (o en CIPHER_KEY_PATH) y se lee
+una sola vez por proceso, sin depender del directorio actual.
 """
-import os
 import base64
+import os
+import pathlib
+import threading
+from typing import Dict, Iterable, List, Optional, Union
 
+PathLike = Union[str, os.PathLike]
 
-def get_or_create_key() -> bytes:
-    """Obtiene o crea la clave de cifrado maestra (32 bytes aleatorios)."""
-    key_file = ".cipher_key"
-    if os.path.exists(key_file):
-        with open(key_file, "rb") as f:
-            return f.read()
-    else:
-        import secrets
-        key = secrets.token_bytes(32)
-        with open(key_file, "wb") as f:
-            f.write(key)
-        print(f"[Clave de cifrado creada en {key_file}. ¡NO LA COMPARTAS!]")
+KEY_FILENAME = ".cipher_key"
+# IA_Maestro/.cipher_key, junto al .env
+DEFAULT_KEY_PATH = pathlib.Path(__file__).resolve().parent.parent / KEY_FILENAME
+
+_key_cache: Dict[str, bytes] = {}
+_key_lock = threading.Lock()
+
+
+def default_key_path() -> pathlib.Path:
+    """CIPHER_KEY_PATH si está definida; si no, IA_Maestro/.cipher_key.
+
+    Por compatibilidad, si esa no existe pero hay una .cipher_key en el directorio
+    actual (como antes, al ejecutar desde IA_Maestro), se usa esa.
+    """
+    env_path = os.getenv("CIPHER_KEY_PATH")
+    if env_path:
+        return pathlib.Path(env_path)
+    if not DEFAULT_KEY_PATH.exists() and pathlib.Path(KEY_FILENAME).exists():
+        return pathlib.Path(KEY_FILENAME).resolve()
+    return DEFAULT_KEY_PATH
+
+
+def load_key(key_path: Optional[PathLike] = None, create: bool = False) -> bytes:
+    """Clave maestra, leída del disco solo la primera vez (segura entre hilos)."""
+    # Camino rápido: la ruta tal como llega ("" = ruta por defecto), sin tocar el disco
+    cache_key = os.fspath(key_path) if key_path else ""
+    key = _key_cache.get(cache_key)
+    if key is not None:
         return key
+    path = pathlib.Path(key_path) if key_path else default_key_path()
+    with _key_lock:
+        key = _key_cache.get(cache_key)
+        if key is not None:
+            return key
+        if not path.exists():
+            if not create:
+                raise FileNotFoundError(f"No existe la clave de cifrado {path}")
+            _create_key(path)
+        with open(path, "rb") as f:
+            key = f.read()
+        if not key:
+            raise ValueError(f"La clave de cifrado {path} está vacía")
+        _key_cache[cache_key] = key
+        return key
+
+
+def _create_key(path: pathlib.Path):
+    import secrets
+    try:
+        # O_EXCL: si otro proceso la creó primero, se usa la suya
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return
+    with os.fdopen(fd, "wb") as f:
+        f.write(secrets.token_bytes(32))
+    print(f"[Clave de cifrado creada en {path}. ¡NO LA COMPARTAS!]")
+
+
+def clear_key_cache():
+    """Olvida las claves leídas (p. ej. después de rotar .cipher_key)."""
+    with _key_lock:
+        _key_cache.clear()
+
+
+def get_or_create_key(key_path: Optional[PathLike] = None) -> bytes:
+    """Obtiene o crea la clave de cifrado maestra (32 bytes aleatorios)."""
+    return load_key(key_path, create=True)
 
 
 def xor_bytes(data: bytes, key: bytes) -> bytes:
-    """XOR de bytes con clave (repite clave si es necesario)."""
-    return bytes(a ^ key[i % len(key)] for i, a in enumerate(data))
+    """XOR de bytes con clave (repite clave si es necesario).
+
+    Se hace como una sola operación entre enteros grandes en lugar de byte a byte.
+    """
+    n = len(data)
+    if not n:
+        return b""
+    keystream = (key * (n // len(key) + 1))[:n]
+    return (int.from_bytes(data, "little") ^ int.from_bytes(keystream, "little")).to_bytes(n, "little")
 
 
-def encrypt_api_key(plain_key: str) -> str:
+def encrypt_api_key(plain_key: str, key_path: Optional[PathLike] = None) -> str:
     """Cifra una API key."""
-    cipher_key = get_or_create_key()
+    cipher_key = get_or_create_key(key_path)
     encrypted = xor_bytes(plain_key.encode(), cipher_key)
     return base64.b64encode(encrypted).decode()
 
 
-def decrypt_api_key(encrypted_key: str) -> str:
+def decrypt_api_key(encrypted_key: str, key_path: Optional[PathLike] = None) -> str:
     """Descifra una API key."""
-    cipher_key = get_or_create_key()
+    cipher_key = load_key(key_path)
     encrypted = base64.b64decode(encrypted_key.encode())
     decrypted = xor_bytes(encrypted, cipher_key)
     return decrypted.decode()
 
 
+def decrypt_api_keys(encrypted_keys: Iterable[str], key_path: Optional[PathLike] = None) -> List[str]:
+    """Descifra varias claves con una sola lectura de la clave maestra."""
+    cipher_key = load_key(key_path)
+    return [xor_bytes(base64.b64decode(e.encode()), cipher_key).decode() for e in encrypted_keys]
+
+
+def _benchmark(iterations: int = 20000):
+    """Costo por llamada de decrypt_api_key antes (XOR byte a byte + abrir archivo) y ahora."""
+    import tempfile
+    import time
+
+    def legacy_decrypt(encrypted_key: str) -> str:
+        with open(KEY_FILENAME, "rb") as f:
+            cipher_key = f.read()
+        encrypted = base64.b64decode(encrypted_key.encode())
+        return bytes(a ^ cipher_key[i % len(cipher_key)] for i, a in enumerate(encrypted)).decode()
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            key_path = pathlib.Path(tmp) / KEY_FILENAME
+            secret = "gsk_" + "x" * 52
+            encrypted = encrypt_api_key(secret, key_path)
+            batch = [encrypted] * 100
+            rows = [
+                ("anterior", lambda: legacy_decrypt(encrypted), 1),
+                ("actual", lambda: decrypt_api_key(encrypted, key_path), 1),
+                ("actual, lote de 100", lambda: decrypt_api_keys(batch, key_path)[0], len(batch)),
+            ]
+            for name, fn, keys_per_call in rows:
+                assert fn() == secret
+                calls = max(1, iterations // keys_per_call)
+                start = time.perf_counter()
+                for _ in range(calls):
+                    fn()
+                per_key = (time.perf_counter() - start) / (calls * keys_per_call)
+                print(f"{name:<20} {per_key * 1e6:8.2f} µs por clave")
+            big = os.urandom(1 << 20)
+            for name, fn in (("XOR 1 MiB anterior", lambda: bytes(a ^ big[i % 32] for i, a in enumerate(big))),
+                             ("XOR 1 MiB actual", lambda: xor_bytes(big, big[:32]))):
+                start = time.perf_counter()
+                fn()
+                print(f"{name:<20} {(time.perf_counter() - start) * 1000:8.2f} ms")
+        finally:
+            os.chdir(original_dir)
+            clear_key_cache()
+
+
 if __name__ == "__main__":
     # Script de ayuda para cifrar tu clave
     import sys
-    
+
     if len(sys.argv) > 1:
         if sys.argv[1] == "--encrypt":
             plain = input("Ingresa la API key a cifrar: ").strip()
@@ -59,7 +176,10 @@ if __name__ == "__main__":
                 print(f"\nClave descifrada:\n{plain}")
             except Exception as e:
                 print(f"Error al descifrar: {e}")
+        elif sys.argv[1] == "--bench":
+            _benchmark()
     else:
         print("Uso:")
         print("  python src/crypto_helper.py --encrypt  # Cifrar una clave")
         print("  python src/crypto_helper.py --decrypt  # Descifrar una clave")
+        print("  python src/crypto_helper.py --bench    # Costo por llamada antes/después")
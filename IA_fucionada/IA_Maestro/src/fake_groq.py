@@ -0,0 +1,288 @@
+"""
+Servidor local que imita la API de Groq (compatible con OpenAI) para pruebas.
+
+Permite marcar modelos como retirados o saturados para ejercitar el fallback
+del ModelRouter sin gastar cuota ni depender de la red, y simular latencia con
+variación (jitter) y una fracción de respuestas 429. Con --tpm además lleva
+una cuota de tokens por minuto como la real: cada respuesta trae los
+encabezados x-ratelimit-* y, si la cuota no alcanza, 429 con retry-after:
+
+    python src/fake_groq.py --port 8099 --fail-model llama-3.3-70b-versatile=404
+    python src/fake_groq.py --port 8099 --latency 0.4 --jitter 0.2 --rate-429 0.1
+    python src/fake_groq.py --port 8099 --tpm 6000
+
+y luego apuntar el cliente con GROQ_BASE_URL=http://127.0.0.1:8099
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+DEFAULT_REPLY = "Claro, con gusto te ayudo con tu tarea. ¿Qué parte no entendiste?"
+
+# Cuota diaria de peticiones que anuncia Groq en el plan gratuito
+REQUESTS_PER_DAY = 14400
+
+ERROR_MESSAGES = {
+    400: "The model `{model}` has been decommissioned and is no longer supported.",
+    404: "The model `{model}` does not exist or you do not have access to it.",
+    429: "Rate limit reached for model `{model}`. Please try again later.",
+    500: "Internal server error.",
+    503: "Service unavailable.",
+}
+
+# Códigos que manda Groq en {"error": {"code": ...}}; el router los usa para detectar modelos retirados
+ERROR_CODES = {
+    400: "model_decommissioned",
+    404: "model_not_found",
+}
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # Cola de conexiones amplia para pruebas de carga con cientos de llamadas simultáneas
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class FakeGroqServer:
+    """Servidor HTTP en un hilo; se usa como context manager."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, reply: str = DEFAULT_REPLY,
+                 failing_models: Optional[Dict[str, int]] = None, latency: float = 0.0,
+                 token_delay: float = 0.0, jitter: float = 0.0, rate_429: float = 0.0,
+                 retry_after: Optional[float] = None, seed: Optional[int] = None, tpm: Optional[float] = None,
+                 unique_replies: bool = False):
+        self.reply = reply
+        # Numera cada respuesta: textos distintos, sin aciertos en la caché de voz
+        self.unique_replies = unique_replies
+        self.failing_models = dict(failing_models or {})
+        self.latency = latency
+        self.token_delay = token_delay
+        # Cada respuesta tarda latency + uniforme(0, jitter); rate_429 es la fracción de peticiones limitadas
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self.calls = Counter()
+        self.rate_limited = 0
+        # Cuota de tokens por minuto (None: sin cuota ni encabezados x-ratelimit-*)
+        self.tpm = tpm
+        self._tokens = tpm or 0.0
+        self._tokens_at = time.monotonic()
+        self._requests_left = REQUESTS_PER_DAY
+        self._lock = threading.Lock()
+        self._httpd = _HTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    data = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    data = {}
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                server.handle_completion(self, data)
+
+        return Handler
+
+    def _charge(self, data: dict) -> (bool, dict):
+        """Descuenta la petición de la cuota por minuto (prompt estimado + max_tokens), como Groq.
+
+        Devuelve (admitida, encabezados x-ratelimit-*). Se llama con el lock tomado.
+        """
+        if not self.tpm:
+            return True, {}
+        now = time.monotonic()
+        refill = self.tpm / 60.0
+        self._tokens = min(self.tpm, self._tokens + (now - self._tokens_at) * refill)
+        self._tokens_at = now
+        prompt = sum(len(str(m.get("content", ""))) for m in data.get("messages", [])) // 4
+        cost = prompt + int(data.get("max_tokens") or 1024)
+        admitted = self._tokens >= cost
+        if admitted:
+            self._tokens -= cost
+            self._requests_left = max(0, self._requests_left - 1)
+        headers = {
+            "x-ratelimit-limit-requests": str(REQUESTS_PER_DAY),
+            "x-ratelimit-remaining-requests": str(self._requests_left),
+            "x-ratelimit-reset-requests": "2m52.8s",
+            "x-ratelimit-limit-tokens": str(int(self.tpm)),
+            "x-ratelimit-remaining-tokens": str(max(0, int(self._tokens))),
+            "x-ratelimit-reset-tokens": f"{(self.tpm - self._tokens) / refill:.2f}s",
+        }
+        if not admitted:
+            headers["retry-after"] = str(max(1, math.ceil((cost - self._tokens) / refill)))
+        return admitted, headers
+
+    def handle_completion(self, handler, data: dict):
+        model = data.get("model", "")
+        with self._lock:
+            self.calls[model] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            limited = bool(self.rate_429) and self._random.random() < self.rate_429
+            admitted, quota_headers = self._charge(data) if not limited else (True, {})
+            if limited or not admitted:
+                self.rate_limited += 1
+            reply = f"{self.reply} Respuesta {sum(self.calls.values())}." if self.unique_replies else self.reply
+        if not admitted:
+            # La cuota se rechaza al instante, sin latencia de generación
+            msg = ERROR_MESSAGES[429].format(model=model)
+            handler._send_json(429, {"error": {"message": msg, "type": "tokens"}}, quota_headers)
+            return
+        if delay:
+            time.sleep(delay)
+        if limited:
+            msg = ERROR_MESSAGES[429].format(model=model)
+            headers = {"retry-after": str(self.retry_after)} if self.retry_after is not None else None
+            handler._send_json(429, {"error": {"message": msg, "type": "rate_limit_exceeded"}}, headers)
+            return
+        status = self.failing_models.get(model)
+        if status:
+            msg = ERROR_MESSAGES.get(status, "error").format(model=model)
+            error = {"message": msg, "type": "invalid_request_error"}
+            if status in ERROR_CODES:
+                error["code"] = ERROR_CODES[status]
+            handler._send_json(status, {"error": error})
+            return
+        if data.get("stream"):
+            self._send_stream(handler, model, reply, quota_headers)
+            return
+        handler._send_json(200, completion_payload(model, reply), quota_headers)
+
+    def _send_stream(self, handler, model: str, content: str, headers: Optional[dict] = None):
+        """Respuesta SSE palabra por palabra, como `stream=True` en la API real."""
+        handler.send_response(200)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Type", "text/event-stream")
+        # Chunked como la API real: la conexión sigue viva para la petición siguiente
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def write(data: bytes):
+            handler.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            handler.wfile.flush()
+
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            token = word if i == 0 else " " + word
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            write(f"data: {json.dumps(chunk)}\n\n".encode())
+            if self.token_delay:
+                time.sleep(self.token_delay)
+        # Como Groq: el último fragmento trae el uso de tokens en x_groq
+        final = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "x_groq": {"usage": completion_payload(model, content)["usage"]},
+        }
+        write(f"data: {json.dumps(final)}\n\n".encode())
+        write(b"data: [DONE]\n\n")
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def completion_payload(model: str, content: str) -> dict:
+    prompt_tokens = 20
+    completion_tokens = max(1, len(content.split()))
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _parse_failures(items) -> Dict[str, int]:
+    failures = {}
+    for item in items or []:
+        model, _, status = item.partition("=")
+        failures[model] = int(status or 404)
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor falso de Groq para pruebas locales")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de espera por respuesta")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Segundos entre tokens en modo stream")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Segundos extra aleatorios (0..jitter) por respuesta")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fracción de peticiones que responden 429")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla para jitter y 429 reproducibles")
+    parser.add_argument("--tpm", type=float, default=None, help="Cuota de tokens por minuto (con encabezados x-ratelimit-*)")
+    parser.add_argument("--fail-model", action="append", help="modelo=status (p. ej. llama-3.3-70b-versatile=404)")
+    args = parser.parse_args()
+
+    fake = FakeGroqServer(port=args.port, failing_models=_parse_failures(args.fail_model),
+                          latency=args.latency, token_delay=args.token_delay,
+                          jitter=args.jitter, rate_429=args.rate_429, seed=args.seed, tpm=args.tpm)
+    print(f"Fake Groq escuchando en {fake.base_url} (Ctrl+C para salir)")
+    try:
+        fake.start()._thread.join()
+    except KeyboardInterrupt:
+        fake.stop()
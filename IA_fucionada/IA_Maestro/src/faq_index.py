@@ -0,0 +1,396 @@
+"""
+Índice invertido en memoria de las preguntas de los alumnos (page_3, "Preguntas frecuentes").
+
+Cada pregunta se analiza en términos: minúsculas sin acentos (topic_filter.fold),
+sin palabras vacías y con un stemmer ligero de español que quita plurales y la
+vocal final ("exámenes", "examen" → "examen"; "tareas", "tarea" → "tare"). La
+palabra interrogativa inicial se conserva como término propio ("?cuando"), así
+"¿cuándo es el examen?" y "¿qué entra en el examen?" no se mezclan.
+
+Las preguntas con los mismos términos, o con términos muy parecidos (Jaccard >=
+FAQ_CLUSTER_SIMILARITY), forman un grupo. La página muestra los grupos más
+frecuentes con el texto más repetido de cada uno. El índice (término → grupos)
+se actualiza con cada pregunta nueva, sin reconstruirse, y las búsquedas lo
+recorren empezando por el término más raro. Los grupos se mantienen además
+ordenados por frecuencia (cada pregunta mueve su grupo un lugar dentro de la
+lista, O(1)): el top de la página es un corte de esa lista y las búsquedas de
+palabras muy comunes la recorren en orden hasta juntar los resultados.
+
+No usa el full-text de la base de datos. Con TALKIA_DB_URL, refresh() lee los
+turnos nuevos del alumno (rol_emisor = 'Alumno') desde el último turno_id que
+indexó; como mucho una vez cada FAQ_REFRESH_S segundos.
+
+    python faq_index.py --bench 100000
+    python faq_index.py --url sqlite:///talkia.db --top 10
+    python faq_index.py --url sqlite:///talkia.db "cuando es el examen de historia"
+"""
+import argparse
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional
+
+from topic_filter import DEFAULT_KEYWORDS, KeywordClassifier, fold
+from turn_store import TALKIA_DB_URL, connect
+
+FAQ_CLUSTER_SIMILARITY = float(os.getenv("FAQ_CLUSTER_SIMILARITY", "0.8"))
+FAQ_REFRESH_S = float(os.getenv("FAQ_REFRESH_S", "5"))
+FAQ_TOP_N = int(os.getenv("FAQ_TOP_N", "20"))
+
+# Variantes de texto guardadas por grupo (para elegir la más repetida)
+_MAX_VARIANTS = 20
+# Grupos que se comparan al buscar dónde cae una pregunta nueva
+_MAX_CLUSTER_CANDIDATES = 200
+# Filas leídas de la base por consulta en refresh()
+_SYNC_CHUNK = 5000
+# Con más grupos que esto en el término más raro, la búsqueda recorre el ranking en lugar de intersecar
+_SMALL_POSTING = 500
+# Grupos del ranking revisados como mucho por búsqueda
+_MAX_RANK_SCAN = 20000
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+_INTERROGATIVES = {"que", "como", "cuando", "donde", "cual", "cuales", "quien", "quienes", "cuanto", "cuanta",
+                   "cuantos", "cuantas", "porque"}
+
+# Ya sin acentos
+_STOPWORDS = frozenset("""
+a al algo alguna alguno algunos ante antes asi aun con contra de del desde durante e el ella ellas ellos en
+entre era es esa esas ese eso esos esta estan estas este esto estos fue ha hay he la las le les lo los me mi
+mis mucho muy nada ni no nos o os otra otro para pero poco por se sea ser si sin sobre son su sus tambien te
+tengo tiene tu tus u un una uno unos y ya yo profe profesora profesor maestra maestro hola oye favor gracias
+puede puedes podria explicar explica explicame ayuda ayudar ayudarme quiero saber necesito entiendo entendi
+bien otra vez duda
+""".split()) | _INTERROGATIVES
+
+# Inicios que marcan una pregunta aunque el reconocimiento de voz no ponga "?"
+_QUESTION_STARTS = ("me puede", "me podria", "puede", "podria", "me explica", "explicame", "no entiendo",
+                    "no entendi", "tengo una duda", "necesito ayuda")
+
+
+def stem(token: str) -> str:
+    """Stemmer ligero: plural y vocal final (suficiente para agrupar preguntas cortas)."""
+    if len(token) > 4 and token.endswith("ces"):
+        return token[:-3] + "z"
+    if len(token) > 4 and token.endswith(("os", "as", "es")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith(("o", "a", "e")):
+        return token[:-1]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def analyze(text: str) -> FrozenSet[str]:
+    """Términos de una pregunta: sin acentos, sin palabras vacías, con stem y la interrogativa inicial."""
+    tokens = _TOKEN.findall(fold(text))
+    terms = set()
+    if tokens:
+        first = "porque" if tokens[:2] == ["por", "que"] else tokens[0]
+        if first in _INTERROGATIVES:
+            terms.add("?" + first)
+    for token in tokens:
+        if token not in _STOPWORDS:
+            terms.add(stem(token))
+    return frozenset(terms)
+
+
+def is_question(text: str) -> bool:
+    """Si un turno del alumno es una pregunta (con o sin signos de interrogación)."""
+    if "?" in text or "¿" in text:
+        return True
+    folded = " ".join(_TOKEN.findall(fold(text)))
+    first = folded.split(" ", 1)[0]
+    return first in _INTERROGATIVES or folded.startswith(_QUESTION_STARTS)
+
+
+class _Cluster:
+    __slots__ = ("cluster_id", "terms", "count", "variants", "last_seen")
+
+    def __init__(self, cluster_id: int, terms: FrozenSet[str]):
+        self.cluster_id = cluster_id
+        self.terms = terms
+        self.count = 0
+        self.variants: Dict[str, int] = {}
+        self.last_seen = None
+
+    def text(self) -> str:
+        return max(self.variants.items(), key=lambda kv: kv[1])[0] if self.variants else ""
+
+    def as_dict(self) -> dict:
+        return {"id": self.cluster_id, "pregunta": self.text(), "veces": self.count,
+                "variantes": len(self.variants), "ultima_vez": self.last_seen}
+
+
+class FAQIndex:
+    """Grupos de preguntas e índice invertido término → grupos; seguro entre hilos."""
+
+    def __init__(self, url: Optional[str] = TALKIA_DB_URL, similarity: float = FAQ_CLUSTER_SIMILARITY,
+                 refresh_interval: float = FAQ_REFRESH_S, classifier: Optional[KeywordClassifier] = None):
+        self.url = url
+        self.similarity = similarity
+        self.refresh_interval = refresh_interval
+        # Las preguntas con palabras prohibidas no se muestran en la página
+        self.classifier = classifier or KeywordClassifier(DEFAULT_KEYWORDS)
+        self._clusters: List[_Cluster] = []
+        self._by_terms: Dict[FrozenSet[str], _Cluster] = {}
+        self._postings: Dict[str, set] = {}
+        # Ranking: ids de grupo de más a menos frecuente, posición de cada uno e inicio de cada bloque de igual count
+        self._order: List[int] = []
+        self._rank: List[int] = []
+        self._block_start: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._ph = None
+        self._sync_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self.last_turno_id = 0
+        self.questions = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    def _find_cluster(self, terms: FrozenSet[str]) -> Optional[_Cluster]:
+        cluster = self._by_terms.get(terms)
+        if cluster is not None:
+            return cluster
+        # Solo se comparan los grupos que comparten el término más raro de la pregunta
+        rarest = min((self._postings.get(t, ()) for t in terms), key=len)
+        best, best_score = None, self.similarity
+        for cluster_id in list(rarest)[:_MAX_CLUSTER_CANDIDATES]:
+            other = self._clusters[cluster_id]
+            shared = len(terms & other.terms)
+            score = shared / (len(terms) + len(other.terms) - shared)
+            if score >= best_score:
+                best, best_score = other, score
+        return best
+
+    def add(self, text: str, seen_at=None) -> Optional[int]:
+        """Agrega una pregunta; devuelve el id de su grupo (None si no se indexa)."""
+        text = " ".join(text.split())
+        terms = analyze(text)
+        if not terms or "forbidden" in self.classifier.classify(text):
+            self.skipped += 1
+            return None
+        with self._lock:
+            cluster = self._find_cluster(terms)
+            if cluster is None:
+                cluster = _Cluster(len(self._clusters), terms)
+                self._clusters.append(cluster)
+                self._rank.append(len(self._order))
+                self._order.append(cluster.cluster_id)
+                self._block_start.setdefault(0, self._rank[-1])
+            # La variante también indexa sus términos: se encuentra buscando cualquiera de sus palabras
+            self._by_terms.setdefault(terms, cluster)
+            for term in terms:
+                self._postings.setdefault(term, set()).add(cluster.cluster_id)
+            self._bump(cluster)
+            if text in cluster.variants or len(cluster.variants) < _MAX_VARIANTS:
+                cluster.variants[text] = cluster.variants.get(text, 0) + 1
+            if seen_at is not None:
+                cluster.last_seen = str(seen_at)
+            self.questions += 1
+            return cluster.cluster_id
+
+    def _bump(self, cluster: _Cluster):
+        # El grupo pasa al primer lugar de su bloque (mismo count) y ese lugar queda en el bloque de count + 1
+        count, cid = cluster.count, cluster.cluster_id
+        start = self._block_start[count]
+        other = self._order[start]
+        position = self._rank[cid]
+        self._order[start], self._order[position] = cid, other
+        self._rank[cid], self._rank[other] = start, position
+        if start + 1 < len(self._order) and self._clusters[self._order[start + 1]].count == count:
+            self._block_start[count] = start + 1
+        else:
+            del self._block_start[count]
+        self._block_start.setdefault(count + 1, start)
+        cluster.count = count + 1
+
+    def top(self, n: int = FAQ_TOP_N) -> List[dict]:
+        """Los n grupos más frecuentes."""
+        with self._lock:
+            return [self._clusters[cid].as_dict() for cid in self._order[:n]]
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """Grupos que contienen todos los términos de la consulta, los más frecuentes primero.
+
+        Si ninguno los tiene todos, los que tienen más términos en común.
+        """
+        terms = analyze(query)
+        with self._lock:
+            postings = sorted((self._postings[t] for t in terms if t in self._postings), key=len)
+            if not postings:
+                return []
+            rest = postings[1:]
+            if len(postings[0]) <= _SMALL_POSTING:
+                candidates = [cid for cid in postings[0] if all(cid in p for p in rest)]
+                best = sorted(candidates, key=self._rank.__getitem__)[:limit]
+            else:
+                # Términos muy comunes: los grupos más frecuentes que los tienen todos salen primero en el ranking
+                best = []
+                for cid in self._order[:_MAX_RANK_SCAN]:
+                    if cid in postings[0] and all(cid in p for p in rest):
+                        best.append(cid)
+                        if len(best) == limit:
+                            break
+            if best:
+                coverage = {cid: len(postings) for cid in best}
+            else:
+                # Coincidencia parcial: cuántos términos de la consulta tiene cada grupo
+                coverage = {}
+                small = [p for p in postings if len(p) <= _SMALL_POSTING]
+                for posting in small:
+                    for cid in posting:
+                        coverage[cid] = coverage.get(cid, 0) + 1
+                if len(small) < len(postings):
+                    common = postings[len(small):]
+                    for cid in list(coverage):
+                        coverage[cid] += sum(cid in p for p in common)
+                    for cid in self._order[:_MAX_RANK_SCAN // 10]:
+                        if cid not in coverage:
+                            hits = sum(cid in p for p in common)
+                            if hits:
+                                coverage[cid] = hits
+                best = sorted(coverage, key=lambda cid: (-coverage[cid], self._rank[cid]))[:limit]
+            results = []
+            for cid in best:
+                item = self._clusters[cid].as_dict()
+                item["coincidencia"] = round(coverage[cid] / len(terms), 2)
+                results.append(item)
+            return results
+
+    def refresh(self, force: bool = False) -> int:
+        """Indexa los turnos del alumno nuevos desde la última vez; devuelve cuántas preguntas agregó."""
+        if not self.url or (not force and time.monotonic() - self._last_refresh < self.refresh_interval):
+            return 0
+        added = 0
+        # Un solo hilo sincroniza; los demás siguen con el índice que ya hay
+        if not self._sync_lock.acquire(blocking=False):
+            return 0
+        try:
+            if self._db is None:
+                self._db, self._ph = connect(self.url)
+            cur = self._db.cursor()
+            while True:
+                cur.execute(f"SELECT turno_id, transcripcion, fecha_turno FROM turnos_conversacion "
+                            f"WHERE rol_emisor = 'Alumno' AND turno_id > {self._ph} ORDER BY turno_id "
+                            f"LIMIT {_SYNC_CHUNK}", (self.last_turno_id,))
+                rows = cur.fetchall()
+                for turno_id, text, seen_at in rows:
+                    if text and is_question(text) and self.add(text, seen_at) is not None:
+                        added += 1
+                if rows:
+                    self.last_turno_id = rows[-1][0]
+                if len(rows) < _SYNC_CHUNK:
+                    break
+            # Sin transacción abierta: el próximo SELECT ve lo que confirmaron otros procesos
+            self._db.commit()
+            self._last_refresh = time.monotonic()
+        finally:
+            self._sync_lock.release()
+        return added
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"preguntas": self.questions, "grupos": len(self._clusters), "terminos": len(self._postings),
+                    "omitidas": self.skipped, "ultimo_turno_id": self.last_turno_id}
+
+
+def synthetic_questions(n: int, seed: int = 7) -> List[str]:
+    """Preguntas de alumno con acentos, mayúsculas y signos al azar (como llegan del reconocimiento de voz)."""
+    rng = random.Random(seed)
+    subjects = ["matemáticas", "historia", "geografía", "biología", "física", "química", "lengua", "inglés",
+                "música", "arte", "educación física", "cívica", "álgebra", "geometría", "literatura"]
+    things = ["las fracciones", "los verbos", "la fotosíntesis", "las ecuaciones", "los mapas", "el átomo",
+              "la revolución", "los ángulos", "la célula", "los poemas", "las potencias", "los volcanes"]
+    templates = ["¿Cuándo es el examen de {s}?", "¿Qué entra en el examen de {s}?", "¿Me explica otra vez {t}?",
+                 "No entendí la tarea de {s}", "¿Cómo se resuelven los ejercicios de {t}?",
+                 "¿Dónde está el horario de {s}?", "¿Cuál es la tarea de {s} para el {d}?",
+                 "¿Cuántas páginas hay que leer de {s}?", "¿Por qué {t} son importantes en {s}?",
+                 "¿Qué es {t}?", "¿Puede repetir lo de {t} del capítulo {n}?"]
+    days = ["lunes", "martes", "miércoles", "jueves", "viernes"]
+    # Cola larga: palabras poco frecuentes (nombres de temas, autores, lugares)
+    letters, vowels = "bcdfglmnprstv", "aeiou"
+    rare = ["".join(rng.choice(letters) + rng.choice(vowels) for _ in range(rng.randint(3, 5))) for _ in range(5000)]
+    out = []
+    for _ in range(n):
+        # Pocas preguntas muy repetidas y una cola larga (como en una escuela real)
+        template = templates[min(int(rng.expovariate(0.35)), len(templates) - 1)]
+        text = template.format(s=rng.choice(subjects), t=rng.choice(things), d=rng.choice(days),
+                               n=rng.randint(1, 300))
+        if rng.random() < 0.2:
+            text = text.rstrip("?") + f" de {rng.choice(rare)}?"
+        if rng.random() < 0.3:
+            text = fold(text)
+        if rng.random() < 0.4:
+            text = text.strip("¿?")
+        out.append(text)
+    return out
+
+
+def benchmark(n: int = 100_000, queries: int = 2000):
+    questions = synthetic_questions(n)
+    index = FAQIndex(url=None)
+    start = time.perf_counter()
+    for q in questions:
+        index.add(q)
+    elapsed = time.perf_counter() - start
+    stats = index.stats()
+    print(f"📚 {n} preguntas indexadas en {elapsed:.2f}s ({elapsed / n * 1e6:.1f} µs por pregunta), "
+          f"{stats['grupos']} grupos, {stats['terminos']} términos")
+
+    start = time.perf_counter()
+    top = index.top(FAQ_TOP_N)
+    print(f"🏆 Top {FAQ_TOP_N} en {(time.perf_counter() - start) * 1000:.2f} ms:")
+    for item in top[:5]:
+        print(f"   {item['veces']:>6}  {item['pregunta']}")
+
+    rng = random.Random(3)
+    lookups = [" ".join(rng.sample(fold(q).strip("¿?").split(), k=min(2, len(q.split()))))
+               for q in rng.sample(questions, queries)]
+    lookups += ["examen historia", "fracciones", "cuando es el examen de quimica", "tarea viernes", "xyz"]
+    samples = []
+    for query in lookups:
+        start = time.perf_counter()
+        index.search(query)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    p50 = samples[len(samples) // 2] * 1000
+    p95 = samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)] * 1000
+    print(f"🔎 {len(lookups)} búsquedas: p50 {p50:.3f} ms, p95 {p95:.3f} ms, máx. {samples[-1] * 1000:.3f} ms")
+    for item in index.search("cuando es el examen de historia")[:3]:
+        print(f"   {item['veces']:>6}  {item['pregunta']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preguntas frecuentes desde un índice invertido en memoria")
+    parser.add_argument("--bench", type=int, nargs="?", const=100_000, help="Benchmark con N preguntas sintéticas")
+    parser.add_argument("--url", default=TALKIA_DB_URL, help="Base con los turnos (por defecto TALKIA_DB_URL)")
+    parser.add_argument("--top", type=int, default=FAQ_TOP_N)
+    parser.add_argument("query", nargs="*", help="Búsqueda")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args.bench)
+        return
+    if not args.url:
+        parser.error("falta TALKIA_DB_URL o --url (o usa --bench)")
+    index = FAQIndex(args.url)
+    start = time.perf_counter()
+    index.refresh(force=True)
+    stats = index.stats()
+    print(f"📚 {stats['preguntas']} preguntas en {stats['grupos']} grupos "
+          f"({time.perf_counter() - start:.2f}s, hasta el turno {stats['ultimo_turno_id']})")
+    items = index.search(" ".join(args.query), args.top) if args.query else index.top(args.top)
+    for item in items:
+        print(f"{item['veces']:>6}  {item['pregunta']}")
+
+
+if __name__ == "__main__":
+    main()
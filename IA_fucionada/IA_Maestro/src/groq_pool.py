@@ -0,0 +1,231 @@
+"""
+Registro de clientes Groq compartidos por todo el proceso.
+
+Construye el cliente una sola vez (lee entorno y descifra la clave solo la
+primera vez), mantiene un pool acotado de conexiones keep-alive y se
+reconstruye automáticamente en procesos hijos (workers de gunicorn tras fork).
+Lo usan el SDK de Groq (server.py) y el transporte HTTP directo de
+llm_transport.py (llamada_completa, IA_Alumno): un solo pool, las mismas
+variables y las mismas métricas.
+
+Variables de entorno:
+
+- GROQ_POOL_MAX_CONNECTIONS (10) y GROQ_POOL_MAX_KEEPALIVE (10): conexiones hacia Groq
+- GROQ_POOL_KEEPALIVE_EXPIRY (30): segundos que una conexión libre sigue abierta
+- GROQ_POOL_HTTP2 (0): 1 para negociar HTTP/2 (necesita el paquete h2: pip install "httpx[http2]")
+
+Por petición se registra, con la extensión "trace" de httpcore, si la conexión
+era nueva o reutilizada y cuánto tardaron la conexión TCP y el handshake TLS.
+"""
+import importlib.util
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from lazy_import import lazy_import
+
+httpx = lazy_import("httpx")
+
+# Tamaño del pool de conexiones HTTPS hacia api.groq.com
+POOL_MAX_CONNECTIONS = int(os.getenv("GROQ_POOL_MAX_CONNECTIONS", "10"))
+POOL_MAX_KEEPALIVE = int(os.getenv("GROQ_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_POOL_KEEPALIVE_EXPIRY", "30"))
+POOL_HTTP2 = os.getenv("GROQ_POOL_HTTP2", "0") == "1"
+
+
+class _Trace:
+    """Callback de la extensión "trace" de httpcore: marca de tiempo de cada evento de la petición."""
+
+    __slots__ = ("events",)
+
+    def __init__(self):
+        self.events: Dict[str, float] = {}
+
+    def __call__(self, name: str, info: dict):
+        self.events[name] = time.perf_counter()
+
+    def span_ms(self, step: str) -> Optional[float]:
+        start = self.events.get(f"{step}.started")
+        end = self.events.get(f"{step}.complete")
+        return (end - start) * 1000 if start is not None and end is not None else None
+
+    def response_ms(self) -> Optional[float]:
+        """De empezar a enviar la petición a tener los encabezados de la respuesta (HTTP/1.1 o HTTP/2)."""
+        for proto in ("http11", "http2"):
+            start = self.events.get(f"{proto}.send_request_headers.started")
+            end = self.events.get(f"{proto}.receive_response_headers.complete")
+            if start is not None and end is not None:
+                return (end - start) * 1000
+        return None
+
+
+def _mean(values) -> Optional[float]:
+    return round(sum(values) / len(values), 2) if values else None
+
+
+class ClientRegistry:
+    """Guarda un cliente por nombre y cuenta aciertos/fallos y reutilización de conexiones."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[str, object] = {}
+        self._http_clients: "Dict[str, httpx.Client]" = {}
+        self._pid = os.getpid()
+        self._http2 = None
+        self._reset_counters()
+
+    def reset_stats(self):
+        """Pone en cero los contadores y tiempos (p. ej. entre dos mediciones)."""
+        with self._lock:
+            self._reset_counters()
+
+    def _reset_counters(self):
+        self._counters = {
+            "client_hits": 0,
+            "client_misses": 0,
+            "requests": 0,
+            "connections_new": 0,
+            "connections_reused": 0,
+            "http2": 0,
+        }
+        # Solo las últimas mediciones: un servidor o una llamada pueden durar horas
+        self._connect_ms = deque(maxlen=500)
+        self._tls_ms = deque(maxlen=500)
+        self._response_ms = deque(maxlen=500)
+
+    def _on_request(self, request: "httpx.Request"):
+        """Hook de httpx: httpcore llama al trace en cada paso (conexión, TLS, envío, respuesta)."""
+        request.extensions["trace"] = _Trace()
+
+    def _on_response(self, response: "httpx.Response"):
+        """Hook de httpx: si la respuesta llegó por una conexión ya abierta y cuánto costó abrirla."""
+        trace = response.request.extensions.get("trace")
+        connect = tls = answered = None
+        if isinstance(trace, _Trace):
+            connect = trace.span_ms("connection.connect_tcp")
+            tls = trace.span_ms("connection.start_tls")
+            answered = trace.response_ms()
+        with self._lock:
+            self._counters["requests"] += 1
+            if response.http_version == "HTTP/2":
+                self._counters["http2"] += 1
+            # Sin evento connect_tcp la petición salió por una conexión del pool
+            if connect is None:
+                self._counters["connections_reused"] += 1
+            else:
+                self._counters["connections_new"] += 1
+                self._connect_ms.append(connect)
+                if tls is not None:
+                    self._tls_ms.append(tls)
+            if answered is not None:
+                self._response_ms.append(answered)
+
+    def _use_http2(self) -> bool:
+        if self._http2 is None:
+            self._http2 = POOL_HTTP2 and importlib.util.find_spec("h2") is not None
+            if POOL_HTTP2 and not self._http2:
+                print("⚠️ GROQ_POOL_HTTP2=1 pero falta el paquete h2 (pip install \"httpx[http2]\"); se usa HTTP/1.1")
+        return self._http2
+
+    def make_http_client(self) -> "httpx.Client":
+        """Cliente httpx con los límites del pool y los hooks de métricas."""
+        limits = httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        )
+        return httpx.Client(limits=limits, http2=self._use_http2(),
+                            event_hooks={"request": [self._on_request], "response": [self._on_response]})
+
+    def _check_fork(self):
+        """Si cambió el PID (fork), descarta los clientes heredados del padre."""
+        if os.getpid() != self._pid:
+            self.reset()
+
+    def get(self, name: str, factory: "Callable[[httpx.Client], object]"):
+        """Devuelve el cliente `name`; lo construye con `factory(http_client)` la primera vez."""
+        self._check_fork()
+        client = self._clients.get(name)
+        if client is not None:
+            with self._lock:
+                self._counters["client_hits"] += 1
+            return client
+        with self._lock:
+            client = self._clients.get(name)
+            if client is not None:
+                self._counters["client_hits"] += 1
+                return client
+            http_client = self.make_http_client()
+            try:
+                client = factory(http_client)
+            except Exception:
+                http_client.close()
+                raise
+            self._http_clients[name] = http_client
+            self._clients[name] = client
+            self._counters["client_misses"] += 1
+            return client
+
+    def reset(self):
+        """Olvida todos los clientes (se usa tras fork o para forzar reconstrucción)."""
+        # No se adquiere el lock: tras un fork puede haber quedado tomado por otro hilo del padre
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._http_clients = {}
+        self._pid = os.getpid()
+
+    def close(self):
+        """Cierra las conexiones abiertas del proceso actual."""
+        with self._lock:
+            for http_client in self._http_clients.values():
+                try:
+                    http_client.close()
+                except Exception:
+                    pass
+            self._clients = {}
+            self._http_clients = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = dict(self._counters)
+            data["connect_ms_mean"] = _mean(self._connect_ms)
+            data["tls_handshake_ms_mean"] = _mean(self._tls_ms)
+            data["response_ms_mean"] = _mean(self._response_ms)
+            data["pid"] = self._pid
+            data["clients"] = sorted(self._clients)
+            data["pool_max_connections"] = POOL_MAX_CONNECTIONS
+            data["pool_max_keepalive"] = POOL_MAX_KEEPALIVE
+            data["http2_enabled"] = bool(self._http2)
+            return data
+
+
+_registry = ClientRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_registry.reset)
+
+
+def get_client(name: str, factory: "Callable[[httpx.Client], object]"):
+    """Cliente compartido del proceso para `name`."""
+    return _registry.get(name, factory)
+
+
+def new_http_client() -> "httpx.Client":
+    """Cliente httpx propio (fuera del registro) con los mismos límites y métricas; lo cierra quien lo pide."""
+    return _registry.make_http_client()
+
+
+def pool_stats() -> dict:
+    """Contadores de aciertos/fallos del registro, reutilización de conexiones y tiempos de TCP/TLS."""
+    return _registry.stats()
+
+
+def reset_pool_stats():
+    _registry.reset_stats()
+
+
+def close_clients():
+    """Cierra los clientes del proceso (por ejemplo al apagar el servidor)."""
+    _registry.close()
@@ -0,0 +1,164 @@
+"""
+Historial de conversación con presupuesto de tokens.
+
+Mantiene el prompt de sistema y los últimos K turnos textuales; cuando el
+historial completo supera el presupuesto, los turnos más viejos se pliegan en un
+resumen acumulado. Así el tamaño del prompt por turno se mantiene plano aunque
+la llamada dure 50 turnos.
+
+Se usa como una lista: `historial.append({"role": ..., "content": ...})` y
+`list(historial)` devuelve los mensajes ya compactados.
+
+    python src/history_manager.py   # benchmark de una llamada guionada de 50 turnos
+"""
+import math
+import os
+import re
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "300"))
+
+# Tokens fijos que agrega la API por mensaje (rol, separadores)
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+# Peticiones recientes que se guardan en turn_log (una llamada puede durar horas)
+_TURN_LOG_MAX = 200
+
+_FIRST_SENTENCE = re.compile(r'^(.+?[.!?…])(\s|$)', re.S)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación rápida: ~4 caracteres por token en español."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(message["content"]) + _MESSAGE_OVERHEAD_TOKENS
+
+
+def extractive_summary(previous: str, folded: List[dict], labels: Dict[str, str], max_tokens: int) -> str:
+    """Resumen sin llamar al modelo: primera oración de cada mensaje plegado."""
+    lines = [line for line in previous.splitlines() if line]
+    for message in folded:
+        text = " ".join(message["content"].split())
+        match = _FIRST_SENTENCE.match(text)
+        first = match.group(1) if match else text
+        if len(first) > 160:
+            first = first[:157].rstrip() + "..."
+        lines.append(f"- {labels.get(message['role'], message['role'])}: {first}")
+    # Si el resumen crece demasiado se olvidan las líneas más viejas
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class HistoryManager:
+    """Historial compactado: sistema + resumen acumulado + últimos K turnos."""
+
+    def __init__(self, system_prompt: Optional[str] = None, keep_turns: int = HISTORY_KEEP_TURNS,
+                 budget_tokens: int = HISTORY_TOKEN_BUDGET, summary_tokens: int = HISTORY_SUMMARY_TOKENS,
+                 labels: Optional[Dict[str, str]] = None,
+                 summarizer: Optional[Callable[[str, List[dict]], str]] = None):
+        self.system_prompt = system_prompt
+        self.keep_messages = max(2, 2 * keep_turns)
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.labels = labels or {"user": "Alumno", "assistant": "Profesora"}
+        # summarizer(resumen_anterior, mensajes_plegados) -> nuevo resumen (p. ej. con el LLM)
+        self.summarizer = summarizer
+        self.summary = ""
+        self._recent: List[dict] = []
+        self._full_tokens = message_tokens({"content": system_prompt}) if system_prompt else 0
+        # Una entrada por petición al modelo (cada mensaje "user" agregado), solo las últimas
+        self.turn_log: "deque[dict]" = deque(maxlen=_TURN_LOG_MAX)
+        self.total_tokens_saved = 0
+
+    def _summary_message(self) -> Optional[dict]:
+        if not self.summary:
+            return None
+        return {"role": "system", "content": "Resumen de lo hablado antes en la llamada:\n" + self.summary}
+
+    def _fold(self):
+        folded = self._recent[:-self.keep_messages]
+        self._recent = self._recent[-self.keep_messages:]
+        if self.summarizer is not None:
+            try:
+                self.summary = self.summarizer(self.summary, folded)
+                return
+            except Exception:
+                pass
+        self.summary = extractive_summary(self.summary, folded, self.labels, self.summary_tokens)
+
+    def append(self, message: dict):
+        message = {"role": message["role"], "content": message["content"]}
+        self._recent.append(message)
+        self._full_tokens += message_tokens(message)
+        if self.prompt_tokens() > self.budget_tokens and len(self._recent) > self.keep_messages:
+            self._fold()
+        if message["role"] != "user":
+            # La respuesta del modelo no sale como prompt hasta la siguiente pregunta
+            return
+        sent = self.prompt_tokens()
+        saved = self._full_tokens - sent
+        self.turn_log.append({"prompt_tokens": sent, "full_tokens": self._full_tokens, "tokens_saved": saved})
+        self.total_tokens_saved += saved
+
+    def messages(self) -> List[dict]:
+        result = []
+        if self.system_prompt:
+            result.append({"role": "system", "content": self.system_prompt})
+        summary = self._summary_message()
+        if summary:
+            result.append(summary)
+        return result + list(self._recent)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.messages())
+
+    def __len__(self) -> int:
+        return len(self.messages())
+
+    def prompt_tokens(self) -> int:
+        return sum(message_tokens(m) for m in self.messages())
+
+    @property
+    def last_tokens_saved(self) -> int:
+        return self.turn_log[-1]["tokens_saved"] if self.turn_log else 0
+
+    def stats(self) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens(),
+            "full_history_tokens": self._full_tokens,
+            "tokens_saved": self.last_tokens_saved,
+            "total_tokens_saved": self.total_tokens_saved,
+            "recent_messages": len(self._recent),
+            "summary_tokens": estimate_tokens(self.summary),
+        }
+
+
+def _benchmark(turns: int = 50):
+    """Llamada guionada: compara el prompt por turno con y sin compactación."""
+    system = "Eres 'Profesora García', una profesora de escuela que atiende una llamada de un alumno. " * 3
+    pregunta = "Profe, ¿me puede explicar otra vez cómo se suman fracciones con distinto denominador? "
+    respuesta = ("Claro. Primero buscas un denominador común, luego conviertes cada fracción y al final "
+                 "sumas los numeradores. ¿Quieres que hagamos un ejemplo juntos? ")
+    manager = HistoryManager(system)
+    full: List[dict] = [{"role": "system", "content": system}]
+    print(f"{'turno':>5} {'sin compactar':>14} {'compactado':>11} {'ahorro':>7}")
+    for turn in range(1, turns + 1):
+        for role, content in (("user", f"{pregunta}(turno {turn})"), ("assistant", respuesta * 2)):
+            manager.append({"role": role, "content": content})
+            full.append({"role": role, "content": content})
+        sent_full = sum(message_tokens(m) for m in full)
+        sent = manager.prompt_tokens()
+        if turn == 1 or turn % 5 == 0:
+            print(f"{turn:>5} {sent_full:>14} {sent:>11} {sent_full - sent:>7}")
+    stats = manager.stats()
+    print(f"\nTokens de prompt ahorrados en toda la llamada: {stats['total_tokens_saved']}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,99 @@
+"""
+Importación diferida de dependencias pesadas (groq, gTTS, requests, pygame, pyttsx3, speech_recognition).
+
+Los scripts declaran el módulo arriba, como antes, pero el import real ocurre la
+primera vez que se usa un atributo. Así el arranque no paga backends de audio
+que la llamada quizá nunca use (p. ej. el micrófono en modo --text):
+
+    sr = lazy_import("speech_recognition")
+    ...
+    sr.Recognizer()          # aquí se importa de verdad
+
+Si el módulo ya está en sys.modules (como los dobles de bench/fakes.py), se usa ese.
+"""
+import importlib
+import threading
+from typing import Optional
+
+
+class LazyModule:
+    """Representa un módulo que se importa al primer acceso a un atributo."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        """Importa el módulo (una sola vez; importlib ya serializa entre hilos)."""
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def available(self) -> bool:
+        """True si el módulo se puede importar (lo importa para comprobarlo)."""
+        try:
+            self.load()
+            return True
+        except ImportError:
+            return False
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "cargado" if self.loaded else "diferido"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def preload(*modules: LazyModule) -> threading.Thread:
+    """Importa los módulos en un hilo de fondo (p. ej. mientras suena el saludo).
+
+    Los fallos se ignoran: el error real aparecerá donde el módulo se use.
+    """
+    def _run():
+        for module in modules:
+            try:
+                module.load()
+            except Exception:
+                pass
+
+    thread = threading.Thread(target=_run, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+class BackgroundTask:
+    """Ejecuta una función en un hilo y deja esperar su resultado más adelante.
+
+    Se usa para calibrar el micrófono mientras se reproduce el saludo: la primera
+    escucha llama a wait() y solo bloquea si la calibración todavía no terminó.
+    """
+
+    def __init__(self, fn, name: str = "background"):
+        self._fn = fn
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._fn()
+        except BaseException as e:
+            self._error = e
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[BaseException]:
+        """Espera a que termine; devuelve la excepción que haya lanzado, si hubo."""
+        self._thread.join(timeout)
+        return self._error
+
+    @property
+    def done(self) -> bool:
+        return not self._thread.is_alive()
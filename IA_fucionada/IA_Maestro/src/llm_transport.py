@@ -0,0 +1,181 @@
+"""
+Transporte HTTP compartido hacia /chat/completions de Groq (compatible con OpenAI).
+
+llamada_completa.py y alumno_escolar.py hacían requests.post() en cada turno:
+URL y encabezados reconstruidos y una conexión TCP + TLS nueva por petición.
+LLMTransport usa el cliente httpx del pool de groq_pool.py (uno por proceso y
+URL base, reconstruido tras fork) con conexiones keep-alive, HTTP/2 opcional,
+respuestas gzip y timeouts separados de conexión y lectura. Las conexiones
+nuevas y reutilizadas y los tiempos de TCP y TLS se cuentan en groq_pool
+(pool_stats()), igual que los del SDK de Groq en server.py.
+
+Variables de entorno: las del pool (GROQ_POOL_MAX_CONNECTIONS, GROQ_POOL_HTTP2, ver
+groq_pool.py) y LLM_CONNECT_TIMEOUT (5) y LLM_READ_TIMEOUT (30), en segundos.
+
+Comparación del pool contra una conexión nueva por petición (como antes):
+
+    python llm_transport.py --requests 20
+    python llm_transport.py --requests 20 --fake-groq 0.05
+"""
+import argparse
+import contextlib
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from groq_pool import get_client, new_http_client, pool_stats, reset_pool_stats
+from lazy_import import lazy_import
+
+httpx = lazy_import("httpx")
+
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/")
+CHAT_PATH = "/openai/v1/chat/completions"
+
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30"))
+
+
+class LLMTransportError(Exception):
+    """La petición no llegó a tener respuesta HTTP."""
+
+
+class LLMTimeout(LLMTransportError):
+    """Se agotó el timeout de conexión o de lectura."""
+
+
+class LLMConnectionError(LLMTransportError):
+    """No se pudo conectar (DNS, TCP, TLS) o la conexión se cortó."""
+
+
+class LLMTransport:
+    """Peticiones a /chat/completions por el pool compartido del proceso; seguro entre hilos.
+
+    http_client: cliente httpx propio en lugar del pool (lo cierra quien lo pasa).
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, connect_timeout: float = LLM_CONNECT_TIMEOUT,
+                 read_timeout: float = LLM_READ_TIMEOUT, http_client=None):
+        self.base_url = (base_url or GROQ_BASE_URL).rstrip("/")
+        self.url = self.base_url + CHAT_PATH
+        # URL y encabezados se arman una sola vez, no en cada turno
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Accept-Encoding": "gzip",
+        }
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._http_client = http_client
+        self._lock = threading.Lock()
+        self._errors = 0
+
+    def _client(self):
+        if self._http_client is not None:
+            return self._http_client
+        # Se pide al registro en cada petición: tras un fork devuelve un cliente nuevo
+        return get_client(f"http {self.base_url}", lambda http_client: http_client)
+
+    def _timeout(self, read_timeout: Optional[float]):
+        return httpx.Timeout(read_timeout or self.read_timeout, connect=self.connect_timeout)
+
+    def _failed(self, error, answered: bool) -> LLMTransportError:
+        """Traduce el error de httpx; solo cuenta como petición fallida si no hubo respuesta."""
+        if not answered:
+            with self._lock:
+                self._errors += 1
+        if isinstance(error, httpx.TimeoutException):
+            return LLMTimeout(f"Groq no respondió a tiempo ({type(error).__name__})")
+        return LLMConnectionError(f"{type(error).__name__}: {error}")
+
+    def post_chat(self, payload: dict, read_timeout: Optional[float] = None):
+        """POST /chat/completions; devuelve la respuesta httpx (status_code, headers, json(), text)."""
+        with self.stream_chat(payload, read_timeout) as response:
+            response.read()
+        return response
+
+    @contextlib.contextmanager
+    def stream_chat(self, payload: dict, read_timeout: Optional[float] = None):
+        """POST con stream=True; la respuesta se lee con streaming_tts.iter_sse_deltas()."""
+        response = None
+        try:
+            with self._client().stream("POST", self.url, json=payload, headers=self.headers,
+                                       timeout=self._timeout(read_timeout)) as response:
+                yield response
+        except httpx.TransportError as e:
+            # Si el corte llega leyendo el cuerpo, la petición ya quedó contada por el pool
+            raise self._failed(e, answered=response is not None) from e
+
+    def stats(self) -> dict:
+        """Métricas del pool del proceso (groq_pool.pool_stats()) más los errores de este transporte."""
+        stats = pool_stats()
+        with self._lock:
+            stats["errors"] = self._errors
+        return stats
+
+
+_transports: Dict[tuple, LLMTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(api_key: str, base_url: Optional[str] = None) -> LLMTransport:
+    """Transporte compartido del proceso para esta clave y URL base."""
+    key = (api_key, (base_url or GROQ_BASE_URL).rstrip("/"))
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = _transports[key] = LLMTransport(api_key, base_url)
+        return transport
+
+
+def _benchmark(send, requests_count: int) -> dict:
+    """Manda requests_count peticiones con send(payload); devuelve las métricas del pool de esa tanda."""
+    payload = {"model": "llama-3.1-8b-instant", "max_tokens": 20,
+               "messages": [{"role": "user", "content": "Di hola en una palabra."}]}
+    reset_pool_stats()
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        send(payload).raise_for_status()
+    wall = time.perf_counter() - start
+    stats = pool_stats()
+    stats["wall_ms_per_request"] = round(wall * 1000 / requests_count, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conexiones reutilizadas y handshakes: pool vs. conexión por petición")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--fake-groq", type=float, default=None, metavar="LATENCIA",
+                        help="Levanta fake_groq local con esta latencia en lugar de usar GROQ_BASE_URL")
+    args = parser.parse_args()
+
+    proc = None
+    base_url = GROQ_BASE_URL
+    api_key = os.getenv("GROQ_API_KEY") or "fake-key"
+    if args.fake_groq is not None:
+        from load_test import start_fake_groq
+        proc, base_url = start_fake_groq(args.fake_groq)
+
+    def fresh_connection(payload):
+        # Como el requests.post() de antes: cliente y conexión nuevos en cada turno
+        with new_http_client() as http_client:
+            return LLMTransport(api_key, base_url, http_client=http_client).post_chat(payload)
+
+    try:
+        shared = get_transport(api_key, base_url)
+        modes = (
+            ("conexión nueva por petición", fresh_connection),
+            ("pool compartido", shared.post_chat),
+        )
+        for label, send in modes:
+            stats = _benchmark(send, args.requests)
+            print(f"🌐 {label}: {stats['connections_new']} conexiones nuevas, {stats['connections_reused']} "
+                  f"reutilizadas, TCP {stats['connect_ms_mean']} ms, TLS {stats['tls_handshake_ms_mean']} ms, "
+                  f"{stats['wall_ms_per_request']} ms por petición ({stats['http2']} por HTTP/2)")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
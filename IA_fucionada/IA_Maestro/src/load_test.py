@@ -0,0 +1,181 @@
+"""
+Prueba de carga de los webhooks de voz contra un Groq falso local.
+
+Levanta fake_groq con la latencia indicada y el servidor elegido (Flask
+síncrono o ASGI), cada uno en su propio subproceso, y lanza N POST simultáneos
+a /respond como lo haría Twilio. Reporta latencias p50/p95/p99 y llamadas por segundo.
+
+    python src/load_test.py --server async --calls 300 --llm-latency 1.5
+    python src/load_test.py --server flask --calls 300 --llm-latency 1.5
+    python src/load_test.py --url http://127.0.0.1:5000 --calls 100   # servidor ya levantado
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Iterable, List, Optional
+
+import aiohttp
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Comando para arrancar cada servidor; {port} se sustituye por un puerto libre
+SERVERS = {
+    "flask": [sys.executable, "server.py"],
+    "async": [sys.executable, "-m", "hypercorn", "server_async:app",
+              "--bind", "127.0.0.1:{port}", "--backlog", "2048"],
+}
+
+PREGUNTAS = [
+    "¿Cómo se calcula el área de un triángulo?",
+    "¿Qué es la fotosíntesis?",
+    "¿Cuándo es el examen de historia?",
+    "¿Me explica las fracciones equivalentes?",
+]
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn(cmd: List[str], port: int, env: dict, name: str) -> subprocess.Popen:
+    proc = subprocess.Popen(cmd, cwd=SRC_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{name} terminó al arrancar (código {proc.returncode})")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{name} no arrancó en 20 s")
+
+
+def start_fake_groq(latency: float, failing: Iterable[str] = ()) -> (subprocess.Popen, str):
+    """failing: modelos que responden con error, como en --fail-model (p. ej. "llama-3.3-70b-versatile=404")."""
+    # En otro proceso para que sus hilos no compitan por el GIL con el generador de carga
+    port = _free_port()
+    cmd = [sys.executable, "fake_groq.py", "--port", str(port), "--latency", str(latency)]
+    for item in failing:
+        cmd += ["--fail-model", item]
+    return _spawn(cmd, port, dict(os.environ), "fake_groq"), f"http://127.0.0.1:{port}"
+
+
+def start_server(kind: str, fake_url: str) -> (subprocess.Popen, str):
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "GROQ_BASE_URL": fake_url,
+        "GROQ_API_KEY": env.get("GROQ_API_KEY") or "fake-key",
+        "GROQ_POOL_MAX_CONNECTIONS": env.get("GROQ_POOL_MAX_CONNECTIONS", "100"),
+        "GROQ_ASYNC_POOL_MAX_CONNECTIONS": env.get("GROQ_ASYNC_POOL_MAX_CONNECTIONS", "1000"),
+    })
+    env.pop("GROQ_API_KEY_ENCRYPTED", None)
+    cmd = [part.format(port=port) for part in SERVERS[kind]]
+    return _spawn(cmd, port, env, f"El servidor {kind}"), f"http://127.0.0.1:{port}"
+
+
+async def run_load(url: str, calls: int, concurrency: int, timeout: float) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(base_url=url, connector=connector, timeout=client_timeout) as client:
+        async def one_call(i: int):
+            nonlocal errors
+            form = {"CallSid": f"CAload{i:06d}", "SpeechResult": PREGUNTAS[i % len(PREGUNTAS)]}
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    async with client.post("/respond", data=form) as r:
+                        ok = r.status == 200 and "<Response>" in await r.text()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                elapsed = time.perf_counter() - start
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one_call(i) for i in range(calls)))
+        wall = time.perf_counter() - wall_start
+
+    def ms(v):
+        return round(v * 1000, 1) if v is not None else None
+
+    return {
+        "calls": calls,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "calls_per_s": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(max(latencies) if latencies else None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de /respond con Groq falso")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="async")
+    parser.add_argument("--url", help="Usa un servidor ya levantado en lugar de arrancar uno")
+    parser.add_argument("--calls", type=int, default=200, help="Número de POST simulados de Twilio")
+    parser.add_argument("--concurrency", type=int, default=None, help="Llamadas en vuelo a la vez (por defecto todas)")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Segundos que tarda el Groq falso")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", action="store_true", help="Imprime solo el resultado en JSON")
+    args = parser.parse_args()
+
+    concurrency = args.concurrency or args.calls
+    procs = []
+    try:
+        url = args.url
+        if not url:
+            fake_proc, fake_url = start_fake_groq(args.llm_latency)
+            procs.append(fake_proc)
+            server_proc, url = start_server(args.server, fake_url)
+            procs.append(server_proc)
+        result = asyncio.run(run_load(url, args.calls, concurrency, args.timeout))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait(timeout=10)
+    result["server"] = args.url or args.server
+    result["llm_latency_s"] = args.llm_latency
+
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(f"Servidor: {result['server']}  |  latencia LLM simulada: {args.llm_latency}s")
+    print(f"Llamadas: {result['ok']}/{result['calls']} OK, {result['errors']} errores, concurrencia {concurrency}")
+    print(f"Tiempo total: {result['wall_s']}s  ({result['calls_per_s']} llamadas/s)")
+    print(f"Latencia p50={result['p50_ms']} ms  p95={result['p95_ms']} ms  p99={result['p99_ms']} ms  max={result['max_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Selección de modelo con memoria y circuit breaker por modelo.
+
+En lugar de recorrer CANDIDATE_MODELS en cada turno, recuerda el último modelo
+que respondió bien y lo usa primero. Un modelo que falla N veces seguidas queda
+con el circuito abierto durante un tiempo de enfriamiento; pasado ese tiempo se
+permite una sola petición de prueba (half-open) antes de volver a usarlo; mientras
+esa prueba está en curso, las demás peticiones lo saltan.
+"""
+import os
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_THRESHOLD = int(os.getenv("GROQ_MODEL_FAILURE_THRESHOLD", "3"))
+COOLDOWN_SECONDS = float(os.getenv("GROQ_MODEL_COOLDOWN", "60"))
+# Un modelo retirado (400/404) no va a volver pronto: se enfría más tiempo
+DEPRECATED_COOLDOWN_SECONDS = float(os.getenv("GROQ_MODEL_DEPRECATED_COOLDOWN", "3600"))
+
+# Códigos de error de Groq ({"error": {"code": ...}}) que indican que el modelo ya no está
+PERMANENT_ERROR_CODES = frozenset({"model_decommissioned", "model_not_found"})
+
+
+def error_code(err: Exception) -> Optional[str]:
+    """Código de error de Groq en el cuerpo de la respuesta (SDK: err.body), si lo hay."""
+    body = getattr(err, "body", None)
+    if isinstance(body, dict):
+        inner = body.get("error", body)
+        code = inner.get("code") if isinstance(inner, dict) else None
+        if isinstance(code, str):
+            return code
+    code = getattr(err, "code", None)
+    return code if isinstance(code, str) else None
+
+
+def is_permanent_error(err: Exception) -> bool:
+    """Modelo retirado o inexistente (no vale la pena reintentar pronto).
+
+    Se mira el código de Groq y no el texto: un 400 propio de la petición (contexto
+    demasiado largo, max_tokens) también menciona al modelo y no debe apartarlo.
+    """
+    return error_code(err) in PERMANENT_ERROR_CODES
+
+
+class _ModelHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.last_latency = None
+        self.opened_until = 0.0
+        self.last_error = None
+        # Hay una petición de prueba en curso (solo en half-open)
+        self.probing = False
+
+    def as_dict(self) -> dict:
+        ok = self.requests - self.failures
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_rate": round(self.failures / self.requests, 4) if self.requests else 0.0,
+            "avg_latency_ms": round(1000 * self.total_latency / ok, 1) if ok else None,
+            "last_latency_ms": round(1000 * self.last_latency, 1) if self.last_latency is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "reopens_in_s": round(max(0.0, self.opened_until - time.monotonic()), 1) if self.state == OPEN else 0.0,
+            "probing": self.probing,
+            "last_error": self.last_error,
+        }
+
+
+class ModelRouter:
+    """Enruta cada turno al último modelo sano y aísla los que fallan."""
+
+    def __init__(self, candidates: List[Optional[str]], failure_threshold: int = FAILURE_THRESHOLD,
+                 cooldown: float = COOLDOWN_SECONDS, clock: Callable[[], float] = time.monotonic):
+        # Quita vacíos y duplicados conservando el orden de preferencia
+        self.candidates = list(dict.fromkeys(m for m in candidates if m))
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._health = {m: _ModelHealth(m) for m in self.candidates}
+        self._preferred = self.candidates[0] if self.candidates else None
+
+    def _refresh(self, h: _ModelHealth, now: float):
+        if h.state == OPEN and now >= h.opened_until:
+            h.state = HALF_OPEN
+
+    def order(self) -> List[str]:
+        """Modelos a probar en este turno: primero el preferido, luego el resto sin circuito abierto."""
+        with self._lock:
+            now = self._clock()
+            for h in self._health.values():
+                self._refresh(h, now)
+            available = [m for m in self.candidates if self._health[m].state != OPEN
+                         and not (self._health[m].state == HALF_OPEN and self._health[m].probing)]
+            if self._preferred in available:
+                available.remove(self._preferred)
+                available.insert(0, self._preferred)
+            return available
+
+    def _acquire(self, model: str) -> bool:
+        """Reserva la petición de prueba de un modelo en half-open; False si otra ya la tiene."""
+        with self._lock:
+            h = self._health[model]
+            self._refresh(h, self._clock())
+            if h.state != HALF_OPEN:
+                return True
+            if h.probing:
+                return False
+            h.probing = True
+            return True
+
+    def _release(self, model: str):
+        with self._lock:
+            self._health[model].probing = False
+
+    def record_success(self, model: str, latency: float):
+        with self._lock:
+            h = self._health[model]
+            h.probing = False
+            h.requests += 1
+            h.total_latency += latency
+            h.last_latency = latency
+            h.consecutive_failures = 0
+            h.state = CLOSED
+            self._preferred = model
+
+    def record_failure(self, model: str, err: Exception, latency: float = 0.0):
+        with self._lock:
+            h = self._health[model]
+            h.probing = False
+            h.requests += 1
+            h.failures += 1
+            h.consecutive_failures += 1
+            h.last_error = f"{type(err).__name__}: {str(err)[:120]}"
+            now = self._clock()
+            if is_permanent_error(err):
+                h.state = OPEN
+                h.opened_until = now + max(self.cooldown, DEPRECATED_COOLDOWN_SECONDS)
+            elif h.state == HALF_OPEN or h.consecutive_failures >= self.failure_threshold:
+                h.state = OPEN
+                h.opened_until = now + self.cooldown
+            if self._preferred == model and h.state == OPEN:
+                self._preferred = None
+
+    def _models_for_turn(self) -> List[str]:
+        models = self.order()
+        if not models:
+            # Todos los circuitos abiertos: prueba el que se reabre antes en lugar de no responder
+            with self._lock:
+                pending = sorted(self._health.values(), key=lambda h: h.opened_until)
+            models = [pending[0].name] if pending else []
+        return models
+
+    def complete(self, call: Callable[[str], str]) -> str:
+        """Ejecuta `call(model)` con el mejor modelo disponible, cayendo al siguiente si falla."""
+        last_err = None
+        for m in self._models_for_turn():
+            if not self._acquire(m):
+                continue
+            start = time.perf_counter()
+            try:
+                result = call(m)
+            except Exception as e:
+                self.record_failure(m, e, time.perf_counter() - start)
+                last_err = e
+                continue
+            except BaseException:
+                self._release(m)
+                raise
+            self.record_success(m, time.perf_counter() - start)
+            return result
+        raise last_err if last_err else RuntimeError("No fue posible generar respuesta")
+
+    async def acomplete(self, call: Callable[[str], Awaitable[str]]) -> str:
+        """Versión asíncrona de complete() para el servidor ASGI."""
+        last_err = None
+        for m in self._models_for_turn():
+            if not self._acquire(m):
+                continue
+            start = time.perf_counter()
+            try:
+                result = await call(m)
+            except Exception as e:
+                self.record_failure(m, e, time.perf_counter() - start)
+                last_err = e
+                continue
+            except BaseException:
+                # Cancelada (p. ej. el cliente colgó): libera la prueba para la próxima petición
+                self._release(m)
+                raise
+            self.record_success(m, time.perf_counter() - start)
+            return result
+        raise last_err if last_err else RuntimeError("No fue posible generar respuesta")
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            for h in self._health.values():
+                self._refresh(h, now)
+            return {
+                "preferred": self._preferred,
+                "models": {m: self._health[m].as_dict() for m in self.candidates},
+            }
@@ -1,19 +1,29 @@
 import os
 import sys
 import argparse
-import tempfile
-from typing import List
+import contextlib
+import time
+from typing import List, Optional
 import threading
 
 from dotenv import load_dotenv
-from groq import Groq
-from gtts import gTTS
-from pygame import mixer
-try:
-    import pyttsx3  # para modo rápido offline
-except ImportError:
-    pyttsx3 = None
-import speech_recognition as sr
+
+from asr import NoSpeechError, RecognitionError, SpeechRecognizer
+from audio_input import AudioInput, MicrophoneSource
+from history_manager import HistoryManager
+from lazy_import import BackgroundTask, lazy_import, preload
+from model_router import ModelRouter
+from topic_filter import TOPIC_KEYWORDS_PATH, KeywordClassifier, ReloadingClassifier
+from streaming_tts import GTTSBackend, Pyttsx3Backend, StreamingSpeaker, iter_groq_deltas
+from tts_cache import default_cache, gtts_synth
+from tts_worker import FEMALE_KEYWORDS, Persona, Pyttsx3Worker
+from turn_store import default_store
+
+# Backends pesados: se importan la primera vez que se usan (ver lazy_import.py).
+# En modo --text no se carga el reconocedor de voz y con --fast no se carga gTTS.
+groq = lazy_import("groq")
+mixer = lazy_import("pygame.mixer")
+pyttsx3 = lazy_import("pyttsx3")  # para modo rápido offline
 
 SYSTEM_PROMPT = (
     "Eres 'Profesora García', una profesora de escuela (primaria/secundaria) que atiende "
@@ -30,52 +40,41 @@ SYSTEM_PROMPT = (
     "\n- Responde en español."
 )
 
+GREETING = "Hola, soy la profesora García. ¿En qué puedo ayudarte hoy sobre la escuela?"
+FAREWELL_MSG = "Gracias por la llamada. ¡Mucho éxito con tus estudios!"
+
+# Segundos de ruido ambiente que se miden al abrir el micrófono (mientras suena el saludo)
+MIC_CALIBRATION_S = float(os.getenv("MIC_CALIBRATION_S", "2"))
+
 REFUSAL_PROMPT = (
     "Lo siento, sólo puedo ayudarte con temas escolares: materias, tareas, horarios, exámenes y normas de la escuela. ¿Quieres reformular tu pregunta?"
 )
 
-ALLOWED_TOPICS: List[str] = [
-    "matemáticas", "geometría", "álgebra", "cálculo", "aritmética",
-    "lengua", "literatura", "gramática", "ortografía",
-    "ciencias", "biología", "física", "química",
-    "historia", "geografía", "cívica",
-    "tareas", "deberes", "proyectos", "trabajos",
-    "horarios", "exámenes", "evaluaciones",
-    "normas", "reglamento", "disciplina",
-    "orientación académica", "estudio", "organización",
-]
+# Listas de palabras clave en topic_filter.py (o en el JSON de TOPIC_KEYWORDS_PATH, que se recarga solo)
+TOPIC_CLASSIFIER = ReloadingClassifier(TOPIC_KEYWORDS_PATH)
 
-FORBIDDEN_KEYWORDS: List[str] = [
-    # categorías prohibidas resumidas
-    "violencia", "sexual", "sexo", "racista", "odioso", "odio",
-    "arma", "amenaza", "autolesión", "suicidio", "ilegal", "droga",
-]
+FAREWELL_CLASSIFIER = KeywordClassifier({"farewell": {"mode": "word", "keywords": [
+    "adiós", "chao", "chau", "hasta luego", "nos vemos",
+    "me voy", "gracias", "bye", "salir", "exit", "quit",
+    "hasta pronto", "me tengo que ir", "ya me voy",
+]}})
 
 
 def is_school_related(user_text: str) -> bool:
-    t = user_text.lower()
+    # Una sola pasada sobre el texto; devuelve qué categorías aparecen
+    found = TOPIC_CLASSIFIER.classify(user_text)
     # Primero verifica contenido prohibido
-    if any(k in t for k in FORBIDDEN_KEYWORDS):
+    if "forbidden" in found:
         return False
     # Ahora es más permisivo: acepta si menciona temas escolares O si la pregunta es genérica y breve
     # (asumimos que en contexto de llamada escolar, preguntas cortas son válidas)
-    is_topic_match = any(topic in t for topic in ALLOWED_TOPICS)
-    is_context_match = any(k in t for k in ["escuela", "colegio", "instituto", "profesor", "clase", "aula", "curso"])
-    is_task_match = any(k in t for k in ["exam", "tarea", "deberes", "materia", "horario", "regla", "norma"])
-    # Acepta preguntas generales si son cortas (probablemente relacionadas con escuela en este contexto)
-    is_short_query = len(t.split()) <= 8
-    return is_topic_match or is_context_match or is_task_match or is_short_query
+    is_short_query = len(user_text.split()) <= 8
+    return bool(found) or is_short_query
 
 
 def is_farewell(user_text: str) -> bool:
     """Detecta si el usuario se está despidiendo."""
-    t = user_text.lower().strip()
-    farewell_words = [
-        "adiós", "adios", "chao", "chau", "hasta luego", "nos vemos",
-        "me voy", "gracias", "bye", "salir", "exit", "quit",
-        "hasta pronto", "me tengo que ir", "ya me voy"
-    ]
-    return any(fw in t for fw in farewell_words)
+    return bool(FAREWELL_CLASSIFIER.classify(user_text))
 
 
 def clean_for_speech(text: str) -> str:
@@ -99,7 +98,7 @@ def clean_for_speech(text: str) -> str:
     return text.strip()
 
 
-def make_client() -> Groq:
+def make_client() -> "groq.Groq":
     load_dotenv()
     # Intenta primero la clave cifrada, luego la plana (compatibilidad)
     api_key = os.getenv("GROQ_API_KEY_ENCRYPTED")
@@ -119,36 +118,70 @@ def make_client() -> Groq:
         print("Error: Falta la variable de entorno GROQ_API_KEY o GROQ_API_KEY_ENCRYPTED.")
         print("Configúrala en PowerShell: $env:GROQ_API_KEY = \"TU_API_KEY\"")
         sys.exit(1)
-    return Groq(api_key=api_key)
-
-
-def chat(client: Groq, messages: List[dict]) -> str:
-    # Selección de modelo con fallback por deprecaciones
-    env_model = os.getenv("GROQ_MODEL")
-    candidate_models = [
-        env_model,
-        # Modelos de producción actuales (nov 2025)
-        "llama-3.3-70b-versatile",
-        "llama-3.1-8b-instant",
-        "openai/gpt-oss-20b",
-        "openai/gpt-oss-120b",
-    ]
-    last_err = None
-    for m in [cm for cm in candidate_models if cm]:
-        try:
-            completion = client.chat.completions.create(
-                model=m,
-                messages=messages,
-                temperature=0.2,
-                max_tokens=512,
-            )
-            return completion.choices[0].message.content.strip()
-        except Exception as e:
-            last_err = e
-            # Intenta el siguiente modelo si hay deprecación u otro error
-            continue
+    return groq.Groq(api_key=api_key)
+
+
+# Selección de modelo con fallback por deprecaciones (GROQ_MODEL puede venir del .env)
+load_dotenv()
+CANDIDATE_MODELS = [
+    os.getenv("GROQ_MODEL"),
+    # Modelos de producción actuales (nov 2025)
+    "llama-3.3-70b-versatile",
+    "llama-3.1-8b-instant",
+    "openai/gpt-oss-20b",
+    "openai/gpt-oss-120b",
+]
+
+# Recuerda el modelo que funcionó para no pagar un fallo por turno si uno está retirado
+ROUTER = ModelRouter(CANDIDATE_MODELS)
+
+
+def chat(client: "groq.Groq", messages: List[dict], usage: Optional[dict] = None) -> str:
+    def _call(model: str) -> str:
+        completion = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=512,
+        )
+        if usage is not None:
+            # Modelo que respondió y tokens cobrados, para guardarlos con el turno
+            usage["model"] = model
+            usage["total_tokens"] = completion.usage.total_tokens if completion.usage else None
+        return completion.choices[0].message.content.strip()
+
     # Si todos fallan, propaga el último error
-    raise last_err if last_err else RuntimeError("No fue posible generar respuesta")
+    return ROUTER.complete(_call)
+
+
+def chat_stream(client: "groq.Groq", messages: List[dict], usage: Optional[dict] = None):
+    """Como chat(), pero devuelve los tokens a medida que el modelo los genera."""
+    opened = {}
+
+    def _open(model: str):
+        opened["model"] = model
+        if usage is not None:
+            usage["model"] = model
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=512,
+            stream=True,
+        )
+
+    stream = ROUTER.complete(_open)
+    return _report_stream_errors(iter_groq_deltas(stream, usage), opened["model"])
+
+
+def _report_stream_errors(tokens, model: str):
+    """El router solo mide la apertura del stream; si se corta a mitad, también cuenta como fallo del modelo."""
+    start = time.perf_counter()
+    try:
+        yield from tokens
+    except Exception as e:
+        ROUTER.record_failure(model, e, time.perf_counter() - start)
+        raise
 
 
 def run_call_simulation():
@@ -158,140 +191,165 @@ def run_call_simulation():
     parser.add_argument("--volume", type=float, default=None, help="Volumen de voz (0.0 a 1.0)")
     parser.add_argument("--text", action="store_true", help="Usa entrada de texto en lugar de micrófono")
     parser.add_argument("--fast", action="store_true", help="Modo voz rápido (pyttsx3) en lugar de gTTS")
+    parser.add_argument("--stream", action="store_true", help="Habla cada oración mientras se genera el resto de la respuesta")
+    parser.add_argument("--barge-in", action="store_true", help="Si el alumno habla encima, la profesora se calla y lo escucha")
     args = parser.parse_args()
 
-    print("Profesora García: Hola, soy la profesora García. ¿En qué puedo ayudarte hoy sobre la escuela?")
+    print(f"Profesora García: {GREETING}")
+    # El cliente de Groq y la regex del filtro de temas se preparan mientras suena el saludo
+    preload(groq)
+    BackgroundTask(TOPIC_CLASSIFIER.warm, name="filtro-temas")
     
     is_muted = bool(args.mute)
-    fast_mode = bool(args.fast) and pyttsx3 is not None
-
-    # Inicializa pygame mixer (se usa también para gTTS)
-    mixer.init()
+    fast_mode = bool(args.fast) and pyttsx3.available()
 
     # Parámetros comunes
     playback_volume = 0.8 if args.volume is None else max(0.0, min(1.0, float(args.volume)))
     playback_speed_wpm = args.rate if args.rate else 180
+    audio = None
+
+    @contextlib.contextmanager
+    def playing(stop, announce: bool = True):
+        """Marca la reproducción para el micrófono: su eco no cuenta como frase del alumno.
+        Con --barge-in, si el alumno habla encima se llama a stop() y su frase pasa al reconocedor."""
+        if audio is None:
+            yield
+            return
+        with audio.playback(on_barge_in=stop if args.barge_in else None):
+            yield
+        if announce and audio.barged_in:
+            print("   [✋ Te escucho...]")
 
     if fast_mode:
-        # pyttsx3 inicialización rápida offline
-        engine = pyttsx3.init()
-        # Selección de voz femenina española si existe
-        try:
-            voices = engine.getProperty('voices')
-            es_female = next((v for v in voices if 'es' in (v.id.lower()+v.name.lower()) and any(f in (v.id.lower()+v.name.lower()) for f in ['female','mujer','carmen','laura','julia'])), None)
-            es_any = es_female or next((v for v in voices if 'es' in (v.id.lower()+v.name.lower())), None)
-            if es_any:
-                engine.setProperty('voice', es_any.id)
-            if args.rate:
-                # pyttsx3 usa rate arbitrario (default ~200). Ajustamos proporcional.
-                engine.setProperty('rate', int(playback_speed_wpm))
-            engine.setProperty('volume', playback_volume)
-        except Exception:
-            pass
+        # Un solo motor pyttsx3 en su propio hilo; la voz femenina española se elige una vez.
+        # pyttsx3 usa rate arbitrario (default ~200): solo se fija si se pidió --rate.
+        voice = Pyttsx3Worker({"profesora": Persona(FEMALE_KEYWORDS, rate=args.rate,
+                                                    volume=playback_volume)}).start()
 
         def speak(text: str):
             if is_muted:
                 return
-            def _run():
-                try:
-                    engine.say(text)
-                    engine.runAndWait()
-                    # Pausa para evitar capturar la propia voz
-                    import time
-                    time.sleep(0.5)
-                except Exception:
-                    pass
-            t = threading.Thread(target=_run, daemon=True)
-            t.start()
-            t.join()  # Espera a que termine de hablar antes de escuchar
+            # Espera a que termine de hablar (o a que el alumno la interrumpa)
+            with playing(voice.cancel):
+                voice.speak(text, "profesora")
+
+        def make_stream_backend():
+            return Pyttsx3Backend(voice, "profesora")
     else:
         # gTTS configuración
         tld = os.getenv("GTTS_TLD", "es")  # 'es' para España, 'com.mx' para México
-        # Cache simple de frases ya sintetizadas para acelerar repetición
-        tts_cache = {}
+        # Caché en disco compartida entre llamadas y procesos (ver tts_cache.py --prewarm)
+        tts_cache = default_cache()
+        # pygame mixer solo hace falta para reproducir los mp3 de gTTS
+        mixer.init()
 
         def speak(text: str):
             if is_muted:
                 return
             def _run():
                 try:
-                    cache_key = (text, playback_volume, playback_speed_wpm, tld)
-                    if cache_key in tts_cache:
-                        tmp_path = tts_cache[cache_key]
-                    else:
-                        tts = gTTS(text=text, lang='es', tld=tld, slow=False)
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-                            tmp_path = tmp.name
-                        tts.save(tmp_path)
-                        tts_cache[cache_key] = tmp_path
-                    mixer.music.load(tmp_path)
+                    # El volumen se aplica al reproducir: no cambia el audio sintetizado
+                    audio_path = tts_cache.get_or_create(
+                        text, gtts_synth(text, tld=tld), lang='es', tld=tld, engine='gtts')
+                    mixer.music.load(audio_path)
                     mixer.music.set_volume(playback_volume)
-                    mixer.music.play()
-                    # Espera a que termine de reproducir
-                    while mixer.music.get_busy():
-                        import time
-                        time.sleep(0.1)
-                    # Pausa adicional para evitar capturar eco
-                    time.sleep(0.5)
+                    with playing(mixer.music.stop):
+                        mixer.music.play()
+                        # Espera a que termine de reproducir (o a que el alumno la interrumpa)
+                        while mixer.music.get_busy():
+                            time.sleep(0.05)
                 except Exception:
                     pass
             t = threading.Thread(target=_run, daemon=True)
             t.start()
             t.join()  # Bloquea hasta que termine de hablar
+
+        def make_stream_backend():
+            return GTTSBackend(lang='es', tld=tld, volume=playback_volume, cache=tts_cache)
     
-    # Configura reconocimiento de voz
-    recognizer = sr.Recognizer()
-    microphone = sr.Microphone()
-    
-    # Ajustes óptimos para reconocimiento
-    recognizer.energy_threshold = 4000  # Umbral de energía para detectar voz (más alto = menos sensible a ruido)
-    recognizer.dynamic_energy_threshold = True  # Ajusta automáticamente
-    recognizer.pause_threshold = 0.8  # Segundos de silencio para considerar que terminaste de hablar
-    recognizer.phrase_threshold = 0.3  # Mínimo de audio antes de considerar que es habla
-    recognizer.non_speaking_duration = 0.5  # Tiempo de silencio antes de procesar
-    
-    # Ajusta ruido ambiente
-    print("[Calibrando micrófono... espera un momento en silencio]")
-    with microphone as source:
-        recognizer.adjust_for_ambient_noise(source, duration=2)
-    print("[✓ Listo! Habla cuando veas el 🎤]\n")
+    # Configura reconocimiento de voz (en modo texto no se abre el micrófono)
+    recognizer = None
+    if not args.text:
+        # Backend según ASR_BACKEND (google, vosk, whisper; ver asr.py). Con Vosk el texto se
+        # decodifica mientras el alumno habla y los parciales se muestran en la misma línea.
+        recognizer = SpeechRecognizer(on_partial=lambda text: print(f"   … {text}", end="\r", flush=True))
+        recognizer.warm()
+        # Micrófono abierto toda la llamada (ver audio_input.py); el ruido ambiente se mide
+        # mientras suena el saludo y la primera escucha espera a que termine
+        print("[Calibrando micrófono en segundo plano...]")
+        try:
+            audio = AudioInput(
+                # whisper.cpp necesita 16 kHz; los demás usan la frecuencia del micrófono
+                MicrophoneSource(sample_rate=getattr(recognizer.backend, "SAMPLE_RATE", None)),
+                energy_threshold=4000,  # Umbral de energía para detectar voz (más alto = menos sensible a ruido)
+                dynamic_energy_threshold=True,  # Ajusta automáticamente
+                pause_threshold=0.8,  # Segundos de silencio para considerar que terminaste de hablar
+                phrase_threshold=0.3,  # Mínimo de audio antes de considerar que es habla
+                non_speaking_duration=0.5,  # Silencio que se conserva al final de la frase
+                phrase_time_limit=10,  # Frases de hasta 10 seg
+                calibration_s=MIC_CALIBRATION_S,
+            ).start()
+            recognizer.attach(audio)
+        except Exception as e:
+            print(f"[⚠️ No se pudo abrir el micrófono: {e}. Prueba con --text]")
+            recognizer.close()
+            return
     
+    # Duración de la última frase del alumno (solo con micrófono), para guardarla con su turno
+    last_phrase_s = None
+
     def get_user_input() -> str:
         """Obtiene entrada del usuario por micrófono o texto."""
+        nonlocal last_phrase_s
+        last_phrase_s = None
         if args.text:
             return input("Alumno (texto): ").strip()
         
         print("🎤 Escuchando...")
         try:
-            with microphone as source:
-                # Espera hasta 5 seg por habla, permite frases de hasta 10 seg
-                audio = recognizer.listen(source, timeout=5, phrase_time_limit=10)
+            # Espera hasta 5 seg a que empiece la voz (una frase dicha encima de la profesora ya está aquí)
+            phrase = audio.listen(timeout=5)
+            if phrase is None:
+                if audio.error is not None:
+                    print(f"   [❌ El micrófono dejó de entregar audio: {audio.error}]")
+                    raise EOFError
+                print("   [⏱️ No escuché nada en 5 segundos]")
+                return ""
             
+            last_phrase_s = phrase.duration_s
             print("   Procesando...")
-            # Transcripción en tiempo real - sin bloqueo
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(recognizer.recognize_google, audio, language="es-ES")
-                text = future.result(timeout=10)
+            # Pool de hilos del reconocedor, compartido por toda la llamada
+            text = recognizer.transcribe(phrase, timeout=10)
             
             print(f"   Alumno: {text}")
-            return text.strip()
-        except sr.WaitTimeoutError:
-            print("   [⏱️ No escuché nada en 5 segundos]")
-            return ""
-        except sr.UnknownValueError:
+            return text
+        except NoSpeechError:
             print("   [❓ No entendí lo que dijiste, repite por favor]")
             return ""
-        except sr.RequestError as e:
+        except RecognitionError as e:
             print(f"   [❌ Error del servicio de reconocimiento: {e}]")
             return ""
         except KeyboardInterrupt:
             raise
 
-    speak("Hola, soy la profesora García. ¿En qué puedo ayudarte hoy sobre la escuela?")
+    # Turnos al esquema talkia (TALKIA_DB_URL); add_turn() solo encola, no frena el audio
+    turns = default_store()
+    sesion_id = turns.start_session(contexto_inicial="profesor_llamada (" + ("texto" if args.text else "voz") + ")")
+
+    def speak_turn(text: str, tema: Optional[str] = None, usage: Optional[dict] = None):
+        """speak() y guarda el turno de la profesora con lo que duró el audio."""
+        start = time.perf_counter()
+        speak(text)
+        duration = None if is_muted else time.perf_counter() - start
+        usage = usage or {}
+        turns.add_turn(sesion_id, "Profesora", text, tema=tema, duracion_audio=duration,
+                       modelo_ia_usado=usage.get("model"), tokenes_consumidos=usage.get("total_tokens"))
+
+    speak_turn(GREETING)
     client = make_client()
 
-    history: List[dict] = [{"role": "system", "content": SYSTEM_PROMPT}]
+    # Sistema + últimos turnos textuales; lo más viejo se resume para no crecer sin límite
+    history = HistoryManager(SYSTEM_PROMPT)
 
     while True:
         try:
@@ -303,11 +361,16 @@ def run_call_simulation():
         if not user_text:
             continue
 
+        # Los comandos (/mute, /rate...) no son turnos de la conversación
+        tema = None
+        if not (args.text and user_text.startswith("/")):
+            tema = TOPIC_CLASSIFIER.topic(user_text)
+            turns.add_turn(sesion_id, "Alumno", user_text, tema=tema, duracion_audio=last_phrase_s)
+
         # Detecta despedidas
         if is_farewell(user_text):
-            farewell_msg = "Gracias por la llamada. ¡Mucho éxito con tus estudios!"
-            print(f"Profesora García: {farewell_msg}")
-            speak(farewell_msg)
+            print(f"Profesora García: {FAREWELL_MSG}")
+            speak_turn(FAREWELL_MSG, tema)
             break
 
         # Comandos de control en tiempo real (solo en modo texto)
@@ -325,8 +388,8 @@ def run_call_simulation():
                 try:
                     new_rate = int(cmd.split()[1])
                     playback_speed_wpm = new_rate
-                    if fast_mode and pyttsx3 is not None:
-                        engine.setProperty('rate', int(playback_speed_wpm))
+                    if fast_mode:
+                        voice.set_rate(int(playback_speed_wpm))
                     print(f"Profesora García: Velocidad ajustada a {new_rate} wpm.")
                 except Exception:
                     print("Profesora García: No pude ajustar la velocidad. Usa /rate <entero>.")
@@ -335,8 +398,8 @@ def run_call_simulation():
                 try:
                     new_vol = float(cmd.split()[1])
                     playback_volume = max(0.0, min(1.0, new_vol))
-                    if fast_mode and pyttsx3 is not None:
-                        engine.setProperty('volume', playback_volume)
+                    if fast_mode:
+                        voice.set_volume(playback_volume)
                     print(f"Profesora García: Volumen ajustado a {playback_volume}.")
                 except Exception:
                     print("Profesora García: No pude ajustar el volumen. Usa /volume <0.0-1.0>.")
@@ -346,16 +409,45 @@ def run_call_simulation():
 
         if not is_school_related(user_text):
             print(f"Profesora García: {REFUSAL_PROMPT}")
-            speak(REFUSAL_PROMPT)
+            speak_turn(REFUSAL_PROMPT, tema)
             continue
 
         history.append({"role": "user", "content": user_text})
+
+        if args.stream:
+            # Streaming: cada oración se sintetiza y reproduce mientras llega la siguiente
+            print("Profesora García: ", end="", flush=True)
+            speaker = StreamingSpeaker(make_stream_backend(), clean=clean_for_speech)
+            usage = {}
+            try:
+                with playing(speaker.interrupt, announce=False):
+                    response = speaker.speak_stream(
+                        chat_stream(client, history.messages(), usage),
+                        on_token=lambda tok: print(tok, end="", flush=True),
+                        muted=is_muted,
+                    )
+            except Exception as e:
+                print(f"\nProfesora García: Hubo un problema al responder (API). {e}")
+                continue
+            print()
+            ttfa = speaker.last_metrics.get("first_audio_s")
+            if ttfa is not None:
+                print(f"   [⏱️ primer audio en {ttfa:.2f}s, {speaker.last_metrics['sentences']} oraciones]")
+            if speaker.last_metrics.get("interrupted"):
+                print("   [✋ Te escucho...]")
+            if response:
+                history.append({"role": "assistant", "content": response})
+                turns.add_turn(sesion_id, "Profesora", response, tema=tema,
+                               duracion_audio=None if is_muted else speaker.last_metrics.get("audio_s"),
+                               modelo_ia_usado=usage.get("model"), tokenes_consumidos=usage.get("total_tokens"))
+            continue
         
         # Muestra indicador de que está pensando
         print("Profesora García: [pensando...]", end="\r")
         
+        usage = {}
         try:
-            response = chat(client, history)
+            response = chat(client, history.messages(), usage)
         except Exception as e:
             print(f"Profesora García: Hubo un problema al responder (API). {e}")
             continue
@@ -363,8 +455,35 @@ def run_call_simulation():
         # Limpia línea de "pensando" y muestra respuesta
         print(" " * 50, end="\r")  # Limpia la línea
         print(f"Profesora García: {response}")
+        start = time.perf_counter()
         speak(clean_for_speech(response))
+        duration = None if is_muted else time.perf_counter() - start
         history.append({"role": "assistant", "content": response})
+        turns.add_turn(sesion_id, "Profesora", response, tema=tema, duracion_audio=duration,
+                       modelo_ia_usado=usage.get("model"), tokenes_consumidos=usage.get("total_tokens"))
+
+    if fast_mode:
+        tts = voice.stats()
+        print(f"[🔊 Voz: {tts['spoken']} frases, espera en cola p95 {tts['queue_wait']['p95_ms']} ms, "
+              f"habla media {tts['speak']['mean_ms']} ms]")
+        voice.stop()
+    if audio is not None:
+        mic = audio.stats()
+        print(f"[🎤 Micrófono: {mic['phrases']} frases, {mic['echo_dropped']} ecos descartados, "
+              f"{mic['barge_ins']} interrupciones]")
+        audio.stop()
+    if recognizer is not None:
+        rec = recognizer.stats()
+        print(f"[📝 Reconocimiento ({rec['backend']}): {rec['phrases']} frases, "
+              f"espera del texto final {rec['final_wait_ms']} ms, {rec['partials']} parciales]")
+        recognizer.close()
+    if turns.enabled:
+        turns.end_session(sesion_id)
+        # Lo que quede en la cola se escribe antes de salir
+        turns.flush()
+        saved = turns.stats()
+        print(f"[💾 Turnos guardados: {saved['turns_written']} en {saved['batches']} lotes, "
+              f"flush p95 {saved['flush_ms']['p95']} ms, {saved['dropped']} descartados]")
 
 
 if __name__ == "__main__":
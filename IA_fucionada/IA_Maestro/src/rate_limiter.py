@@ -0,0 +1,239 @@
+"""
+Limitador de cuota para la API de Groq: cubetas de tokens corregidas con los encabezados de cada respuesta.
+
+Groq informa en cada respuesta cuánto queda de la cuota:
+
+    x-ratelimit-limit-requests / x-ratelimit-remaining-requests / x-ratelimit-reset-requests
+    x-ratelimit-limit-tokens   / x-ratelimit-remaining-tokens   / x-ratelimit-reset-tokens
+    retry-after (en las respuestas 429)
+
+GroqRateLimiter lleva dos cubetas, peticiones y tokens por minuto. Arranca con los
+límites del plan (GROQ_LIMIT_RPM / GROQ_LIMIT_TPM, por defecto los del plan gratuito
+de llama-3.1-8b-instant) y se ajusta con cada respuesta. acquire() solo espera cuando
+la cuota de verdad no alcanza, en lugar de pausas fijas "para evitar rate limit".
+
+    python rate_limiter.py --requests 40 --tokens 450   # simula una ráfaga con los límites por defecto
+"""
+import argparse
+import asyncio
+import os
+import re
+import threading
+import time
+from typing import Callable, Iterable, Mapping, Optional
+
+from history_manager import message_tokens
+
+GROQ_LIMIT_RPM = float(os.getenv("GROQ_LIMIT_RPM", "30"))
+GROQ_LIMIT_TPM = float(os.getenv("GROQ_LIMIT_TPM", "6000"))
+
+# "2m59.56s", "7.66s", "120ms", "1h2m"
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Segundos de un encabezado de Groq ("2m59.56s") o de retry-after ("3")."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _UNITS[unit] for n, unit in parts)
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def estimate_request_tokens(messages: Iterable[dict], max_tokens: int) -> int:
+    """Lo que una petición descuenta de la cuota por minuto: prompt estimado + respuesta máxima."""
+    return sum(message_tokens(m) for m in messages) + max_tokens
+
+
+class TokenBucket:
+    """Cubeta clásica: capacidad, recarga continua y nivel que puede quedar en deuda."""
+
+    __slots__ = ("capacity", "refill_per_s", "level", "_updated")
+
+    def __init__(self, capacity: float, refill_per_s: float, now: float):
+        self.capacity = capacity
+        self.refill_per_s = refill_per_s
+        self.level = capacity
+        self._updated = now
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.refill_per_s)
+            self._updated = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        self._refill(now)
+        missing = min(cost, self.capacity) - self.level
+        if missing <= 0:
+            return 0.0
+        return missing / self.refill_per_s if self.refill_per_s > 0 else float("inf")
+
+    def take(self, cost: float, now: float):
+        self._refill(now)
+        self.level -= cost
+
+    def sync(self, remaining: float, limit: Optional[float], now: float, authoritative: bool):
+        """Ajusta la cubeta a lo que dice el servidor.
+
+        authoritative=False para cuotas de otra ventana (las peticiones de Groq son por día):
+        solo pueden bajar el nivel, nunca subirlo por encima del límite por minuto.
+        """
+        self._refill(now)
+        if authoritative:
+            if limit:
+                # La cuota es por minuto: el límite real manda sobre el del plan configurado
+                self.capacity = limit
+                self.refill_per_s = limit / 60.0
+            self.level = remaining
+        else:
+            self.level = min(self.level, remaining)
+
+
+class GroqRateLimiter:
+    """Reparte la cuota de Groq entre los turnos; seguro entre hilos."""
+
+    def __init__(self, rpm: float = GROQ_LIMIT_RPM, tpm: float = GROQ_LIMIT_TPM,
+                 clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        now = clock()
+        self.requests = TokenBucket(rpm, rpm / 60.0, now)
+        self.tokens = TokenBucket(tpm, tpm / 60.0, now)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"acquired": 0, "waits": 0, "waited_s": 0.0, "header_updates": 0, "retry_after": 0}
+
+    def _delay(self, cost: float, now: float) -> float:
+        return max(self._paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(cost, now))
+
+    def delay(self, cost: float) -> float:
+        """Segundos que habría que esperar ahora para una petición de `cost` tokens."""
+        with self._lock:
+            return self._delay(cost, self._clock())
+
+    def try_acquire(self, cost: float) -> bool:
+        """Reserva sin esperar; False si la cuota no alcanza ahora."""
+        with self._lock:
+            now = self._clock()
+            if self._delay(cost, now) > 0:
+                return False
+            self._take(cost, now)
+            return True
+
+    def acquire(self, cost: float, timeout: Optional[float] = None) -> float:
+        """Espera lo justo y reserva. Devuelve los segundos esperados (TimeoutError si excede timeout)."""
+        start = self._clock()
+        slept = False
+        while True:
+            with self._lock:
+                now = self._clock()
+                delay = self._delay(cost, now)
+                if delay <= 0:
+                    return self._take(cost, now, start if slept else None)
+            if timeout is not None and now - start + delay > timeout:
+                raise TimeoutError(f"La cuota de Groq no alcanza en {timeout}s (faltan {delay:.1f}s)")
+            # Otro hilo puede actualizar la cuota mientras tanto: se revisa al menos cada segundo
+            time.sleep(min(delay, 1.0))
+            slept = True
+
+    async def acquire_async(self, cost: float) -> float:
+        """Como acquire(), pero cede el bucle de asyncio mientras espera."""
+        start = self._clock()
+        slept = False
+        while True:
+            with self._lock:
+                now = self._clock()
+                delay = self._delay(cost, now)
+                if delay <= 0:
+                    return self._take(cost, now, start if slept else None)
+            await asyncio.sleep(min(delay, 1.0))
+            slept = True
+
+    def _take(self, cost: float, now: float, start: Optional[float] = None) -> float:
+        """Descuenta la petición; start es cuándo empezó a esperar (None si no tuvo que esperar)."""
+        self.requests.take(1, now)
+        self.tokens.take(cost, now)
+        self._stats["acquired"] += 1
+        waited = now - start if start is not None else 0.0
+        if waited > 0:
+            self._stats["waits"] += 1
+            self._stats["waited_s"] += waited
+        return waited
+
+    def update(self, headers: Mapping[str, str]):
+        """Corrige las cubetas con los encabezados x-ratelimit-* y retry-after de una respuesta."""
+        h = {k.lower(): v for k, v in headers.items()}
+        with self._lock:
+            now = self._clock()
+            seen = False
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                remaining = _number(h.get(f"x-ratelimit-remaining-{kind}"))
+                if remaining is None:
+                    continue
+                seen = True
+                bucket.sync(remaining, _number(h.get(f"x-ratelimit-limit-{kind}")), now,
+                            authoritative=(kind == "tokens"))
+                reset_s = parse_duration(h.get(f"x-ratelimit-reset-{kind}"))
+                if kind == "requests" and remaining <= 0 and reset_s:
+                    # Cuota diaria agotada: nada hasta que se reponga
+                    self._paused_until = max(self._paused_until, now + reset_s)
+            retry_after = parse_duration(h.get("retry-after"))
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+                self._stats["retry_after"] += 1
+            if seen:
+                self._stats["header_updates"] += 1
+
+    def pause(self, seconds: float):
+        """Nadie pide nada durante `seconds` (429 sin retry-after: backoff)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            now = self._clock()
+            self.tokens._refill(now)
+            self.requests._refill(now)
+            stats["tokens_available"] = round(self.tokens.level)
+            stats["requests_available"] = round(self.requests.level, 1)
+        stats["waited_s"] = round(stats["waited_s"], 3)
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula una ráfaga de peticiones contra el limitador")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--tokens", type=int, default=450, help="Tokens por petición (prompt + respuesta)")
+    parser.add_argument("--rpm", type=float, default=GROQ_LIMIT_RPM)
+    parser.add_argument("--tpm", type=float, default=GROQ_LIMIT_TPM)
+    args = parser.parse_args()
+
+    # Reloj simulado: la ráfaga no espera de verdad
+    now = [0.0]
+    limiter = GroqRateLimiter(args.rpm, args.tpm, clock=lambda: now[0])
+    waits = []
+    for _ in range(args.requests):
+        delay = limiter.delay(args.tokens)
+        now[0] += delay
+        limiter.acquire(args.tokens)
+        waits.append(delay)
+    print(f"📊 {args.requests} peticiones de {args.tokens} tokens: {sum(1 for w in waits if w > 0)} esperas, "
+          f"{sum(waits):.1f}s en total, última a los {now[0]:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 import os
-from flask import Flask, request, Response
+from flask import Flask, request, Response, jsonify
 from dotenv import load_dotenv
 from groq import Groq
 from gtts import gTTS
 import tempfile
+from typing import Optional
+
+from groq_pool import get_client, pool_stats
+from model_router import ModelRouter
+from session_store import SessionStore
+from topic_filter import TOPIC_KEYWORDS_PATH, ReloadingClassifier
+from turn_store import default_store
+from twiml import build_static, is_farewell, say_twiml
 
 app = Flask(__name__)
 
@@ -11,7 +19,7 @@ load_dotenv()
 
 # Utilidad: cliente Groq
 
-def make_client() -> Groq:
+def resolve_api_key() -> str:
     api_key = os.getenv("GROQ_API_KEY_ENCRYPTED")
     if api_key:
         try:
@@ -26,7 +34,11 @@ def make_client() -> Groq:
     
     if not api_key:
         raise RuntimeError("Falta GROQ_API_KEY o GROQ_API_KEY_ENCRYPTED en entorno o .env")
-    return Groq(api_key=api_key)
+    return api_key
+
+
+def make_client(http_client=None) -> Groq:
+    return Groq(api_key=resolve_api_key(), http_client=http_client)
 
 # Modelos de fallback
 CANDIDATE_MODELS = [
@@ -37,6 +49,19 @@ CANDIDATE_MODELS = [
     "openai/gpt-oss-120b",
 ]
 
+# Recuerda el último modelo sano y abre el circuito de los que fallan
+ROUTER = ModelRouter(CANDIDATE_MODELS)
+
+# Historial por llamada (CallSid), acotado y con expulsión de llamadas inactivas
+SESSIONS = SessionStore()
+
+# TwiML fijo (y audio opcional) compilado una vez al arrancar
+STATIC = build_static()
+
+# Turnos al esquema talkia (TALKIA_DB_URL): aquí solo se encolan, el INSERT va por lotes en otro hilo
+TURNS = default_store()
+TOPICS = ReloadingClassifier(TOPIC_KEYWORDS_PATH)
+
 SYSTEM_PROMPT = (
     "Eres 'Profesora García', una profesora de escuela (primaria/secundaria) que atiende "
     "una llamada telefónica de un alumno. Responde únicamente sobre temas escolares: materias, "
@@ -46,22 +71,37 @@ SYSTEM_PROMPT = (
 )
 
 
-def groq_chat(messages: list[dict]) -> str:
-    client = make_client()
-    last_err = None
-    for m in [cm for cm in CANDIDATE_MODELS if cm]:
-        try:
-            completion = client.chat.completions.create(
-                model=m,
-                messages=messages,
-                temperature=0.2,
-                max_tokens=512,
-            )
-            return completion.choices[0].message.content.strip()
-        except Exception as e:
-            last_err = e
-            continue
-    raise last_err if last_err else RuntimeError("No fue posible generar respuesta")
+def groq_chat(messages: list[dict], usage: Optional[dict] = None) -> str:
+    # Cliente único por proceso (pool keep-alive); solo se construye en la primera llamada
+    client = get_client("groq", make_client)
+
+    def _call(model: str) -> str:
+        completion = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.2,
+            max_tokens=512,
+        )
+        if usage is not None:
+            # Modelo que respondió y tokens cobrados, para guardarlos con el turno
+            usage["model"] = model
+            usage["total_tokens"] = completion.usage.total_tokens if completion.usage else None
+        return completion.choices[0].message.content.strip()
+
+    return ROUTER.complete(_call)
+
+
+def record_exchange(call_sid: str, user_text: str, response: Optional[str] = None,
+                    usage: Optional[dict] = None):
+    """Encola la pregunta del alumno (y la respuesta de la profesora) en TURNS; no espera a la base."""
+    if not TURNS.enabled or not call_sid:
+        return
+    tema = TOPICS.topic(user_text)
+    TURNS.add_turn(call_sid, "Alumno", user_text, tema=tema)
+    if response is not None:
+        usage = usage or {}
+        TURNS.add_turn(call_sid, "Profesora", response, tema=tema, modelo_ia_usado=usage.get("model"),
+                       tokenes_consumidos=usage.get("total_tokens"))
 
 
 def clean_for_speech(text: str) -> str:
@@ -84,70 +124,88 @@ def clean_for_speech(text: str) -> str:
     return text.strip()
 
 
+def static_response(asset):
+    # Cuerpo ya compilado. ETag y 304 solo en GET/HEAD (los audios): los webhooks de
+    # Twilio son POST, y a un POST condicional RFC 9110 le corresponde 412, no 304
+    if request.method not in ("GET", "HEAD"):
+        return Response(asset.body, mimetype=asset.mimetype)
+    if asset.not_modified(request.headers.get("If-None-Match")):
+        return Response(b"", status=304, headers=asset.headers)
+    return Response(asset.body, mimetype=asset.mimetype, headers=asset.headers)
+
+
 @app.post("/voice")
 def voice_welcome():
-    # TwiML de bienvenida y redirige a /respond con recogida de voz
-    twiml = (
-        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
-        "<Response>"
-        "  <Say language=\"es-ES\">Hola, soy la profesora García. Habla después del tono.</Say>"
-        "  <Gather input=\"speech\" language=\"es-ES\" action=\"/respond\" timeout=\"5\" speechTimeout=\"auto\">"
-        "    <Say language=\"es-ES\">Puedes hacer preguntas sobre materias, tareas, horarios y normas escolares.</Say>"
-        "  </Gather>"
-        "</Response>"
-    )
-    return Response(twiml, mimetype="text/xml")
+    call_sid = request.form.get("CallSid")
+    # Twilio vuelve a /voice después de cada turno; TURNS registra la sesión solo la primera vez
+    if call_sid:
+        TURNS.start_session(call_sid)
+    return static_response(STATIC.twiml["welcome"])
 
 
 @app.post("/respond")
 def voice_respond():
     # Texto transcrito por Twilio
     user_text = request.form.get("SpeechResult", "").strip()
+    call_sid = request.form.get("CallSid", "")
     # Si no se entendió, pide repetir
     if not user_text:
-        twiml = (
-            "<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
-            "<Response>"
-            "  <Say language=\"es-ES\">No te entendí, intenta de nuevo.</Say>"
-            "  <Redirect method=\"POST\">/voice</Redirect>"
-            "</Response>"
-        )
-        return Response(twiml, mimetype="text/xml")
+        return static_response(STATIC.twiml["no_input"])
+
+    # Fin de llamada si el usuario se despide (no hace falta consultar al modelo)
+    if is_farewell(user_text):
+        SESSIONS.end(call_sid)
+        record_exchange(call_sid, user_text)
+        TURNS.end_session(call_sid)
+        return static_response(STATIC.twiml["farewell"])
 
     # Genera respuesta con Groq
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_text},
-    ]
+    user_message = {"role": "user", "content": user_text}
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}] + SESSIONS.history(call_sid) + [user_message]
+    usage = {}
     try:
-        response = groq_chat(messages)
-    except Exception as e:
-        response = "Hubo un problema con el servicio. Intenta más tarde."
+        response = groq_chat(messages, usage)
+        SESSIONS.append(call_sid, user_message, {"role": "assistant", "content": response})
+    except Exception:
+        return static_response(STATIC.twiml["error"])
+    record_exchange(call_sid, user_text, response, usage)
 
     # Limpia para TTS
     speak_text = clean_for_speech(response)
+    return Response(say_twiml(speak_text), mimetype="text/xml")
+
+
+@app.get("/audio/<filename>")
+def static_audio(filename):
+    # Audios pre-sintetizados de las frases fijas (TWIML_PLAY_AUDIO=1)
+    asset = STATIC.audio.get(filename)
+    if asset is None:
+        return Response("", status=404)
+    return static_response(asset)
+
+
+@app.get("/metrics/pool")
+def metrics_pool():
+    # Contadores del registro de clientes: si connections_new no crece por turno, no hay handshakes
+    return jsonify(pool_stats())
+
+
+@app.get("/metrics/models")
+def metrics_models():
+    # Latencia, tasa de error y estado del circuito por modelo
+    return jsonify(ROUTER.stats())
+
+
+@app.get("/metrics/sessions")
+def metrics_sessions():
+    # Llamadas vivas, expulsiones y bytes de historial en memoria
+    return jsonify(SESSIONS.stats())
 
-    # Opción 1: decir directo con TwiML <Say>
-    twiml = (
-        "<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
-        "<Response>"
-        f"  <Say language=\"es-ES\">{speak_text}</Say>"
-        "  <Redirect method=\"POST\">/voice</Redirect>"
-        "</Response>"
-    )
-
-    # Fin de llamada si el usuario se despide
-    farewell_words = ["adiós", "adios", "chao", "chau", "hasta luego", "nos vemos"]
-    if any(w in user_text.lower() for w in farewell_words):
-        twiml = (
-            "<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
-            "<Response>"
-            "  <Say language=\"es-ES\">Gracias por la llamada. ¡Éxitos en tus estudios!</Say>"
-            "  <Hangup/>"
-            "</Response>"
-        )
 
-    return Response(twiml, mimetype="text/xml")
+@app.get("/metrics/turns")
+def metrics_turns():
+    # Cola de escritura a la base: backlog, tamaño de lote y latencia de cada flush
+    return jsonify(TURNS.stats())
 
 
 if __name__ == "__main__":
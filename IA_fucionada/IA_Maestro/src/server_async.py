@@ -0,0 +1,164 @@
+"""
+Servidor de voz asíncrono (ASGI) con el mismo contrato TwiML que server.py.
+
+Cada /respond espera la respuesta de Groq sin bloquear un hilo, así un solo
+proceso puede atender cientos de llamadas simultáneas. Ejecutar con:
+
+    cd src && hypercorn server_async:app --bind 0.0.0.0:5000 --backlog 2048
+    # o en desarrollo: python src/server_async.py
+"""
+import json
+import os
+from typing import Optional
+
+import aiohttp
+from quart import Quart, Response, jsonify, request
+
+from groq_pool import POOL_KEEPALIVE_EXPIRY, POOL_MAX_CONNECTIONS
+from model_router import ModelRouter
+from session_store import SessionStore
+from server import CANDIDATE_MODELS, SYSTEM_PROMPT, TURNS, clean_for_speech, record_exchange, resolve_api_key
+from twiml import build_static, is_farewell, say_twiml
+
+app = Quart(__name__)
+
+ROUTER = ModelRouter(CANDIDATE_MODELS)
+
+# Historial por llamada (CallSid), acotado y con expulsión de llamadas inactivas
+SESSIONS = SessionStore()
+
+# TwiML fijo (y audio opcional) compilado una vez al arrancar
+STATIC = build_static()
+
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/")
+# Con el servidor asíncrono el límite real de llamadas simultáneas es el pool de conexiones
+ASYNC_POOL_MAX_CONNECTIONS = int(os.getenv("GROQ_ASYNC_POOL_MAX_CONNECTIONS", str(max(POOL_MAX_CONNECTIONS, 200))))
+LLM_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+
+_session = None
+_headers = None
+
+
+class GroqHTTPError(Exception):
+    """Respuesta no-200 de Groq; body (como en el SDK) lleva el código con el que el router detecta modelos retirados."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Error code: {status_code} - {message[:200]}")
+        self.status_code = status_code
+        try:
+            self.body = json.loads(message)
+        except ValueError:
+            self.body = None
+
+
+@app.before_serving
+async def open_session():
+    # aiohttp en lugar del cliente async del SDK: con cientos de peticiones en vuelo
+    # el pool de httpx gasta más CPU asignando conexiones que esperando a Groq.
+    global _session, _headers
+    _headers = {"Authorization": f"Bearer {resolve_api_key()}"}
+    connector = aiohttp.TCPConnector(limit=ASYNC_POOL_MAX_CONNECTIONS, keepalive_timeout=POOL_KEEPALIVE_EXPIRY)
+    _session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=LLM_TIMEOUT, sock_connect=5),
+    )
+
+
+@app.after_serving
+async def close_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def groq_chat(messages: list[dict], usage: Optional[dict] = None) -> str:
+    url = f"{GROQ_BASE_URL}/openai/v1/chat/completions"
+
+    async def _call(model: str) -> str:
+        payload = {"model": model, "messages": messages, "temperature": 0.2, "max_tokens": 512}
+        async with _session.post(url, json=payload, headers=_headers) as resp:
+            if resp.status != 200:
+                raise GroqHTTPError(resp.status, await resp.text())
+            data = await resp.json()
+        if usage is not None:
+            usage["model"] = model
+            usage["total_tokens"] = (data.get("usage") or {}).get("total_tokens")
+        return data["choices"][0]["message"]["content"].strip()
+
+    return await ROUTER.acomplete(_call)
+
+
+def static_response(asset):
+    # Cuerpo ya compilado. ETag y 304 solo en GET/HEAD (los audios): los webhooks de
+    # Twilio son POST, y a un POST condicional RFC 9110 le corresponde 412, no 304
+    if request.method not in ("GET", "HEAD"):
+        return Response(asset.body, mimetype=asset.mimetype)
+    if asset.not_modified(request.headers.get("If-None-Match")):
+        return Response(b"", status=304, headers=asset.headers)
+    return Response(asset.body, mimetype=asset.mimetype, headers=asset.headers)
+
+
+@app.post("/voice")
+async def voice_welcome():
+    call_sid = (await request.form).get("CallSid")
+    # Twilio vuelve a /voice después de cada turno; TURNS registra la sesión solo la primera vez
+    if call_sid:
+        TURNS.start_session(call_sid)
+    return static_response(STATIC.twiml["welcome"])
+
+
+@app.post("/respond")
+async def voice_respond():
+    form = await request.form
+    user_text = form.get("SpeechResult", "").strip()
+    call_sid = form.get("CallSid", "")
+    if not user_text:
+        return static_response(STATIC.twiml["no_input"])
+
+    if is_farewell(user_text):
+        SESSIONS.end(call_sid)
+        record_exchange(call_sid, user_text)
+        TURNS.end_session(call_sid)
+        return static_response(STATIC.twiml["farewell"])
+
+    user_message = {"role": "user", "content": user_text}
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}] + SESSIONS.history(call_sid) + [user_message]
+    usage = {}
+    try:
+        response = await groq_chat(messages, usage)
+        SESSIONS.append(call_sid, user_message, {"role": "assistant", "content": response})
+    except Exception:
+        return static_response(STATIC.twiml["error"])
+    # Solo encola: el INSERT lo hace el hilo escritor de turn_store
+    record_exchange(call_sid, user_text, response, usage)
+
+    return Response(say_twiml(clean_for_speech(response)), mimetype="text/xml")
+
+
+@app.get("/audio/<filename>")
+async def static_audio(filename):
+    asset = STATIC.audio.get(filename)
+    if asset is None:
+        return Response("", status=404)
+    return static_response(asset)
+
+
+@app.get("/metrics/models")
+async def metrics_models():
+    return jsonify(ROUTER.stats())
+
+
+@app.get("/metrics/sessions")
+async def metrics_sessions():
+    return jsonify(SESSIONS.stats())
+
+
+@app.get("/metrics/turns")
+async def metrics_turns():
+    return jsonify(TURNS.stats())
+
+
+if __name__ == "__main__":
+    port = int(os.getenv("PORT", "5000"))
+    app.run(host="0.0.0.0", port=port)
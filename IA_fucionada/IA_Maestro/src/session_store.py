@@ -0,0 +1,190 @@
+"""
+Memoria de conversación por llamada (CallSid de Twilio) para el servidor de voz.
+
+Cada llamada guarda una ventana acotada de turnos. Las llamadas inactivas se
+expulsan por TTL y, si hay demasiadas o se supera el presupuesto de memoria,
+se expulsan las menos recientes (LRU). Opcionalmente cada turno se escribe en
+un archivo SQLite local: así un reinicio del worker no corta las llamadas en
+curso y lo expulsado por falta de memoria se puede recuperar.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, List, Optional
+
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "10"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "900"))
+SESSION_MAX_CALLS = int(os.getenv("SESSION_MAX_CALLS", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(8 * 1024 * 1024)))
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH")
+
+# Costo aproximado de cada mensaje además del texto (dict, claves, rol)
+_MESSAGE_OVERHEAD = 64
+
+
+def _message_bytes(message: dict) -> int:
+    return len(message["content"].encode("utf-8")) + _MESSAGE_OVERHEAD
+
+
+class _Session:
+    __slots__ = ("messages", "last_seen", "bytes")
+
+    def __init__(self, max_messages: int, last_seen: float):
+        self.messages = deque(maxlen=max_messages)
+        self.last_seen = last_seen
+        self.bytes = 0
+
+    def append(self, message: dict):
+        if len(self.messages) == self.messages.maxlen:
+            self.bytes -= _message_bytes(self.messages[0])
+        self.messages.append(message)
+        self.bytes += _message_bytes(message)
+
+
+class SessionStore:
+    """Historial acotado por CallSid con expulsión por TTL, LRU y bytes totales."""
+
+    def __init__(self, max_turns: int = SESSION_MAX_TURNS, ttl: float = SESSION_TTL,
+                 max_sessions: int = SESSION_MAX_CALLS, max_bytes: int = SESSION_MAX_BYTES,
+                 sqlite_path: Optional[str] = SESSION_SQLITE_PATH, clock: Callable[[], float] = time.time):
+        # Un turno = pregunta del alumno + respuesta de la profesora
+        self.max_messages = max(2, 2 * max_turns)
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._bytes = 0
+        self._last_db_sweep = 0.0
+        self._stats = {"evicted_ttl": 0, "evicted_lru": 0, "evicted_bytes": 0,
+                       "ended": 0, "restored": 0, "hits": 0, "misses": 0}
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS call_sessions ("
+                " call_sid TEXT PRIMARY KEY, messages TEXT NOT NULL, last_seen REAL NOT NULL)"
+            )
+
+    # -- internos (se llaman con el lock tomado) --
+
+    def _drop(self, call_sid: str, reason: str, forget: bool):
+        session = self._sessions.pop(call_sid, None)
+        if session is not None:
+            self._bytes -= session.bytes
+            self._stats[reason] += 1
+        if forget and self._db is not None:
+            self._db.execute("DELETE FROM call_sessions WHERE call_sid = ?", (call_sid,))
+
+    def _expire(self, now: float):
+        # El OrderedDict está en orden de uso: los más viejos van primero
+        while self._sessions:
+            call_sid, session = next(iter(self._sessions.items()))
+            if now - session.last_seen < self.ttl:
+                break
+            self._drop(call_sid, "evicted_ttl", forget=True)
+        # En SQLite se limpia como mucho una vez por minuto para no escribir en cada turno
+        if self._db is not None and now - self._last_db_sweep >= 60:
+            self._last_db_sweep = now
+            self._db.execute("DELETE FROM call_sessions WHERE last_seen < ?", (now - self.ttl,))
+
+    def _enforce_limits(self, keep: str):
+        # Bajo presión de memoria la sesión sale de RAM pero sigue en SQLite (si hay)
+        while len(self._sessions) > self.max_sessions:
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                break
+            self._drop(oldest, "evicted_lru", forget=False)
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                break
+            self._drop(oldest, "evicted_bytes", forget=False)
+
+    def _load(self, call_sid: str, now: float) -> Optional[_Session]:
+        session = self._sessions.get(call_sid)
+        if session is not None:
+            self._sessions.move_to_end(call_sid)
+            self._stats["hits"] += 1
+            return session
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT messages, last_seen FROM call_sessions WHERE call_sid = ?", (call_sid,)
+            ).fetchone()
+            if row and now - row[1] < self.ttl:
+                session = _Session(self.max_messages, row[1])
+                for message in json.loads(row[0]):
+                    session.append(message)
+                self._sessions[call_sid] = session
+                self._bytes += session.bytes
+                self._stats["restored"] += 1
+                return session
+        self._stats["misses"] += 1
+        return None
+
+    def _persist(self, call_sid: str, session: _Session):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT INTO call_sessions (call_sid, messages, last_seen) VALUES (?, ?, ?) "
+            "ON CONFLICT(call_sid) DO UPDATE SET messages = excluded.messages, last_seen = excluded.last_seen",
+            (call_sid, json.dumps(list(session.messages), ensure_ascii=False), session.last_seen),
+        )
+
+    # -- API pública --
+
+    def history(self, call_sid: str) -> List[dict]:
+        """Mensajes recientes de la llamada (sin el prompt de sistema)."""
+        if not call_sid:
+            return []
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            session = self._load(call_sid, now)
+            return list(session.messages) if session else []
+
+    def append(self, call_sid: str, *messages: dict):
+        """Agrega mensajes {"role", "content"} a la ventana de la llamada."""
+        if not call_sid:
+            return
+        with self._lock:
+            now = self._clock()
+            session = self._load(call_sid, now)
+            if session is None:
+                session = _Session(self.max_messages, now)
+                self._sessions[call_sid] = session
+            before = session.bytes
+            for message in messages:
+                session.append({"role": message["role"], "content": message["content"]})
+            session.last_seen = now
+            self._bytes += session.bytes - before
+            self._persist(call_sid, session)
+            self._enforce_limits(keep=call_sid)
+
+    def end(self, call_sid: str):
+        """La llamada terminó (despedida o colgado): libera su memoria."""
+        if not call_sid:
+            return
+        with self._lock:
+            self._drop(call_sid, "ended", forget=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(self._clock())
+            data = dict(self._stats)
+            data.update({
+                "live_sessions": len(self._sessions),
+                "bytes_held": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "max_messages_per_call": self.max_messages,
+                "sqlite": self._db is not None,
+            })
+            if self._db is not None:
+                data["spilled_sessions"] = self._db.execute("SELECT COUNT(*) FROM call_sessions").fetchone()[0]
+            return data
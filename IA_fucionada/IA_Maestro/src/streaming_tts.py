@@ -0,0 +1,295 @@
+"""
+Respuesta en streaming con síntesis de voz por oraciones.
+
+El texto del LLM llega token a token; en cuanto se completa una oración se manda
+a un hilo de síntesis y otro hilo la reproduce en orden, mientras el modelo
+sigue generando el resto. Así la profesora empieza a hablar antes de que termine
+la respuesta completa.
+
+Funciona con gTTS (+ pygame.mixer) y con pyttsx3.
+"""
+import json
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from tts_cache import gtts_synth
+
+# Fin de oración: . ! ? … o salto de línea, seguido de espacio. Evita cortar "3.5".
+_BOUNDARY = re.compile(r'(?<!\d)[.!?…]+["»)]?(?=\s)|\n+')
+# Abreviaturas frecuentes que no cierran oración
+_ABBREVIATIONS = ("sr.", "sra.", "dr.", "dra.", "prof.", "etc.", "p. ej.", "ej.", "pág.", "núm.")
+
+_STOP = object()
+
+
+class SentenceChunker:
+    """Acumula tokens y devuelve oraciones completas."""
+
+    def __init__(self, min_chars: int = 12):
+        self.min_chars = min_chars
+        self._buf = ""
+
+    def feed(self, token: str) -> list:
+        self._buf += token
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(self._buf):
+            end = match.end()
+            candidate = self._buf[start:end].strip()
+            if len(candidate) < self.min_chars or candidate.lower().endswith(_ABBREVIATIONS):
+                continue
+            sentences.append(candidate)
+            start = end
+        self._buf = self._buf[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        rest = self._buf.strip()
+        self._buf = ""
+        return rest or None
+
+
+def split_sentences(text: str, min_chars: int = 12) -> list:
+    """Las oraciones en que speak_stream() parte un texto que llega completo (para sintetizarlas antes)."""
+    chunker = SentenceChunker(min_chars)
+    sentences = chunker.feed(text)
+    rest = chunker.flush()
+    return sentences + ([rest] if rest else [])
+
+
+class GTTSBackend:
+    """Sintetiza cada oración a MP3 con gTTS y la reproduce con pygame.mixer."""
+
+    def __init__(self, lang: str = "es", tld: str = "es", volume: float = 1.0, cache=None):
+        import gtts  # noqa: F401  (falla aquí, y no en la primera oración, si falta gTTS)
+        from pygame import mixer
+        self._mixer = mixer
+        self.lang = lang
+        self.tld = tld
+        self.volume = volume
+        # TTSCache opcional: las oraciones repetidas no se vuelven a sintetizar
+        self.cache = cache
+
+    def synthesize(self, text: str) -> str:
+        # Los mismos argumentos que la clave de la caché (tts_cache.gtts_synth)
+        synth = gtts_synth(text, lang=self.lang, tld=self.tld)
+        if self.cache is not None:
+            return self.cache.get_or_create(text, synth, lang=self.lang, tld=self.tld, engine="gtts")
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
+            path = tmp.name
+        synth(path)
+        return path
+
+    def play(self, path: str):
+        try:
+            self._mixer.music.load(path)
+            self._mixer.music.set_volume(self.volume)
+            self._mixer.music.play()
+            while self._mixer.music.get_busy():
+                time.sleep(0.05)
+            # Libera el archivo antes de borrarlo (Windows lo mantiene abierto)
+            if hasattr(self._mixer.music, "unload"):
+                self._mixer.music.unload()
+        finally:
+            # Los audios de la caché se conservan para la próxima vez
+            if self.cache is None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stop(self):
+        self._mixer.music.stop()
+
+
+class Pyttsx3Backend:
+    """pyttsx3 sintetiza y reproduce a la vez; cada oración va a la cola del Pyttsx3Worker."""
+
+    def __init__(self, worker, persona: str = "profesora"):
+        self.worker = worker
+        self.persona = persona
+
+    def synthesize(self, text: str) -> str:
+        return text
+
+    def play(self, text: str):
+        self.worker.speak(text, self.persona)
+
+    def stop(self):
+        self.worker.cancel()
+
+
+class StreamingSpeaker:
+    """Canal LLM → oraciones → síntesis → reproducción, con métricas por turno."""
+
+    def __init__(self, backend, clean: Callable[[str], str] = lambda t: t, min_chars: int = 12):
+        self.backend = backend
+        self.clean = clean
+        self.min_chars = min_chars
+        self.last_metrics: dict = {}
+        # Oraciones del último turno que ya salieron a sonar (si el stream se corta, es lo que se oyó)
+        self.spoken: List[str] = []
+        self._cancelled = threading.Event()
+
+    def interrupt(self):
+        """Corta el turno en curso (barge-in): detiene el audio y descarta las oraciones pendientes.
+
+        Se puede llamar desde otro hilo; los tokens siguen leyéndose para guardar la respuesta completa.
+        """
+        self._cancelled.set()
+        try:
+            self.backend.stop()
+        except Exception:
+            pass
+
+    def speak_stream(self, tokens: Iterable[str], on_token: Optional[Callable[[str], None]] = None,
+                     muted: bool = False, on_text: Optional[Callable[[str], None]] = None) -> str:
+        """Consume el stream de tokens hablando por oraciones. Devuelve el texto completo.
+
+        on_text recibe el texto completo apenas termina la generación, mientras las
+        últimas oraciones todavía suenan (para preparar el turno siguiente).
+        """
+        t0 = time.perf_counter()
+        metrics = {"first_token_s": None, "first_audio_s": None, "sentences": 0, "generation_s": None,
+                   "audio_s": 0.0}
+        synth_q: "queue.Queue" = queue.Queue()
+        play_q: "queue.Queue" = queue.Queue()
+        errors = []
+        cancelled = self._cancelled = threading.Event()
+
+        def synth_worker():
+            while True:
+                sentence = synth_q.get()
+                if sentence is _STOP:
+                    play_q.put(_STOP)
+                    return
+                if cancelled.is_set():
+                    continue
+                try:
+                    play_q.put(self.backend.synthesize(sentence))
+                except Exception as e:
+                    errors.append(e)
+
+        def play_worker():
+            while True:
+                item = play_q.get()
+                if item is _STOP:
+                    return
+                if cancelled.is_set():
+                    continue
+                started = time.perf_counter()
+                if metrics["first_audio_s"] is None:
+                    metrics["first_audio_s"] = started - t0
+                try:
+                    self.backend.play(item)
+                except Exception as e:
+                    errors.append(e)
+                # Tiempo sonando (duracion_audio del turno)
+                metrics["audio_s"] += time.perf_counter() - started
+
+        workers = []
+        if not muted:
+            workers = [threading.Thread(target=synth_worker, daemon=True),
+                       threading.Thread(target=play_worker, daemon=True)]
+            for w in workers:
+                w.start()
+
+        chunker = SentenceChunker(self.min_chars)
+        parts = []
+        spoken = self.spoken = []
+
+        def emit(sentence: str):
+            text = self.clean(sentence)
+            if text and not muted and not cancelled.is_set():
+                metrics["sentences"] += 1
+                spoken.append(sentence.strip())
+                synth_q.put(text)
+
+        try:
+            for token in tokens:
+                if not token:
+                    continue
+                if metrics["first_token_s"] is None:
+                    metrics["first_token_s"] = time.perf_counter() - t0
+                parts.append(token)
+                if on_token:
+                    on_token(token)
+                for sentence in chunker.feed(token):
+                    emit(sentence)
+            rest = chunker.flush()
+            if rest:
+                emit(rest)
+            metrics["generation_s"] = time.perf_counter() - t0
+            if on_text:
+                on_text("".join(parts).strip())
+        except KeyboardInterrupt:
+            cancelled.set()
+            try:
+                self.backend.stop()
+            except Exception:
+                pass
+            raise
+        finally:
+            synth_q.put(_STOP)
+            for w in workers:
+                w.join()
+            # También si el stream se cortó: las oraciones ya encoladas terminaron de sonar
+            metrics["total_s"] = time.perf_counter() - t0
+            metrics["interrupted"] = cancelled.is_set()
+            metrics["errors"] = [f"{type(e).__name__}: {e}" for e in errors]
+            self.last_metrics = metrics
+        return "".join(parts).strip()
+
+
+def iter_groq_deltas(stream, usage: Optional[dict] = None) -> Iterator[str]:
+    """Tokens de un stream del SDK de Groq (`stream=True`).
+
+    Si se pasa `usage`, al terminar queda con total_tokens del último fragmento (x_groq.usage).
+    """
+    for chunk in stream:
+        if usage is not None:
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                usage["total_tokens"] = x_groq.usage.total_tokens
+        if chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+def iter_sse_deltas(response, usage: Optional[dict] = None) -> Iterator[str]:
+    """Tokens de una respuesta SSE de /chat/completions (requests con stream=True o httpx.Client.stream).
+
+    Si se pasa `usage`, al terminar queda con total_tokens (x_groq.usage en Groq, usage en OpenAI).
+    """
+    if hasattr(response, "iter_content"):
+        # requests: text/event-stream no declara charset; sin esto entrega bytes
+        response.encoding = response.encoding or "utf-8"
+        lines = response.iter_lines(decode_unicode=True)
+    else:
+        lines = response.iter_lines()
+    for raw in lines:
+        if not raw or not raw.startswith("data:"):
+            continue
+        data = raw[len("data:"):].strip()
+        if data == "[DONE]":
+            # Se sigue leyendo hasta el fin del cuerpo: así la conexión vuelve al pool
+            continue
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            continue
+        if usage is not None:
+            reported = (payload.get("x_groq") or {}).get("usage") or payload.get("usage")
+            if reported:
+                usage["total_tokens"] = reported.get("total_tokens")
+        choices = payload.get("choices") or []
+        if choices:
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
@@ -0,0 +1,380 @@
+"""
+Clasificador de palabras clave compilado para el filtro de temas de la profesora.
+
+Todas las listas (prohibidas, materias, contexto escolar, tareas) se compilan en
+una sola expresión regular factorizada como trie, así el texto se recorre una
+vez sin importar cuántas palabras haya. Las vocales aceptan sus variantes con
+acento ("examenes" == "exámenes") y no importan mayúsculas.
+
+Modos de coincidencia por categoría:
+- "prefix": la palabra debe empezar ahí ("exam" acepta "examen", "tarea" acepta "tareas")
+- "word":   palabra completa con plural opcional ("arma" acepta "armas" pero no "alarma" ni "armario")
+
+Las listas se pueden editar sin reiniciar: con TOPIC_KEYWORDS_PATH apuntando a un
+JSON (se genera con --dump) el clasificador se recompila cuando el archivo cambia.
+
+    python src/topic_filter.py --dump > palabras_clave.json
+    python src/topic_filter.py --bench 100000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set
+
+# Si una palabra aparece en dos categorías cuenta para la que va primero
+DEFAULT_KEYWORDS: Dict[str, dict] = {
+    "forbidden": {"mode": "word", "keywords": [
+        # categorías prohibidas resumidas
+        "violencia", "sexual", "sexo", "racista", "odioso", "odio",
+        "arma", "amenaza", "autolesión", "suicidio", "ilegal", "droga",
+    ]},
+    "topic": {"mode": "prefix", "keywords": [
+        "matemáticas", "geometría", "álgebra", "cálculo", "aritmética",
+        "lengua", "literatura", "gramática", "ortografía",
+        "ciencias", "biología", "física", "química",
+        "historia", "geografía", "cívica",
+        "tareas", "deberes", "proyectos", "trabajos",
+        "horarios", "exámenes", "evaluaciones",
+        "normas", "reglamento", "disciplina",
+        "orientación académica", "estudio", "organización",
+    ]},
+    "context": {"mode": "prefix", "keywords": [
+        "escuela", "colegio", "instituto", "profesor", "clase", "aula", "curso",
+    ]},
+    "task": {"mode": "prefix", "keywords": [
+        "exam", "tarea", "deberes", "materia", "horario", "regla", "norma",
+    ]},
+}
+
+TOPIC_KEYWORDS_PATH = os.getenv("TOPIC_KEYWORDS_PATH")
+TOPIC_KEYWORDS_RELOAD_INTERVAL = float(os.getenv("TOPIC_KEYWORDS_RELOAD_INTERVAL", "2"))
+
+_WORD_END = re.compile(r"\w*")
+
+_MODE_SUFFIX = {
+    "prefix": "",
+    "word": r"(?:e?s)?(?!\w)",
+}
+
+
+def _build_fold_table() -> Dict[int, str]:
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        base = "".join(c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c))
+        if base and base != char:
+            table[code] = base
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+# Variantes acentuadas de cada letra: la regex acepta "exámenes" y "examenes" sin normalizar el texto
+_ACCENT_CLASS: Dict[str, str] = {}
+for _code, _base in _FOLD_TABLE.items():
+    if len(_base) == 1 and chr(_code) == chr(_code).lower():
+        _ACCENT_CLASS[_base] = _ACCENT_CLASS.get(_base, _base) + chr(_code)
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin acentos."""
+    return text.lower().translate(_FOLD_TABLE)
+
+
+def _fold_keyword(keyword: str) -> str:
+    return " ".join(fold(keyword).split())
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Alternación factorizada por prefijos: en cada posición se prueba una letra, no cada palabra."""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        alternatives = []
+        for char in sorted(k for k in node if k):
+            if char == " ":
+                atom = r"\s+"
+            elif char in _ACCENT_CLASS:
+                atom = f"[{_ACCENT_CLASS[char]}]"
+            else:
+                atom = re.escape(char)
+            alternatives.append(atom + emit(node[char]))
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        # Si aquí termina una palabra, lo que sigue es opcional (y codicioso: gana la más larga)
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+def _normalize_spec(spec) -> dict:
+    if isinstance(spec, dict):
+        return {"mode": spec.get("mode", "prefix"), "keywords": list(spec.get("keywords", []))}
+    return {"mode": "prefix", "keywords": list(spec)}
+
+
+class KeywordClassifier:
+    """Una regex (un trie por modo) para todas las categorías; classify() recorre el texto una sola vez."""
+
+    def __init__(self, categories: Dict[str, object]):
+        self.categories = {name: _normalize_spec(spec) for name, spec in categories.items()}
+        # palabra normalizada -> categoría (si se repite, gana la primera categoría)
+        self._category_of: Dict[str, str] = {}
+        by_mode: Dict[str, List[str]] = {mode: [] for mode in _MODE_SUFFIX}
+        for name, spec in self.categories.items():
+            if spec["mode"] not in _MODE_SUFFIX:
+                raise ValueError(f"Modo desconocido para '{name}': {spec['mode']}")
+            for keyword in spec["keywords"]:
+                key = _fold_keyword(keyword)
+                if key and key not in self._category_of:
+                    self._category_of[key] = name
+                    by_mode[spec["mode"]].append(key)
+        branches = [f"(?P<{mode}>{_trie_pattern(words)}){_MODE_SUFFIX[mode]}"
+                    for mode, words in by_mode.items() if words]
+        self._pattern = r"(?<!\w)(?:" + "|".join(branches) + ")" if branches else None
+        self._compiled = None
+        self._seen: Dict[str, str] = {}
+
+    @property
+    def _regex(self):
+        # Se compila al primer uso (o con warm()): no se paga al importar el script
+        if self._compiled is None and self._pattern is not None:
+            self._compiled = re.compile(self._pattern)
+        return self._compiled
+
+    def warm(self) -> "KeywordClassifier":
+        """Compila la regex ya (p. ej. en un hilo de fondo mientras suena el saludo)."""
+        self._regex
+        return self
+
+    def _category(self, keyword: str) -> str:
+        # Memo por forma escrita ("exámenes", "examenes"...): evita normalizar en cada coincidencia
+        category = self._seen.get(keyword)
+        if category is None:
+            category = self._seen[keyword] = self._category_of[_fold_keyword(keyword)]
+        return category
+
+    def _iter(self, text: str):
+        for m in self._regex.finditer(text.lower()):
+            keyword = m.group(m.lastgroup)
+            yield self._category(keyword), keyword
+
+    def classify(self, text: str) -> Set[str]:
+        """Categorías que aparecen en el texto."""
+        regex = self._regex
+        if regex is None or not text:
+            return set()
+        seen = self._seen
+        found = set()
+        for m in regex.finditer(text.lower()):
+            keyword = m.group(m.lastgroup)
+            found.add(seen.get(keyword) or self._category(keyword))
+        return found
+
+    def matches(self, text: str) -> Dict[str, List[str]]:
+        """Como classify(), pero con las palabras encontradas por categoría (para depurar)."""
+        found: Dict[str, List[str]] = {}
+        if self._regex is None or not text:
+            return found
+        for category, keyword in self._iter(text):
+            found.setdefault(category, []).append(keyword)
+        return found
+
+    def topic(self, text: str, categories: Iterable[str] = ("topic", "task")) -> Optional[str]:
+        """Palabra completa de la primera categoría de `categories` que aparece ("examen", "matemáticas").
+
+        Sirve para la columna tema de los turnos; None si no se menciona ninguna.
+        """
+        if self._regex is None or not text:
+            return None
+        lowered = text.lower()
+        best = None
+        for m in self._regex.finditer(lowered):
+            category = self._category(m.group(m.lastgroup))
+            if category not in categories:
+                continue
+            rank = tuple(categories).index(category)
+            if best is None or rank < best[0]:
+                # En modo prefijo la regex solo cubre el prefijo: se completa la palabra
+                end = _WORD_END.match(lowered, m.end()).end()
+                best = (rank, lowered[m.start():end])
+                if rank == 0:
+                    break
+        return best[1] if best else None
+
+
+class ReloadingClassifier:
+    """KeywordClassifier que se recompila solo cuando cambia el JSON de palabras clave."""
+
+    def __init__(self, path: Optional[str], defaults: Dict[str, object] = DEFAULT_KEYWORDS,
+                 check_interval: float = TOPIC_KEYWORDS_RELOAD_INTERVAL):
+        self.path = path
+        self.defaults = defaults
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = 0.0
+        self._classifier = KeywordClassifier(defaults)
+        self.reloads = 0
+        self._maybe_reload(force=True)
+
+    def _maybe_reload(self, force: bool = False):
+        if not self.path:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        # Si otro hilo ya está revisando, se sigue con el clasificador actual
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            self._next_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    categories = json.load(f)
+                classifier = KeywordClassifier(categories).warm()
+            except (OSError, ValueError, re.error, AttributeError, TypeError) as e:
+                # Un JSON a medio editar no debe tumbar la llamada: se conserva el anterior
+                print(f"⚠️ No se pudieron recargar las palabras clave de {self.path}: {e}")
+                self._mtime = mtime
+                return
+            self._classifier = classifier
+            self._mtime = mtime
+            self.reloads += 1
+        finally:
+            self._lock.release()
+
+    def reload(self):
+        self._mtime = None
+        self._maybe_reload(force=True)
+
+    @property
+    def categories(self) -> Dict[str, dict]:
+        return self._classifier.categories
+
+    def warm(self) -> "ReloadingClassifier":
+        self._classifier.warm()
+        return self
+
+    def classify(self, text: str) -> Set[str]:
+        self._maybe_reload()
+        return self._classifier.classify(text)
+
+    def matches(self, text: str) -> Dict[str, List[str]]:
+        self._maybe_reload()
+        return self._classifier.matches(text)
+
+    def topic(self, text: str, categories: Iterable[str] = ("topic", "task")) -> Optional[str]:
+        self._maybe_reload()
+        return self._classifier.topic(text, categories)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _legacy_is_school_related(user_text: str, keywords: Dict[str, dict] = DEFAULT_KEYWORDS) -> bool:
+    # Implementación anterior: cuatro búsquedas de subcadenas sobre el texto en minúsculas
+    t = user_text.lower()
+    if any(k in t for k in keywords["forbidden"]["keywords"]):
+        return False
+    is_topic_match = any(topic in t for topic in keywords["topic"]["keywords"])
+    is_context_match = any(k in t for k in keywords["context"]["keywords"])
+    is_task_match = any(k in t for k in keywords["task"]["keywords"])
+    is_short_query = len(t.split()) <= 8
+    return is_topic_match or is_context_match or is_task_match or is_short_query
+
+
+def synthetic_utterances(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    filler = ("profe oye me puede ayudar con una duda que tengo sobre lo que vimos ayer en "
+              "la mañana porque no entendí bien cómo se hace y mañana hay que entregarlo").split()
+    words = [k for spec in DEFAULT_KEYWORDS.values() for k in spec["keywords"]]
+    tricky = ["alarma", "armario", "éxito", "examenes", "matematicas", "claselibre", "Tareas"]
+    out = []
+    for _ in range(n):
+        length = rng.randint(3, 25)
+        parts = [rng.choice(filler) for _ in range(length)]
+        for _ in range(rng.randint(0, 2)):
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(words + tricky))
+        out.append(" ".join(parts).capitalize() + rng.choice(["?", ".", "!"]))
+    return out
+
+
+def _inflated_keywords(extra: int, seed: int = 11) -> Dict[str, dict]:
+    # Simula que las listas crecen: palabras inventadas que no aparecen en las frases
+    rng = random.Random(seed)
+    keywords = json.loads(json.dumps(DEFAULT_KEYWORDS))
+    letters = "bcdfglmnprstv"
+    vowels = "aeiou"
+    for i in range(extra):
+        word = "".join(rng.choice(letters) + rng.choice(vowels) for _ in range(rng.randint(3, 5)))
+        keywords["topic" if i % 2 else "task"]["keywords"].append(word)
+    return keywords
+
+
+def benchmark(n: int = 100_000, extra_keywords: int = 0):
+    utterances = synthetic_utterances(n)
+    keywords = _inflated_keywords(extra_keywords) if extra_keywords else DEFAULT_KEYWORDS
+    total = sum(len(spec["keywords"]) for spec in keywords.values())
+    print(f"{n} frases, {total} palabras clave")
+    classifier = KeywordClassifier(keywords).warm()
+
+    def compiled(text: str) -> bool:
+        found = classifier.classify(text)
+        if "forbidden" in found:
+            return False
+        return bool(found) or len(text.split()) <= 8
+
+    results = {}
+    def legacy(text: str) -> bool:
+        return _legacy_is_school_related(text, keywords)
+
+    for name, fn in (("anterior (subcadenas)", legacy), ("compilado (1 pasada)", compiled)):
+        start = time.perf_counter()
+        verdicts = [fn(u) for u in utterances]
+        elapsed = time.perf_counter() - start
+        results[name] = verdicts
+        print(f"{name:<24} {elapsed:7.3f}s  {elapsed / n * 1e6:6.2f} µs/frase")
+    legacy, new = results.values()
+    differ = [u for u, a, b in zip(utterances, legacy, new) if a != b]
+    print(f"Frases con veredicto distinto: {len(differ)} de {n} (límites de palabra y acentos)")
+    for u in differ[:3]:
+        print(f"  - {u}")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clasificador de temas escolares")
+    parser.add_argument("--dump", action="store_true", help="Imprime las listas por defecto como JSON editable")
+    parser.add_argument("--bench", type=int, nargs="?", const=100_000, help="Benchmark con N frases sintéticas")
+    parser.add_argument("text", nargs="*", help="Frase a clasificar")
+    args = parser.parse_args()
+
+    if args.dump:
+        print(json.dumps(DEFAULT_KEYWORDS, ensure_ascii=False, indent=2))
+    elif args.bench:
+        benchmark(args.bench)
+        # Con listas 10 veces más grandes el costo anterior crece; el del trie casi no
+        benchmark(args.bench, extra_keywords=10 * sum(len(s["keywords"]) for s in DEFAULT_KEYWORDS.values()))
+    elif args.text:
+        print(ReloadingClassifier(TOPIC_KEYWORDS_PATH).matches(" ".join(args.text)))
+    else:
+        parser.print_help()
@@ -0,0 +1,239 @@
+"""
+Caché persistente de audio TTS, direccionada por contenido.
+
+Cada frase sintetizada se guarda en disco con nombre hash(texto, idioma, tld,
+motor, velocidad), así el saludo, el rechazo, las despedidas o las preguntas
+iniciales se sintetizan una sola vez y se reutilizan entre llamadas, procesos y
+ejecuciones. Las escrituras son atómicas (archivo temporal + os.replace), por lo
+que varios procesos pueden compartir el mismo directorio. Con un tope de tamaño
+se borran primero los archivos usados hace más tiempo (LRU por mtime).
+
+    python src/tts_cache.py --prewarm   # sintetiza todas las frases fijas
+    python src/tts_cache.py --stats
+"""
+import argparse
+import ast
+import hashlib
+import os
+import pathlib
+import tempfile
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "hackaton_callcenter", "tts")
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", "200"))
+
+
+def cache_key(text: str, lang: str = "es", tld: str = "es", engine: str = "gtts", rate="normal") -> str:
+    raw = "\x1f".join([engine, lang, tld, str(rate), text])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """Directorio de audios sintetizados con tope de tamaño y contadores de aciertos."""
+
+    def __init__(self, cache_dir: str = TTS_CACHE_DIR, max_bytes: int = int(TTS_CACHE_MAX_MB * 1024 * 1024),
+                 suffix: str = ".mp3"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._approx_bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + self.suffix)
+
+    def _touch(self, path: str):
+        # mtime = último uso, para que la expulsión LRU funcione entre procesos
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def get(self, text: str, lang: str = "es", tld: str = "es", engine: str = "gtts", rate="normal") -> Optional[str]:
+        path = self.path_for(cache_key(text, lang, tld, engine, rate))
+        if os.path.exists(path):
+            with self._lock:
+                self.hits += 1
+            self._touch(path)
+            return path
+        return None
+
+    def get_or_create(self, text: str, synth: Callable[[str], None], lang: str = "es", tld: str = "es",
+                      engine: str = "gtts", rate="normal") -> str:
+        """Devuelve la ruta del audio; si no existe, llama a `synth(ruta_temporal)` y lo publica."""
+        key = cache_key(text, lang, tld, engine, rate)
+        final = self.path_for(key)
+        if os.path.exists(final):
+            with self._lock:
+                self.hits += 1
+            self._touch(final)
+            return final
+        with self._lock:
+            self.misses += 1
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(final), suffix=".tmp")
+        os.close(fd)
+        try:
+            synth(tmp)
+            if os.path.exists(final):
+                # Otro proceso lo publicó mientras sintetizábamos: el contenido es el mismo
+                os.remove(tmp)
+            else:
+                os.replace(tmp, final)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._account(os.path.getsize(final))
+        return final
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _account(self, added: int):
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = sum(size for _m, size, _p in self._scan())
+            else:
+                self._approx_bytes += added
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self, target_ratio: float = 0.9) -> int:
+        """Borra los audios menos usados hasta quedar bajo el 90 % del tope."""
+        entries = sorted(self._scan())
+        total = sum(size for _m, size, _p in entries)
+        removed = 0
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes * target_ratio:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # En Windows no se puede borrar un archivo que otro proceso está reproduciendo
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._approx_bytes = total
+            self.evictions += removed
+        return removed
+
+    def stats(self) -> dict:
+        entries = self._scan()
+        lookups = self.hits + self.misses
+        return {
+            "dir": self.cache_dir,
+            "files": len(entries),
+            "bytes": sum(size for _m, size, _p in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+_default_cache = None
+
+
+def default_cache() -> TTSCache:
+    """Caché compartida del proceso (mismo directorio para todos los procesos)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TTSCache()
+    return _default_cache
+
+
+def gtts_synth(text: str, lang: str = "es", tld: str = "es") -> Callable[[str], None]:
+    def _synth(path: str):
+        from gtts import gTTS
+        gTTS(text=text, lang=lang, tld=tld, slow=False).save(path)
+    return _synth
+
+
+# ---------------------------------------------------------------------------
+# Pre-calentado de frases fijas
+# ---------------------------------------------------------------------------
+
+SRC_DIR = pathlib.Path(__file__).resolve().parent
+
+
+def _module_constants(path: pathlib.Path, names: Iterable[str]) -> dict:
+    """Lee constantes literales de un módulo sin importarlo (importarlo carga audio y valida la API key)."""
+    wanted = set(names)
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    found = {}
+    for node in tree.body:
+        if isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name) and target.id in wanted and node.value is not None:
+                    found[target.id] = ast.literal_eval(node.value)
+    return found
+
+
+def static_phrases() -> List[Tuple[str, str]]:
+    """(texto, tld) de todas las frases fijas que dicen profesora_llamada y llamada_completa."""
+    phrases = []
+    prof = _module_constants(SRC_DIR / "profesor_llamada.py", ["GREETING", "FAREWELL_MSG", "REFUSAL_PROMPT"])
+    tld_prof = os.getenv("GTTS_TLD", "es")
+    phrases += [(prof[name], tld_prof) for name in ("GREETING", "FAREWELL_MSG", "REFUSAL_PROMPT") if name in prof]
+
+    llamada = SRC_DIR.parent.parent / "llamada_completa.py"
+    if llamada.exists():
+        const = _module_constants(llamada, ["PREGUNTAS_INICIALES", "SALUDOS_ALUMNO",
+                                            "DESPEDIDA_PROFESORA", "CIERRE_PROFESORA"])
+        # Misma regla que SistemaVoz.hablar: México para profesora, España para alumno
+        phrases += [(t, "es") for t in const.get("PREGUNTAS_INICIALES", []) + const.get("SALUDOS_ALUMNO", [])]
+        phrases += [(const[n], "com.mx") for n in ("DESPEDIDA_PROFESORA", "CIERRE_PROFESORA") if n in const]
+    return phrases
+
+
+def prewarm(cache: Optional[TTSCache] = None) -> dict:
+    cache = cache or default_cache()
+    done = failed = 0
+    for text, tld in static_phrases():
+        try:
+            cache.get_or_create(text, gtts_synth(text, tld=tld), lang="es", tld=tld)
+            done += 1
+        except Exception as e:
+            failed += 1
+            print(f"⚠️ No se pudo sintetizar: {text[:40]}... ({e})")
+    return {"phrases": done, "failed": failed, **cache.stats()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Caché persistente de audio TTS")
+    parser.add_argument("--prewarm", action="store_true", help="Sintetiza por adelantado todas las frases fijas")
+    parser.add_argument("--stats", action="store_true", help="Muestra tamaño y contadores de la caché")
+    args = parser.parse_args()
+
+    if args.prewarm:
+        result = prewarm()
+        print(f"✅ {result['phrases']} frases listas en {result['dir']} "
+              f"({result['hits']} ya estaban, {result['misses']} nuevas, {result['failed']} fallidas)")
+    elif args.stats:
+        for k, v in default_cache().stats().items():
+            print(f"{k}: {v}")
+    else:
+        parser.print_help()
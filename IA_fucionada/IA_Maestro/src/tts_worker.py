@@ -0,0 +1,361 @@
+"""
+Un solo hilo de voz pyttsx3 para toda la llamada.
+
+Antes cada frase pagaba su propia preparación: AlumnoEscolar creaba un motor nuevo
+(pyttsx3.init(), recorrer todas las voces, fijar propiedades) y speak() en modo
+--fast lanzaba y esperaba un hilo nuevo. Pyttsx3Worker crea el motor una sola vez
+dentro de su propio hilo (SAPI y NSSpeech exigen usarlo desde el hilo que lo creó),
+elige la voz de cada personaje una sola vez y consume una cola de frases:
+
+    voz = Pyttsx3Worker().start()
+    voz.speak("Hola, soy la profesora García.", "profesora")   # bloquea hasta terminar
+    voz.say("Pregunta siguiente", "alumno")                      # encola y sigue
+    voz.cancel()                                                  # barge-in: corta y vacía la cola
+    voz.stats()                                                   # cola y latencias
+
+    python tts_worker.py --voices
+    python tts_worker.py --say "¿Qué es la fotosíntesis?" --persona alumno
+    python tts_worker.py --bench 20
+"""
+import argparse
+import math
+import queue
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+from lazy_import import lazy_import
+
+pyttsx3 = lazy_import("pyttsx3")
+
+_STOP = object()
+# Pedido de corte: el hilo de voz llama a engine.stop() desde su propio hilo
+_CANCEL = object()
+
+
+class Persona:
+    """Cómo suena un personaje: palabras para elegir la voz, velocidad y volumen."""
+
+    __slots__ = ("keywords", "avoid", "fallback_index", "rate", "volume")
+
+    def __init__(self, keywords: Iterable[str] = (), avoid: Iterable[str] = (), fallback_index: int = 0,
+                 rate: Optional[int] = None, volume: Optional[float] = None):
+        self.keywords = tuple(k.lower() for k in keywords)
+        self.avoid = tuple(k.lower() for k in avoid)
+        self.fallback_index = fallback_index
+        self.rate = rate
+        self.volume = volume
+
+
+FEMALE_KEYWORDS = ("female", "mujer", "helena", "zira", "sabina", "carmen", "laura", "julia")
+MALE_KEYWORDS = ("male", "hombre", "pablo", "raul", "jorge")
+
+PERSONAS = {
+    "profesora": Persona(FEMALE_KEYWORDS, fallback_index=0, rate=150, volume=0.9),
+    "alumno": Persona(MALE_KEYWORDS, avoid=("female", "mujer"), fallback_index=1, rate=165, volume=0.9),
+}
+
+
+# "es" como código de idioma en el id (TTS_MS_ES-ES_HELENA, es-la), no dentro de "Voices"
+_ES_CODE = re.compile(r"(?<![a-z])es(?:[-_]|$)")
+
+
+def _is_spanish(voice) -> bool:
+    name = (getattr(voice, "name", "") or "").lower()
+    return "spanish" in name or "español" in name or bool(_ES_CODE.search((getattr(voice, "id", "") or "").lower()))
+
+
+def pick_voice(voices: List, persona: Persona) -> Optional[str]:
+    """Id de la voz para el personaje: española con sus palabras clave, luego cualquier española."""
+    if not voices:
+        return None
+
+    def text(v):
+        return f"{getattr(v, 'name', '')} {getattr(v, 'id', '')}".lower()
+
+    spanish = [v for v in voices if _is_spanish(v)]
+    for v in spanish:
+        t = text(v)
+        if any(k in t for k in persona.keywords) and not any(a in t for a in persona.avoid):
+            return v.id
+    if spanish:
+        # Ninguna española con sus palabras clave: otra española antes que una voz en otro idioma
+        return spanish[min(persona.fallback_index, len(spanish) - 1)].id
+    index = persona.fallback_index if persona.fallback_index < len(voices) else 0
+    return voices[index].id
+
+
+class Utterance:
+    """Una frase en la cola; wait() bloquea hasta que se dijo o se canceló."""
+
+    __slots__ = ("text", "persona", "enqueued", "started", "first_audio", "finished", "cancelled", "error", "done")
+
+    def __init__(self, text: str, persona: str):
+        self.text = text
+        self.persona = persona
+        self.enqueued = time.perf_counter()
+        self.started: Optional[float] = None
+        self.first_audio: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True si la frase se dijo completa."""
+        self.done.wait(timeout)
+        return self.done.is_set() and not self.cancelled and self.error is None
+
+
+def _summary(values) -> dict:
+    if not values:
+        return {"count": 0, "mean_ms": None, "p95_ms": None, "max_ms": None}
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+    return {"count": len(ordered), "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1),
+            "p95_ms": round(p95 * 1000, 1), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+class Pyttsx3Worker:
+    """Dueño único del motor pyttsx3; todas las frases pasan por su cola."""
+
+    def __init__(self, personas: Optional[Dict[str, Persona]] = None,
+                 engine_factory: Optional[Callable[[], object]] = None, latency_window: int = 200):
+        self.personas: Dict[str, Persona] = dict(PERSONAS if personas is None else personas)
+        self._engine_factory = engine_factory or (lambda: pyttsx3.init())
+        self._queue: "queue.Queue" = queue.Queue()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._engine = None
+        self._current: Optional[Utterance] = None
+        self._applied: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.voices: Dict[str, Optional[str]] = {}
+        self.error: Optional[BaseException] = None
+        self._wait_s = deque(maxlen=latency_window)
+        self._speak_s = deque(maxlen=latency_window)
+        self._first_audio_s = deque(maxlen=latency_window)
+        self._counts = {"spoken": 0, "cancelled": 0, "errors": 0, "max_queue_depth": 0}
+
+    # -- ciclo de vida --
+
+    def start(self, timeout: float = 10.0) -> "Pyttsx3Worker":
+        """Arranca el hilo y espera a que el motor esté listo (propaga el error si falló)."""
+        self._thread = threading.Thread(target=self._run, name="tts-pyttsx3", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def stop(self, timeout: float = 2.0):
+        self.cancel()
+        self._queue.put(_STOP)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            engine = self._engine_factory()
+            # Se recorren las voces una sola vez: cada personaje queda con su id
+            voices = engine.getProperty("voices") or []
+            self.voices = {name: pick_voice(voices, persona) for name, persona in self.personas.items()}
+            try:
+                engine.connect("started-utterance", self._on_started)
+                engine.connect("started-word", self._on_word)
+            except Exception:
+                pass  # algunos drivers (o dobles de prueba) no tienen callbacks
+            self._engine = engine
+        except BaseException as e:
+            self.error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if item is _CANCEL:
+                try:
+                    engine.stop()
+                except Exception:
+                    pass
+                continue
+            if item.cancelled:
+                continue
+            self._current = item
+            item.started = time.perf_counter()
+            try:
+                self._apply(item.persona)
+                engine.say(item.text)
+                engine.runAndWait()
+            except Exception as e:
+                item.error = e
+            finally:
+                item.finished = time.perf_counter()
+                self._current = None
+                self._record(item)
+                item.done.set()
+
+    def _apply(self, persona_name: str):
+        # Solo se tocan las propiedades que cambian respecto a la frase anterior
+        persona = self.personas.get(persona_name)
+        if persona is None:
+            return
+        wanted = {"voice": self.voices.get(persona_name), "rate": persona.rate, "volume": persona.volume}
+        for prop, value in wanted.items():
+            if value is not None and self._applied.get(prop) != value:
+                self._engine.setProperty(prop, value)
+                self._applied[prop] = value
+
+    def _on_started(self, name=None):
+        current = self._current
+        if current is not None and current.first_audio is None:
+            current.first_audio = time.perf_counter()
+
+    def _on_word(self, name=None, location=None, length=None):
+        current = self._current
+        if current is not None and current.cancelled:
+            self._engine.stop()
+
+    def _record(self, item: Utterance):
+        with self._lock:
+            if item.cancelled:
+                self._counts["cancelled"] += 1
+                return
+            if item.error is not None:
+                self._counts["errors"] += 1
+                return
+            self._counts["spoken"] += 1
+            self._wait_s.append(item.started - item.enqueued)
+            self._speak_s.append(item.finished - item.started)
+            if item.first_audio is not None:
+                self._first_audio_s.append(item.first_audio - item.enqueued)
+
+    # -- uso --
+
+    def say(self, text: str, persona: str = "profesora") -> Utterance:
+        """Encola la frase y regresa enseguida."""
+        item = Utterance(text, persona)
+        self._queue.put(item)
+        depth = self._queue.qsize()
+        with self._lock:
+            self._counts["max_queue_depth"] = max(self._counts["max_queue_depth"], depth)
+        return item
+
+    def speak(self, text: str, persona: str = "profesora", timeout: Optional[float] = None) -> bool:
+        """Dice la frase y espera a que termine. False si se canceló o falló."""
+        return self.say(text, persona).wait(timeout)
+
+    def cancel(self) -> int:
+        """Barge-in: vacía la cola y corta la frase en curso. Devuelve cuántas frases se descartaron."""
+        trimmed = 0
+        stop_pending = False
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop_pending = True
+                continue
+            if item is _CANCEL:
+                continue
+            item.cancelled = True
+            item.done.set()
+            trimmed += 1
+        # El motor solo se toca desde su hilo: la frase en curso se corta en _on_word y el
+        # pedido de la cola llega cuando runAndWait() regresa
+        current = self._current
+        if current is not None:
+            current.cancelled = True
+        self._queue.put(_CANCEL)
+        if stop_pending:
+            self._queue.put(_STOP)
+        with self._lock:
+            self._counts["cancelled"] += trimmed
+        return trimmed
+
+    def set_rate(self, rate: int, persona: Optional[str] = None):
+        """Cambia la velocidad de un personaje (o de todos); se aplica desde la próxima frase."""
+        for name in ([persona] if persona else list(self.personas)):
+            self.personas[name].rate = rate
+
+    def set_volume(self, volume: float, persona: Optional[str] = None):
+        for name in ([persona] if persona else list(self.personas)):
+            self.personas[name].volume = volume
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def busy(self) -> bool:
+        return self._current is not None or not self._queue.empty()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counts)
+            stats["queue_wait"] = _summary(self._wait_s)
+            stats["speak"] = _summary(self._speak_s)
+            stats["first_audio"] = _summary(self._first_audio_s)
+        stats["queue_depth"] = self.queue_depth
+        return stats
+
+
+def _benchmark(n: int):
+    """Preparación por frase: motor nuevo + recorrer voces (antes) frente al hilo único (ahora).
+
+    Solo mide la preparación, no el habla: se usa un texto vacío.
+    """
+    start = time.perf_counter()
+    for _ in range(n):
+        engine = pyttsx3.init()
+        engine.setProperty("rate", 160)
+        engine.setProperty("volume", 1.0)
+        for voice in engine.getProperty("voices"):
+            if "spanish" in voice.name.lower() or "español" in voice.name.lower():
+                engine.setProperty("voice", voice.id)
+                break
+        del engine
+    fresh = (time.perf_counter() - start) / n
+
+    worker = Pyttsx3Worker().start()
+    start = time.perf_counter()
+    for i in range(n):
+        worker.speak("", "profesora" if i % 2 else "alumno")
+    shared = (time.perf_counter() - start) / n
+    worker.stop()
+    print(f"motor nuevo por frase   {fresh * 1000:8.2f} ms")
+    print(f"hilo único (cola)       {shared * 1000:8.2f} ms")
+    print(f"📊 {worker.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hilo único de voz pyttsx3")
+    parser.add_argument("--voices", action="store_true", help="Lista las voces y la elegida por personaje")
+    parser.add_argument("--say", help="Dice el texto con el personaje indicado")
+    parser.add_argument("--persona", default="profesora", choices=sorted(PERSONAS))
+    parser.add_argument("--bench", type=int, metavar="N", help="Compara la preparación por frase (N frases)")
+    args = parser.parse_args()
+
+    if args.bench:
+        _benchmark(args.bench)
+        return
+    worker = Pyttsx3Worker().start()
+    if args.voices or not args.say:
+        for voice in worker._engine.getProperty("voices"):
+            print(f"  {voice.id}  {voice.name}")
+        for name, voice_id in worker.voices.items():
+            print(f"🎙️ {name}: {voice_id}")
+    if args.say:
+        worker.speak(args.say, args.persona)
+        print(f"📊 {worker.stats()}")
+    worker.stop()
+
+
+if __name__ == "__main__":
+    main()
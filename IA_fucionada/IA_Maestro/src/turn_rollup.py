@@ -0,0 +1,236 @@
+"""
+Resúmenes diarios de turnos_conversacion y evaluaciones para los tableros.
+
+Los tableros (turnos por día y tema, tokens promedio por modelo, puntuación por
+maestro) leen resumen_turnos_diario y resumen_evaluaciones_diario en lugar de
+recorrer los turnos crudos. Este job los mantiene al día de forma incremental:
+resumen_marcas guarda hasta qué turno_id / evaluacion_id llegó cada resumen, y en
+cada corrida solo se recalculan los días con filas nuevas desde esa marca (con
+rangos de fecha, así MySQL solo lee las particiones de esos meses). El día de la
+marca anterior se recalcula siempre: cubre los lotes de otro proceso que
+confirmaron tarde con un id menor.
+
+En MySQL además agrega las particiones mensuales de turnos_conversacion que falten
+hasta ROLLUP_MONTHS_AHEAD meses adelante (partiendo pmax).
+
+    python turn_rollup.py                          # una corrida contra TALKIA_DB_URL
+    python turn_rollup.py --cada 300               # cada 5 minutos
+    python turn_rollup.py --desde 2026-09-01       # recalcula todo desde esa fecha
+"""
+import argparse
+import datetime
+import os
+import re
+import time
+from typing import Optional
+
+from turn_store import TALKIA_DB_URL, connect
+
+ROLLUP_MONTHS_AHEAD = int(os.getenv("ROLLUP_MONTHS_AHEAD", "2"))
+
+_PARTITION = re.compile(r"p(\d{4})_(\d{2})")
+
+# Consultas de los tableros: (sobre los turnos crudos, sobre los resúmenes); {ph} = desde, hasta
+DASHBOARD_QUERIES = {
+    "turnos_por_dia_tema": (
+        "SELECT DATE(fecha_turno), COALESCE(tema, ''), COUNT(*) FROM turnos_conversacion "
+        "WHERE fecha_turno >= {ph} AND fecha_turno < {ph} "
+        "GROUP BY DATE(fecha_turno), COALESCE(tema, '') ORDER BY 1, 2",
+        "SELECT dia, tema, SUM(turnos) FROM resumen_turnos_diario "
+        "WHERE dia >= {ph} AND dia < {ph} GROUP BY dia, tema ORDER BY 1, 2",
+    ),
+    "tokens_por_modelo": (
+        "SELECT modelo_ia_usado, COUNT(tokenes_consumidos), "
+        "ROUND(SUM(tokenes_consumidos) * 1.0 / COUNT(tokenes_consumidos), 2) FROM turnos_conversacion "
+        "WHERE fecha_turno >= {ph} AND fecha_turno < {ph} AND modelo_ia_usado IS NOT NULL "
+        "GROUP BY modelo_ia_usado ORDER BY 1",
+        "SELECT modelo_ia_usado, SUM(turnos_con_tokens), ROUND(SUM(tokens) * 1.0 / SUM(turnos_con_tokens), 2) "
+        "FROM resumen_turnos_diario WHERE dia >= {ph} AND dia < {ph} AND modelo_ia_usado <> '' "
+        "GROUP BY modelo_ia_usado ORDER BY 1",
+    ),
+    "puntuacion_por_maestro": (
+        "SELECT COALESCE(s.maestro_id, 0), COUNT(e.puntuacion), "
+        "ROUND(SUM(e.puntuacion) * 1.0 / COUNT(e.puntuacion), 2) FROM evaluaciones e "
+        "LEFT JOIN turnos_conversacion t ON t.turno_id = e.turno_id "
+        "LEFT JOIN sesiones_llamada s ON s.sesion_id = t.sesion_id "
+        "WHERE e.fecha_evaluacion >= {ph} AND e.fecha_evaluacion < {ph} "
+        "GROUP BY COALESCE(s.maestro_id, 0) ORDER BY 1",
+        "SELECT maestro_id, SUM(evaluaciones_con_puntuacion), "
+        "ROUND(SUM(puntuacion_total) * 1.0 / SUM(evaluaciones_con_puntuacion), 2) "
+        "FROM resumen_evaluaciones_diario WHERE dia >= {ph} AND dia < {ph} GROUP BY maestro_id ORDER BY 1",
+    ),
+}
+
+
+def _day(value) -> str:
+    # SQLite devuelve texto, MySQL date/datetime
+    return str(value)[:10]
+
+
+def _next_day(day: str) -> str:
+    return (datetime.date.fromisoformat(day) + datetime.timedelta(days=1)).isoformat()
+
+
+def _day_ranges(days) -> list:
+    """Días sueltos → rangos [desde, hasta) de días consecutivos (una consulta por rango)."""
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = _next_day(day)
+        else:
+            ranges.append([day, _next_day(day)])
+    return [tuple(r) for r in ranges]
+
+
+def _refresh_turns(cur, ph: str, since: str, until: str):
+    cur.execute(f"DELETE FROM resumen_turnos_diario WHERE dia >= {ph} AND dia < {ph}", (since, until))
+    cur.execute(
+        "INSERT INTO resumen_turnos_diario (dia, tema, modelo_ia_usado, turnos, turnos_alumno, tokens, "
+        "turnos_con_tokens, duracion_audio) "
+        "SELECT DATE(fecha_turno), COALESCE(tema, ''), COALESCE(modelo_ia_usado, ''), COUNT(*), "
+        "SUM(CASE WHEN rol_emisor = 'Alumno' THEN 1 ELSE 0 END), COALESCE(SUM(tokenes_consumidos), 0), "
+        "COUNT(tokenes_consumidos), COALESCE(SUM(duracion_audio), 0) FROM turnos_conversacion "
+        f"WHERE fecha_turno >= {ph} AND fecha_turno < {ph} "
+        "GROUP BY DATE(fecha_turno), COALESCE(tema, ''), COALESCE(modelo_ia_usado, '')", (since, until))
+
+
+def _refresh_evaluations(cur, ph: str, since: str, until: str):
+    cur.execute(f"DELETE FROM resumen_evaluaciones_diario WHERE dia >= {ph} AND dia < {ph}", (since, until))
+    cur.execute(
+        "INSERT INTO resumen_evaluaciones_diario (dia, maestro_id, evaluaciones, evaluaciones_con_puntuacion, "
+        "puntuacion_total) "
+        "SELECT DATE(e.fecha_evaluacion), COALESCE(s.maestro_id, 0), COUNT(*), COUNT(e.puntuacion), "
+        "COALESCE(SUM(e.puntuacion), 0) FROM evaluaciones e "
+        "LEFT JOIN turnos_conversacion t ON t.turno_id = e.turno_id "
+        "LEFT JOIN sesiones_llamada s ON s.sesion_id = t.sesion_id "
+        f"WHERE e.fecha_evaluacion >= {ph} AND e.fecha_evaluacion < {ph} "
+        "GROUP BY DATE(e.fecha_evaluacion), COALESCE(s.maestro_id, 0)", (since, until))
+
+
+# resumen → (tabla, columna id, columna fecha, recálculo de un rango de días)
+_SOURCES = {
+    "turnos": ("turnos_conversacion", "turno_id", "fecha_turno", _refresh_turns),
+    "evaluaciones": ("evaluaciones", "evaluacion_id", "fecha_evaluacion", _refresh_evaluations),
+}
+
+
+def _save_mark(cur, ph: str, name: str, last_id: int, last_day: Optional[str]):
+    if ph == "?":
+        sql = ("INSERT INTO resumen_marcas (resumen, ultimo_id, ultimo_dia, actualizado_en) "
+               "VALUES (?, ?, ?, CURRENT_TIMESTAMP) ON CONFLICT(resumen) DO UPDATE SET "
+               "ultimo_id = excluded.ultimo_id, ultimo_dia = excluded.ultimo_dia, "
+               "actualizado_en = excluded.actualizado_en")
+    else:
+        sql = ("INSERT INTO resumen_marcas (resumen, ultimo_id, ultimo_dia) VALUES (%s, %s, %s) "
+               "ON DUPLICATE KEY UPDATE ultimo_id = VALUES(ultimo_id), ultimo_dia = VALUES(ultimo_dia)")
+    cur.execute(sql, (name, last_id, last_day))
+
+
+def refresh(db, ph: str, since: Optional[str] = None) -> dict:
+    """Actualiza los resúmenes desde su marca (o todo desde `since`, AAAA-MM-DD). Una transacción por resumen."""
+    stats = {}
+    for name, (table, id_col, date_col, refresh_days) in _SOURCES.items():
+        start = time.perf_counter()
+        cur = db.cursor()
+        cur.execute(f"SELECT ultimo_id, ultimo_dia FROM resumen_marcas WHERE resumen = {ph}", (name,))
+        mark = cur.fetchone()
+        last_id, last_day = (mark[0], _day(mark[1]) if mark[1] else None) if mark else (0, None)
+        # Tope fijo antes de buscar días: lo que llegue durante la corrida queda para la siguiente
+        cur.execute(f"SELECT MAX({id_col}) FROM {table}")
+        top = cur.fetchone()[0] or 0
+        if since:
+            cur.execute(f"SELECT MAX({date_col}) FROM {table}")
+            newest = cur.fetchone()[0]
+            ranges = [(since, _next_day(_day(newest)))] if newest and _day(newest) >= since else []
+            days = {_day(newest)} if newest else set()
+        else:
+            # Solo las filas nuevas (por id): en MySQL es un rango de la clave primaria en cada partición
+            cur.execute(f"SELECT DISTINCT DATE({date_col}) FROM {table} WHERE {id_col} > {ph} AND {id_col} <= {ph}",
+                        (last_id, top))
+            days = {_day(row[0]) for row in cur.fetchall()}
+            if last_day:
+                days.add(last_day)
+            ranges = _day_ranges(days)
+        for day_from, day_to in ranges:
+            refresh_days(cur, ph, day_from, day_to)
+        newest_day = max(days | ({last_day} if last_day else set())) if days or last_day else None
+        _save_mark(cur, ph, name, top, newest_day)
+        db.commit()
+        stats[name] = {"new_ids": top - last_id if not since else None, "ranges": ranges,
+                       "days": sum((datetime.date.fromisoformat(b) - datetime.date.fromisoformat(a)).days
+                                   for a, b in ranges),
+                       "ms": round((time.perf_counter() - start) * 1000, 1)}
+    return stats
+
+
+def ensure_partitions(db, months_ahead: int = ROLLUP_MONTHS_AHEAD) -> list:
+    """MySQL: agrega las particiones mensuales que falten hasta `months_ahead` meses adelante.
+
+    Sin efecto si turnos_conversacion no está particionada (esquema anterior).
+    """
+    cur = db.cursor()
+    cur.execute("SELECT PARTITION_NAME FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() "
+                "AND TABLE_NAME = 'turnos_conversacion' AND PARTITION_NAME IS NOT NULL")
+    names = [row[0] for row in cur.fetchall()]
+    if "pmax" not in names:
+        return []
+    months = sorted((int(m.group(1)), int(m.group(2))) for m in map(_PARTITION.fullmatch, names) if m)
+    today = datetime.date.today()
+    target = today.year * 12 + today.month - 1 + months_ahead
+    current = months[-1][0] * 12 + months[-1][1] if months else today.year * 12 + today.month - 1
+    added = []
+    while current <= target:
+        year, month = divmod(current, 12)
+        next_year, next_month = divmod(current + 1, 12)
+        name = f"p{year:04d}_{month + 1:02d}"
+        cur.execute(f"ALTER TABLE turnos_conversacion REORGANIZE PARTITION pmax INTO ("
+                    f"PARTITION {name} VALUES LESS THAN (UNIX_TIMESTAMP('{next_year:04d}-{next_month + 1:02d}-01 "
+                    f"00:00:00')), PARTITION pmax VALUES LESS THAN MAXVALUE)")
+        added.append(name)
+        current += 1
+    return added
+
+
+def dashboard(db, ph: str, name: str, since: str, until: str, source: str = "resumen") -> list:
+    """Filas de una consulta de DASHBOARD_QUERIES entre dos fechas; source "crudo" lee los turnos."""
+    raw, rollup = DASHBOARD_QUERIES[name]
+    cur = db.cursor()
+    cur.execute((raw if source == "crudo" else rollup).format(ph=ph), (since, until))
+    return [tuple(_day(v) if isinstance(v, (datetime.date, datetime.datetime)) else v for v in row)
+            for row in cur.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Actualiza los resúmenes diarios de turnos y evaluaciones")
+    parser.add_argument("--url", default=TALKIA_DB_URL, help="Base (por defecto TALKIA_DB_URL)")
+    parser.add_argument("--cada", type=float, default=None, metavar="SEGUNDOS", help="Repite la corrida")
+    parser.add_argument("--desde", default=None, metavar="AAAA-MM-DD", help="Recalcula todo desde esta fecha")
+    parser.add_argument("--meses-adelante", type=int, default=ROLLUP_MONTHS_AHEAD,
+                        help="Particiones mensuales a mantener creadas por adelantado (MySQL)")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("falta TALKIA_DB_URL o --url")
+
+    db, ph = connect(args.url)
+    since = args.desde
+    try:
+        while True:
+            if ph == "%s":
+                for name in ensure_partitions(db, args.meses_adelante):
+                    print(f"🗂️ Partición {name} agregada a turnos_conversacion")
+            for name, stats in refresh(db, ph, since).items():
+                origin = f"{stats['new_ids']} ids nuevos" if stats["new_ids"] is not None else f"desde {since}"
+                print(f"📊 {name}: {origin}, {stats['days']} días recalculados en {len(stats['ranges'])} rangos, "
+                      f"{stats['ms']} ms")
+            since = None
+            if args.cada is None:
+                break
+            time.sleep(args.cada)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
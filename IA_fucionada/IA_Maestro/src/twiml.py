@@ -0,0 +1,166 @@
+"""
+Respuestas TwiML del webhook de voz.
+
+Compartidas por el servidor Flask (server.py) y el ASGI (server_async.py) para
+que ambos devuelvan exactamente el mismo contrato a Twilio.
+
+Las respuestas fijas (bienvenida, no te entendí, despedida, error) se compilan
+una sola vez al arrancar con build_static() a bytes inmutables con ETag y
+Cache-Control (que los servidores solo envían en GET/HEAD). Con TWIML_PLAY_AUDIO=1 sus frases se pre-sintetizan con gTTS y
+se sirven como <Play> desde /audio/<hash>.mp3 en lugar de <Say>. Las respuestas
+del modelo pasan por say_twiml(), que escapa el texto antes de meterlo en el XML.
+"""
+import hashlib
+import os
+from typing import Dict, Optional
+from xml.sax.saxutils import escape
+
+XML_HEADER = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
+
+FAREWELL_WORDS = ["adiós", "adios", "chao", "chau", "hasta luego", "nos vemos"]
+
+# Frases fijas que dice el servidor (las que se pueden pre-sintetizar)
+UTTERANCES = {
+    "welcome": "Hola, soy la profesora García. Habla después del tono.",
+    "welcome_prompt": "Puedes hacer preguntas sobre materias, tareas, horarios y normas escolares.",
+    "no_input": "No te entendí, intenta de nuevo.",
+    "farewell": "Gracias por la llamada. ¡Éxitos en tus estudios!",
+    "error": "Hubo un problema con el servicio. Intenta más tarde.",
+}
+
+TWIML_PLAY_AUDIO = os.getenv("TWIML_PLAY_AUDIO", "0") == "1"
+# Prefijo para las URLs de <Play> si Twilio debe verlas absolutas (p. ej. la URL de ngrok)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
+AUDIO_ROUTE = "/audio"
+TWIML_CACHE_CONTROL = "public, max-age=300"
+AUDIO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# La plantilla dinámica se arma una vez; por turno solo se escapa e inserta el texto
+_SAY_PREFIX = XML_HEADER + "<Response>  <Say language=\"es-ES\">"
+_SAY_SUFFIX = "</Say>  <Redirect method=\"POST\">/voice</Redirect></Response>"
+
+
+def _speak(name: str, audio: Optional[Dict[str, str]] = None) -> str:
+    # <Play> con el audio pre-sintetizado si existe; si no, <Say> como siempre
+    if audio and name in audio:
+        return f"<Play>{escape(audio[name])}</Play>"
+    return f"<Say language=\"es-ES\">{escape(UTTERANCES[name])}</Say>"
+
+
+def welcome_twiml(audio: Optional[Dict[str, str]] = None) -> str:
+    # TwiML de bienvenida y redirige a /respond con recogida de voz
+    return (
+        XML_HEADER +
+        "<Response>"
+        f"  {_speak('welcome', audio)}"
+        "  <Gather input=\"speech\" language=\"es-ES\" action=\"/respond\" timeout=\"5\" speechTimeout=\"auto\">"
+        f"    {_speak('welcome_prompt', audio)}"
+        "  </Gather>"
+        "</Response>"
+    )
+
+
+def no_input_twiml(audio: Optional[Dict[str, str]] = None) -> str:
+    # Si no se entendió, pide repetir
+    return (
+        XML_HEADER +
+        "<Response>"
+        f"  {_speak('no_input', audio)}"
+        "  <Redirect method=\"POST\">/voice</Redirect>"
+        "</Response>"
+    )
+
+
+def error_twiml(audio: Optional[Dict[str, str]] = None) -> str:
+    # Groq no respondió con ningún modelo: se avisa y se vuelve a escuchar
+    return (
+        XML_HEADER +
+        "<Response>"
+        f"  {_speak('error', audio)}"
+        "  <Redirect method=\"POST\">/voice</Redirect>"
+        "</Response>"
+    )
+
+
+def say_twiml(speak_text: str) -> str:
+    # Decir directo con TwiML <Say> y volver a escuchar; el texto del modelo se escapa
+    return _SAY_PREFIX + escape(speak_text) + _SAY_SUFFIX
+
+
+def farewell_twiml(audio: Optional[Dict[str, str]] = None) -> str:
+    # Fin de llamada si el usuario se despide
+    return (
+        XML_HEADER +
+        "<Response>"
+        f"  {_speak('farewell', audio)}"
+        "  <Hangup/>"
+        "</Response>"
+    )
+
+
+def is_farewell(user_text: str) -> bool:
+    return any(w in user_text.lower() for w in FAREWELL_WORDS)
+
+
+class StaticAsset:
+    """Cuerpo inmutable ya codificado, con su ETag y cabeceras de caché."""
+
+    __slots__ = ("body", "mimetype", "etag", "headers")
+
+    def __init__(self, body: bytes, mimetype: str, cache_control: str):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.headers = {"ETag": self.etag, "Cache-Control": cache_control}
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+
+class StaticResponses:
+    """Resultado de build_static(): TwiML fijo por nombre y audios por nombre de archivo."""
+
+    def __init__(self, twiml: Dict[str, StaticAsset], audio: Dict[str, StaticAsset]):
+        self.twiml = twiml
+        self.audio = audio
+
+
+def prerender_audio(cache=None) -> (Dict[str, str], Dict[str, StaticAsset]):
+    """Sintetiza las frases fijas (con la caché de disco) y devuelve URLs de <Play> y archivos."""
+    from tts_cache import default_cache, gtts_synth
+
+    cache = cache or default_cache()
+    urls, files = {}, {}
+    for name, text in UTTERANCES.items():
+        path = cache.get_or_create(text, gtts_synth(text, tld="es"), lang="es", tld="es", engine="gtts")
+        with open(path, "rb") as f:
+            asset = StaticAsset(f.read(), "audio/mpeg", AUDIO_CACHE_CONTROL)
+        # El nombre depende del contenido: si cambia la frase cambia la URL
+        filename = asset.etag.strip('"') + ".mp3"
+        files[filename] = asset
+        urls[name] = f"{PUBLIC_BASE_URL}{AUDIO_ROUTE}/{filename}"
+    return urls, files
+
+
+def build_static(play_audio: bool = TWIML_PLAY_AUDIO) -> StaticResponses:
+    """Etapa de arranque: compila todas las respuestas TwiML fijas una sola vez."""
+    urls, files = {}, {}
+    if play_audio:
+        try:
+            urls, files = prerender_audio()
+        except Exception as e:
+            # Sin red para gTTS se sigue funcionando con <Say>
+            print(f"⚠️ No se pudo pre-sintetizar el audio fijo, se usa <Say>: {e}")
+    twiml = {
+        "welcome": welcome_twiml(urls),
+        "no_input": no_input_twiml(urls),
+        "farewell": farewell_twiml(urls),
+        "error": error_twiml(urls),
+    }
+    return StaticResponses(
+        {name: StaticAsset(body.encode("utf-8"), "text/xml", TWIML_CACHE_CONTROL) for name, body in twiml.items()},
+        files,
+    )
@@ -0,0 +1,32 @@
+"""
+Benchmarks de la ruta caliente de una llamada, sin clave de Groq, micrófono ni bocinas.
+
+Levanta fake_groq como servidor local compatible con OpenAI (latencia, jitter y
+429 configurables), sustituye speech_recognition, pyttsx3, gTTS y pygame.mixer
+por dobles deterministas y ejecuta llamadas completas de los scripts reales.
+Reporta en JSON la latencia por etapa: reconocimiento, filtro, LLM, limpieza,
+TTS y reproducción.
+
+    cd IA_fucionada
+    python -m bench --entry profesor --calls 5 --llm-latency 0.3 --jitter 0.1 --rate-429 0.05
+    python -m bench --entry all --out bench.json
+    python -m bench --entry all --baseline bench.json   # falla si alguna etapa empeora
+
+Tiempo de arranque en frío por punto de entrada (python -X importtime):
+
+    python -m bench.startup --runs 5
+
+WER y latencia de los backends de reconocimiento sobre WAV grabados:
+
+    python -m bench.asr --fixtures grabaciones/ --realtime
+
+Base de datos talkia en un SQLite local (carga masiva, resúmenes y registro de llamadas):
+
+    python -m bench.ingest --turnos 1000000
+    python -m bench.rollup --turnos 1000000
+    python -m bench.call_log --tamanos 100000,1000000
+
+Fallback del ModelRouter contra fake_groq con modelos que fallan (código 1 si algo no se cumple):
+
+    python -m bench.failover
+"""
@@ -0,0 +1,174 @@
+"""
+WER y latencia de los backends de reconocimiento (asr.py) sobre WAV de prueba.
+
+Cada fixture es un WAV mono de 16 bits con su transcripción de referencia al lado
+(pregunta1.wav + pregunta1.txt). Conviene grabarlos a 16 kHz para que whisper.cpp
+también pueda usarlos. Por backend se reporta:
+
+- load_s: carga del modelo o cliente (una sola vez por proceso)
+- wer: errores de palabra / palabras de referencia, sobre todos los fixtures
+- final_ms: del fin del audio al texto final (lo que espera el LLM tras el fin de la voz)
+- first_partial_ms: del inicio del audio al primer parcial (solo backends de streaming)
+- rtf: tiempo de proceso / duración del audio (sin --realtime)
+
+    cd IA_fucionada
+    python -m bench.asr --fixtures grabaciones/
+    python -m bench.asr --fixtures grabaciones/ --backend vosk --backend whisper --realtime
+
+Un backend cuyo paquete no está instalado aparece con "available": false.
+"""
+import argparse
+import json
+import pathlib
+import re
+import sys
+import time
+import wave
+
+from .run import SRC_DIR
+
+sys.path.insert(0, str(SRC_DIR))
+
+from asr import BACKENDS, NoSpeechError, make_backend  # noqa: E402
+from load_test import percentile  # noqa: E402
+
+CHUNK_S = 0.064  # lo mismo que entrega el micrófono (1024 muestras a 16 kHz)
+_PUNCT = re.compile(r"[^\w\s']", re.UNICODE)
+
+
+def normalize(text: str) -> list:
+    return _PUNCT.sub(" ", text.lower()).split()
+
+
+def word_errors(reference: list, hypothesis: list) -> int:
+    """Distancia de Levenshtein por palabras (sustituciones + inserciones + borrados)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref in enumerate(reference, 1):
+        current = [i]
+        for j, hyp in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref != hyp)))
+        previous = current
+    return previous[-1]
+
+
+def load_fixtures(directory: str) -> list:
+    fixtures = []
+    for wav_path in sorted(pathlib.Path(directory).glob("*.wav")):
+        txt_path = wav_path.with_suffix(".txt")
+        if not txt_path.exists():
+            print(f"⚠️ {wav_path.name}: falta {txt_path.name}, se omite", file=sys.stderr)
+            continue
+        with wave.open(str(wav_path), "rb") as f:
+            if f.getnchannels() != 1 or f.getsampwidth() != 2:
+                print(f"⚠️ {wav_path.name}: se necesita WAV mono de 16 bits, se omite", file=sys.stderr)
+                continue
+            fixtures.append({
+                "name": wav_path.stem,
+                "sample_rate": f.getframerate(),
+                "data": f.readframes(f.getnframes()),
+                "reference": txt_path.read_text(encoding="utf-8").strip(),
+            })
+    return fixtures
+
+
+def run_fixture(backend, fixture: dict, realtime: bool) -> dict:
+    rate = fixture["sample_rate"]
+    data = fixture["data"]
+    step = int(rate * CHUNK_S) * 2
+    duration = len(data) / (rate * 2)
+    start = time.perf_counter()
+    session = backend.session(rate, 2)
+    first_partial = None
+    partials = 0
+    for i in range(0, len(data), step):
+        if realtime:
+            delay = start + (i + step) / (rate * 2) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if session.feed(data[i:i + step]):
+            partials += 1
+            if first_partial is None:
+                first_partial = time.perf_counter() - start
+    fed = time.perf_counter()
+    try:
+        text = session.finish()
+    except NoSpeechError:
+        text = ""
+    done = time.perf_counter()
+    reference = normalize(fixture["reference"])
+    return {
+        "name": fixture["name"],
+        "text": text,
+        "errors": word_errors(reference, normalize(text)),
+        "words": len(reference),
+        "final_s": done - fed,
+        "first_partial_s": first_partial,
+        "partials": partials,
+        "rtf": (done - start) / duration if duration else None,
+    }
+
+
+def bench_backend(name: str, fixtures: list, realtime: bool) -> dict:
+    try:
+        backend = make_backend(name)
+        start = time.perf_counter()
+        backend.warm()
+        load_s = time.perf_counter() - start
+    except Exception as e:
+        return {"available": False, "error": f"{type(e).__name__}: {e}"}
+    results = []
+    for fixture in fixtures:
+        try:
+            results.append(run_fixture(backend, fixture, realtime))
+        except Exception as e:
+            results.append({"name": fixture["name"], "error": f"{type(e).__name__}: {e}"})
+    ok = [r for r in results if "error" not in r]
+    words = sum(r["words"] for r in ok)
+
+    def ms(values):
+        values = [v for v in values if v is not None]
+        if not values:
+            return None
+        return {"p50": round(percentile(values, 50) * 1000, 1), "p95": round(percentile(values, 95) * 1000, 1)}
+
+    return {
+        "available": True,
+        "streaming": backend.streaming,
+        "load_s": round(load_s, 3),
+        "fixtures": len(ok),
+        "failed": len(results) - len(ok),
+        "wer": round(sum(r["errors"] for r in ok) / words, 4) if words else None,
+        "final_ms": ms([r["final_s"] for r in ok]),
+        "first_partial_ms": ms([r["first_partial_s"] for r in ok]),
+        "rtf": None if realtime or not ok else round(sum(r["rtf"] for r in ok) / len(ok), 3),
+        "results": [{k: (round(v, 4) if isinstance(v, float) else v) for k, v in r.items()} for r in results],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WER y latencia de los backends de reconocimiento")
+    parser.add_argument("--fixtures", required=True, help="Carpeta con pares .wav/.txt")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS),
+                        help="Backend a medir (se puede repetir; por defecto todos)")
+    parser.add_argument("--realtime", action="store_true",
+                        help="Entrega el audio al ritmo real, como el micrófono")
+    parser.add_argument("--out", help="Guarda el resultado JSON en este archivo")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        parser.error(f"no hay fixtures .wav/.txt en {args.fixtures}")
+    result = {
+        "config": {"fixtures": len(fixtures), "realtime": args.realtime,
+                   "audio_s": round(sum(len(f["data"]) / (f["sample_rate"] * 2) for f in fixtures), 2)},
+        "backends": {name: bench_backend(name, fixtures, args.realtime) for name in (args.backend or BACKENDS)},
+    }
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
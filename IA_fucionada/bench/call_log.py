@@ -0,0 +1,124 @@
+"""
+Tiempo de las páginas del registro de llamadas (call_log.py, page_2) según crece la base.
+
+Carga turnos sintéticos (los de bench/ingest.py, 12 por sesión) en un SQLite local
+hasta cada tamaño de --tamanos y en cada uno mide, como mediana de --repeticiones:
+
+- primera: primera página sin filtros
+- mitad_cursor: la página a la mitad del registro, con su cursor (keyset)
+- mitad_offset: la misma página con LIMIT/OFFSET, como referencia
+- alumno, fechas, tema: primera página con cada filtro
+- turnos: turnos de una sesión
+- total_sin_cache / total_en_cache: el COUNT de las sesiones con el filtro de tema,
+  calculado y desde la caché
+
+Cada medición hace una llamada previa sin medir (llena la caché de totales). Con
+el cursor y los índices, todas salvo mitad_offset y total_sin_cache quedan
+acotadas por el tamaño de página aunque la base crezca 30 veces.
+
+    cd IA_fucionada
+    python -m bench.call_log --tamanos 100000,1000000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from .ingest import synthetic_turns
+from .run import SRC_DIR
+
+sys.path.insert(0, str(SRC_DIR))
+
+from call_log import CallLog, encode_cursor  # noqa: E402
+from turn_store import connect, ingest_turns  # noqa: E402
+
+
+def median_ms(fn, repeats: int) -> float:
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 2)
+
+
+def measure(db, log: CallLog, repeats: int) -> dict:
+    sessions = db.execute("SELECT COUNT(*) FROM sesiones_llamada").fetchone()[0]
+    middle = sessions // 2
+    iniciada_en, sesion_id = db.execute(
+        "SELECT iniciada_en, sesion_id FROM sesiones_llamada ORDER BY iniciada_en DESC, sesion_id DESC "
+        "LIMIT 1 OFFSET ?", (middle - 1,)).fetchone()
+    cursor = encode_cursor(iniciada_en, sesion_id)
+    student = db.execute("SELECT a.external_id FROM sesiones_llamada s JOIN alumnos a ON a.alumno_id = s.alumno_id "
+                         "ORDER BY s.iniciada_en DESC LIMIT 1").fetchone()[0]
+    day = iniciada_en[:10]
+
+    def offset_page():
+        # Lo mismo que la página con cursor, pero saltando `middle` filas
+        db.execute("SELECT s.sesion_id, s.alumno_id, a.external_id, a.nombre, s.maestro_id, s.iniciada_en, "
+                   "s.finalizada_en FROM sesiones_llamada s LEFT JOIN alumnos a ON a.alumno_id = s.alumno_id "
+                   "ORDER BY s.iniciada_en DESC, s.sesion_id DESC LIMIT ? OFFSET ?",
+                   (log.page_size + 1, middle)).fetchall()
+
+    def uncached_total():
+        log.counts.clear()
+        log.sessions(tema="examen", limit=1)
+
+    log.sessions()
+    by_cursor = log.sessions(cursor=cursor, with_total=False)
+    by_offset = db.execute("SELECT sesion_id FROM sesiones_llamada ORDER BY iniciada_en DESC, sesion_id DESC "
+                           "LIMIT ? OFFSET ?", (log.page_size, middle)).fetchall()
+    assert [s["sesion_id"] for s in by_cursor["sesiones"]] == [row[0] for row in by_offset]
+    return {
+        "sesiones": sessions,
+        "primera": median_ms(lambda: log.sessions(), repeats),
+        "mitad_cursor": median_ms(lambda: log.sessions(cursor=cursor), repeats),
+        "mitad_offset": median_ms(offset_page, repeats),
+        "alumno": median_ms(lambda: log.sessions(alumno=student), repeats),
+        "fechas": median_ms(lambda: log.sessions(desde=day, hasta=day), repeats),
+        "tema": median_ms(lambda: log.sessions(tema="examen"), repeats),
+        "turnos": median_ms(lambda: log.turns(sesion_id), repeats),
+        "total_sin_cache": median_ms(uncached_total, repeats),
+        "total_en_cache": median_ms(lambda: log.sessions(tema="examen", limit=1), repeats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Páginas del registro de llamadas: cursor vs. OFFSET según el tamaño")
+    parser.add_argument("--tamanos", default="100000,1000000", help="Turnos totales en cada medición, separados por coma")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--lote", type=int, default=5000)
+    parser.add_argument("--out", help="Guarda el resultado JSON en este archivo")
+    args = parser.parse_args()
+    sizes = sorted(int(s) for s in args.tamanos.split(","))
+
+    result = {"config": {"tamanos": sizes, "repeticiones": args.repeticiones}, "sizes": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'talkia.db')}"
+        db, ph = connect(url)
+        log = CallLog(url)
+        loaded = 0
+        for size in sizes:
+            ingest_turns(db, ph, synthetic_turns(size - loaded, first=loaded), args.lote)
+            loaded = size
+            db.execute("ANALYZE")
+            result["sizes"][size] = stats = measure(db, log, args.repeticiones)
+            print(f"📄 {size} turnos ({stats['sesiones']} sesiones): primera {stats['primera']} ms, "
+                  f"mitad con cursor {stats['mitad_cursor']} ms, con OFFSET {stats['mitad_offset']} ms, "
+                  f"total {stats['total_sin_cache']} → {stats['total_en_cache']} ms", file=sys.stderr)
+        log.close()
+        db.close()
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
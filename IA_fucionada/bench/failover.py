@@ -0,0 +1,181 @@
+"""
+Comprueba el fallback del ModelRouter contra fake_groq con modelos que fallan.
+
+Levanta fake_groq.py con --fail-model y manda turnos con el cliente Groq del
+SDK (como server.py) a través de ModelRouter. Verifica que:
+
+1. retirado: un 404 de modelo abre el circuito por el enfriamiento largo, el
+   turno lo responde el siguiente modelo, que queda como preferido, y el modelo
+   retirado no se vuelve a probar en los turnos siguientes
+2. saturado: un 503 abre el circuito (umbral 1) por el enfriamiento corto; al
+   vencer pasa a half-open, una petición de prueba que falla lo reabre y una
+   respuesta buena lo cierra
+3. prueba_unica: en half-open solo una petición prueba el modelo; otra que llega
+   mientras tanto lo salta, y al responder la prueba el circuito se cierra
+4. sin_modelos: si todos fallan, el turno levanta el error del último modelo
+
+Termina con código 1 si alguna comprobación falla.
+
+    cd IA_fucionada
+    python -m bench.failover
+"""
+import argparse
+import json
+import sys
+
+from .run import SRC_DIR
+
+sys.path.insert(0, str(SRC_DIR))
+
+from load_test import start_fake_groq  # noqa: E402
+from model_router import CLOSED, DEPRECATED_COOLDOWN_SECONDS, HALF_OPEN, OPEN, ModelRouter  # noqa: E402
+
+RETIRED = "llama-3.3-70b-versatile"
+FALLBACK = "llama-3.1-8b-instant"
+BUSY = "openai/gpt-oss-20b"
+BROKEN = "openai/gpt-oss-120b"
+
+
+class _Clock:
+    """Reloj manual para vencer el enfriamiento sin esperar."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _turn(router: ModelRouter, client) -> str:
+    def _call(model: str) -> str:
+        client.chat.completions.create(model=model, max_tokens=32,
+                                       messages=[{"role": "user", "content": "¿Cuándo es el examen?"}])
+        return model
+
+    return router.complete(_call)
+
+
+def check_retired(client) -> dict:
+    router = ModelRouter([RETIRED, FALLBACK])
+    answered = [_turn(router, client) for _ in range(3)]
+    stats = router.stats()
+    retired = stats["models"][RETIRED]
+    return {
+        "answered_by": answered,
+        "preferred": stats["preferred"],
+        "retired_state": retired["state"],
+        "retired_requests": retired["requests"],
+        "ok": (answered == [FALLBACK] * 3 and stats["preferred"] == FALLBACK and retired["state"] == OPEN
+               and retired["requests"] == 1 and retired["reopens_in_s"] > DEPRECATED_COOLDOWN_SECONDS - 60),
+    }
+
+
+def check_busy(client) -> dict:
+    clock = _Clock()
+    router = ModelRouter([BUSY, FALLBACK], failure_threshold=1, cooldown=30, clock=clock)
+    first = _turn(router, client)
+    opened = router.stats()["models"][BUSY]["state"]
+    clock.now += 31
+    half_open = router.stats()["models"][BUSY]["state"]
+
+    # Solo el modelo saturado: la petición de prueba en half-open falla y el circuito se reabre
+    alone = ModelRouter([BUSY], failure_threshold=1, cooldown=30, clock=clock)
+    for advance in (31, 0):
+        try:
+            _turn(alone, client)
+        except Exception:
+            pass
+        clock.now += advance
+    reopened = alone.stats()["models"][BUSY]
+
+    # Un modelo que vuelve a responder en half-open cierra su circuito
+    recovered = ModelRouter([FALLBACK], failure_threshold=1, cooldown=30, clock=clock)
+    recovered.record_failure(FALLBACK, RuntimeError("caída breve"))
+    clock.now += 31
+    _turn(recovered, client)
+    closed = recovered.stats()["models"][FALLBACK]["state"]
+    return {
+        "answered_by": first,
+        "states": [opened, half_open, reopened["state"], closed],
+        "busy_requests": reopened["requests"],
+        "ok": (first == FALLBACK and router.stats()["preferred"] == FALLBACK and opened == OPEN
+               and half_open == HALF_OPEN and reopened["state"] == OPEN and reopened["requests"] == 2
+               and closed == CLOSED),
+    }
+
+
+def check_single_probe(client) -> dict:
+    clock = _Clock()
+    router = ModelRouter([FALLBACK], failure_threshold=1, cooldown=30, clock=clock)
+    router.record_failure(FALLBACK, RuntimeError("caída breve"))
+    clock.now += 31
+    during = {}
+
+    def _probe(model: str) -> str:
+        # Otra petición llega mientras la prueba está en curso
+        during["order"] = router.order()
+        try:
+            during["answered_by"] = _turn(router, client)
+        except Exception as e:
+            during["answered_by"] = None
+            during["error"] = type(e).__name__
+        client.chat.completions.create(model=model, max_tokens=32,
+                                       messages=[{"role": "user", "content": "¿Cuándo es el examen?"}])
+        return model
+
+    probe = router.complete(_probe)
+    health = router.stats()["models"][FALLBACK]
+    return {
+        "probe": probe,
+        "during": during,
+        "state": health["state"],
+        "ok": (probe == FALLBACK and during.get("order") == [] and during.get("answered_by") is None
+               and health["state"] == CLOSED and not health["probing"]),
+    }
+
+
+def check_all_failing(client) -> dict:
+    router = ModelRouter([RETIRED, BROKEN])
+    try:
+        _turn(router, client)
+    except Exception as e:
+        error = f"{type(e).__name__}: {getattr(e, 'status_code', None)}"
+        return {"error": error, "ok": getattr(e, "status_code", None) == 500}
+    return {"error": None, "ok": False}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fallback del ModelRouter contra fake_groq con modelos que fallan")
+    parser.add_argument("--out", help="Guarda el resultado JSON en este archivo")
+    args = parser.parse_args()
+
+    from groq import Groq
+
+    proc, base_url = start_fake_groq(0.0, [f"{RETIRED}=404", f"{BUSY}=503", f"{BROKEN}=500"])
+    try:
+        # Sin reintentos del SDK: cada error llega al router en el primer intento
+        client = Groq(api_key="fake-key", base_url=base_url, max_retries=0)
+        result = {
+            "retirado": check_retired(client),
+            "saturado": check_busy(client),
+            "prueba_unica": check_single_probe(client),
+            "sin_modelos": check_all_failing(client),
+        }
+        client.close()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    for name, check in result.items():
+        print(f"{'✅' if check['ok'] else '❌'} {name}", file=sys.stderr)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    if not all(check["ok"] for check in result.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Dobles deterministas de speech_recognition, pyttsx3, gTTS y pygame.mixer.
+
+Se instalan en sys.modules antes de importar los scripts, así el código real de
+la llamada corre sin micrófono, bocinas ni red de Google.
+
+El micrófono falso entrega PCM al ritmo real: ruido de fondo, eco mientras suena
+la reproducción y la voz del alumno (un tono cuya amplitud codifica la frase,
+así recognize_google() sabe qué texto devolver aunque la frase llegue recortada).
+El alumno habla `reaction_s` después de que termina la profesora o, con
+`barge_in_after`, esos segundos después de que empieza (la interrumpe). Si nadie
+reconoce su frase, la repite tras `idle_s` de silencio.
+
+Cada doble reporta su etapa al StageClock:
+
+- recognition: desde que el alumno termina de hablar hasta que recognize_google() devuelve el texto
+- response: desde que el alumno termina de hablar hasta que empieza el siguiente audio de la profesora
+- turn: desde el primer intento de decir una frase (repeticiones incluidas) hasta ese mismo audio
+- overlap: desde que el alumno empieza a hablar encima hasta que la reproducción se detiene
+- tts: gTTS.save() / pyttsx3.say()
+- playback: desde mixer.music.play() hasta que get_busy() devuelve False (o stop())
+"""
+import array
+import random
+import sys
+import threading
+import time
+import types
+from collections import deque
+from typing import Iterable, Optional
+
+from .stages import StageClock
+
+
+class FakeAudioEnvironment:
+    """Guion de frases del alumno y retardos simulados de ASR, TTS y reproducción."""
+
+    # Amplitudes del PCM falso: la voz siempre supera al eco y al ruido
+    NOISE_AMP = 100
+    ECHO_AMP = 300
+    SPEECH_AMP = 6000
+    # El alumno espera a que la línea esté abierta (calibración del micrófono) antes de hablar
+    LINE_OPEN_S = 0.3
+
+    def __init__(self, clock: StageClock, asr_delay: float = 0.0, tts_delay: float = 0.0,
+                 playback_s_per_char: float = 0.0, farewell: str = "adiós",
+                 speech_s_per_char: float = 0.01, reaction_s: float = 0.2,
+                 barge_in_after: Optional[float] = None, idle_s: float = 3.0):
+        self.clock = clock
+        self.asr_delay = asr_delay
+        self.tts_delay = tts_delay
+        self.playback_s_per_char = playback_s_per_char
+        self.farewell = farewell
+        self.speech_s_per_char = speech_s_per_char
+        self.reaction_s = reaction_s
+        self.barge_in_after = barge_in_after
+        self.idle_s = idle_s
+        self._phrases = deque()
+        self._lock = threading.Lock()
+        self._rnd = random.Random(7)
+        # Estado del alumno simulado (todo bajo _lock)
+        self._texts = []            # id de frase -> texto
+        self._ended = {}            # id de frase -> instante en que terminó de decirla
+        self._first_onset = {}      # id de frase -> primer intento de decirla
+        self._current = None        # id de la frase que el alumno quiere que le reconozcan
+        self._speak_at = None       # cuándo empieza a hablar
+        self._speaking_until = None
+        self._onset = 0.0
+        self._overlapping = False   # empezó a hablar con la profesora sonando
+        self._quiet_since = time.perf_counter()
+        self._response_from = None  # fin de la última frase reconocida
+        self._turn_from = None      # primer intento de la última frase reconocida
+        self._line_open_at = 0.0
+        self._playing = 0
+
+    def script(self, phrases: Iterable[str]):
+        """Frases que "dirá" el alumno en la próxima llamada; al acabarse se despide."""
+        with self._lock:
+            self._phrases = deque(list(phrases) + [self.farewell])
+            self._current = self._speak_at = self._speaking_until = self._response_from = self._turn_from = None
+            self._overlapping = False
+
+    def next_phrase(self) -> str:
+        with self._lock:
+            return self._phrases.popleft() if self._phrases else self.farewell
+
+    # -- alumno simulado --
+
+    def _phrase_id(self, text: str) -> int:
+        self._texts.append(text)
+        return len(self._texts) - 1
+
+    def _pending(self) -> Optional[int]:
+        """Frase que el alumno tiene por decir (la actual sin reconocer o la siguiente del guion)."""
+        if self._current is None and self._phrases:
+            self._current = self._phrase_id(self._phrases.popleft())
+        return self._current
+
+    def _schedule(self, at: float):
+        if self._speak_at is None and self._speaking_until is None and self._pending() is not None:
+            self._speak_at = max(at, self._line_open_at + self.LINE_OPEN_S)
+
+    def _playback_started(self):
+        now = time.perf_counter()
+        with self._lock:
+            self._playing += 1
+            if self._response_from is not None:
+                self.clock.record("response", now - self._response_from)
+                self.clock.record("turn", now - self._turn_from)
+                self._response_from = self._turn_from = None
+            # Si la profesora sigue hablando (otra oración), el alumno espera a que termine
+            self._speak_at = None
+            if self.barge_in_after is not None:
+                self._schedule(now + self.barge_in_after)
+
+    def _playback_stopped(self):
+        now = time.perf_counter()
+        with self._lock:
+            self._playing = max(0, self._playing - 1)
+            if self._overlapping:
+                self.clock.record("overlap", now - self._onset)
+                self._overlapping = False
+            self._quiet_since = now
+            self._schedule(now + self.reaction_s)
+
+    def _mic_frame(self, frames: int) -> bytes:
+        now = time.perf_counter()
+        with self._lock:
+            if self._speaking_until is not None and now >= self._speaking_until:
+                self._ended[self._current] = self._speaking_until
+                self._speaking_until = None
+                self._quiet_since = now
+            if self._speaking_until is None and self._speak_at is None and not self._playing \
+                    and now - self._quiet_since >= self.idle_s:
+                # Nadie le contestó: repite la frase (o dice la siguiente)
+                self._schedule(now)
+            if self._speak_at is not None and now >= self._speak_at:
+                text = self._texts[self._pending()]
+                self._speaking_until = now + max(0.4, len(text) * self.speech_s_per_char)
+                self._speak_at = None
+                self._onset = now
+                self._first_onset.setdefault(self._current, now)
+                self._overlapping = bool(self._playing)
+            if self._speaking_until is not None:
+                # Onda cuadrada: RMS = amplitud = SPEECH_AMP + id de la frase
+                amp = self.SPEECH_AMP + self._current
+                samples = array.array("h", [amp, -amp] * (frames // 2) + [amp] * (frames % 2))
+            else:
+                amp = self.ECHO_AMP if self._playing else self.NOISE_AMP
+                samples = array.array("h", (self._rnd.randint(-amp, amp) for _ in range(frames)))
+        if sys.byteorder == "big":
+            samples.byteswap()
+        return samples.tobytes()
+
+    def _recognized(self, frame_data: bytes) -> Optional[str]:
+        samples = array.array("h")
+        samples.frombytes(frame_data[:len(frame_data) - len(frame_data) % 2])
+        if sys.byteorder == "big":
+            samples.byteswap()
+        phrase_id = max((abs(s) for s in samples), default=0) - self.SPEECH_AMP
+        now = time.perf_counter()
+        with self._lock:
+            if phrase_id < 0 or phrase_id >= len(self._texts):
+                return None
+            ended = self._ended.get(phrase_id, now)
+            self.clock.record("recognition", now - ended)
+            if phrase_id == self._current:
+                self._current = None
+                self._response_from = ended
+                self._turn_from = self._first_onset.get(phrase_id, ended)
+                self._quiet_since = now
+            return self._texts[phrase_id]
+
+    def install(self):
+        sys.modules["speech_recognition"] = self._speech_recognition()
+        sys.modules["gtts"] = self._gtts()
+        sys.modules["pyttsx3"] = self._pyttsx3()
+        pygame, mixer = self._pygame()
+        sys.modules["pygame"] = pygame
+        sys.modules["pygame.mixer"] = mixer
+        return self
+
+    # -- speech_recognition --
+
+    def _speech_recognition(self) -> types.ModuleType:
+        env = self
+        mod = types.ModuleType("speech_recognition")
+
+        class WaitTimeoutError(Exception):
+            pass
+
+        class UnknownValueError(Exception):
+            pass
+
+        class RequestError(Exception):
+            pass
+
+        class AudioData:
+            def __init__(self, frame_data: bytes, sample_rate: int, sample_width: int):
+                self.frame_data = frame_data
+                self.sample_rate = sample_rate
+                self.sample_width = sample_width
+
+        class FakeStream:
+            """Stream de PyAudio al ritmo real con el audio del alumno simulado (para audio_input.AudioInput)."""
+
+            def __init__(self, sample_rate: int):
+                self.sample_rate = sample_rate
+                self._next = time.perf_counter()
+
+            def read(self, frames: int, exception_on_overflow: bool = True) -> bytes:
+                self._next += frames / self.sample_rate
+                delay = self._next - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                return env._mic_frame(frames)
+
+        class Microphone:
+            SAMPLE_WIDTH = 2
+
+            def __init__(self, device_index=None, sample_rate=None, chunk_size: int = 1024):
+                self.SAMPLE_RATE = sample_rate or 16000
+                self.CHUNK = chunk_size
+                self.stream = None
+
+            def __enter__(self):
+                with env._lock:
+                    env._line_open_at = time.perf_counter()
+                self.stream = FakeStream(self.SAMPLE_RATE)
+                return self
+
+            def __exit__(self, *exc):
+                self.stream = None
+                return False
+
+        class Recognizer:
+            def __init__(self):
+                self.energy_threshold = 300
+                self.dynamic_energy_threshold = True
+                self.pause_threshold = 0.8
+                self.phrase_threshold = 0.3
+                self.non_speaking_duration = 0.5
+
+            def adjust_for_ambient_noise(self, source, duration: float = 1.0):
+                pass
+
+            def listen(self, source, timeout: Optional[float] = None, phrase_time_limit: Optional[float] = None):
+                # Recognizer.listen() clásico: la siguiente frase del guion, ya terminada
+                with env._lock:
+                    phrase_id = env._phrase_id(env._phrases.popleft() if env._phrases else env.farewell)
+                    env._ended[phrase_id] = time.perf_counter()
+                amp = env.SPEECH_AMP + phrase_id
+                return AudioData(array.array("h", [amp, -amp]).tobytes(), 16000, 2)
+
+            def recognize_google(self, audio, language: str = "es-ES"):
+                if env.asr_delay:
+                    time.sleep(env.asr_delay)
+                text = env._recognized(audio.frame_data)
+                if text is None:
+                    raise UnknownValueError()
+                return text
+
+        for cls in (WaitTimeoutError, UnknownValueError, RequestError, AudioData, Microphone, Recognizer):
+            setattr(mod, cls.__name__, cls)
+        return mod
+
+    # -- gTTS --
+
+    def _gtts(self) -> types.ModuleType:
+        env = self
+        mod = types.ModuleType("gtts")
+
+        class gTTS:
+            def __init__(self, text: str, lang: str = "es", tld: str = "com", slow: bool = False):
+                self.text = text
+
+            def save(self, path: str):
+                start = time.perf_counter()
+                if env.tts_delay:
+                    time.sleep(env.tts_delay)
+                # El "audio" es el propio texto: la reproducción falsa dura según su longitud
+                with open(path, "wb") as f:
+                    f.write(self.text.encode("utf-8"))
+                env.clock.record("tts", time.perf_counter() - start)
+
+        mod.gTTS = gTTS
+        return mod
+
+    # -- pyttsx3 --
+
+    def _pyttsx3(self) -> types.ModuleType:
+        env = self
+        mod = types.ModuleType("pyttsx3")
+
+        class Engine:
+            def __init__(self):
+                self._props = {"voices": [], "rate": 200, "volume": 1.0, "voice": None}
+                self._pending = []
+                self._stopped = threading.Event()
+
+            def getProperty(self, name):
+                return self._props.get(name)
+
+            def setProperty(self, name, value):
+                self._props[name] = value
+
+            def say(self, text: str):
+                start = time.perf_counter()
+                if env.tts_delay:
+                    time.sleep(env.tts_delay)
+                self._pending.append(text)
+                env.clock.record("tts", time.perf_counter() - start)
+
+            def runAndWait(self):
+                start = time.perf_counter()
+                chars = sum(len(t) for t in self._pending)
+                self._pending = []
+                self._stopped.clear()
+                env._playback_started()
+                # stop() desde otro hilo corta la "reproducción" como en el motor real
+                self._stopped.wait(chars * env.playback_s_per_char)
+                env._playback_stopped()
+                env.clock.record("playback", time.perf_counter() - start)
+
+            def stop(self):
+                self._pending = []
+                self._stopped.set()
+
+        mod.init = lambda *args, **kwargs: Engine()
+        return mod
+
+    # -- pygame.mixer --
+
+    def _pygame(self):
+        env = self
+        pygame = types.ModuleType("pygame")
+        mixer = types.ModuleType("pygame.mixer")
+
+        class Music:
+            def __init__(self):
+                self._chars = 0
+                self._started = None
+                self._lock = threading.Lock()
+                self._ends = 0.0
+                self._volume = 1.0
+
+            def load(self, path: str):
+                with open(path, "rb") as f:
+                    self._chars = len(f.read().decode("utf-8", "ignore"))
+
+            def set_volume(self, volume: float):
+                self._volume = volume
+
+            def play(self):
+                self._started = time.perf_counter()
+                self._ends = self._started + self._chars * env.playback_s_per_char
+                env._playback_started()
+
+            def get_busy(self) -> bool:
+                if self._started is None:
+                    return False
+                if time.perf_counter() < self._ends:
+                    return True
+                self.stop()
+                return False
+
+            def stop(self):
+                # get_busy() y un barge-in (hilo del micrófono) pueden llegar a la vez
+                with self._lock:
+                    started, self._started = self._started, None
+                if started is not None:
+                    env._playback_stopped()
+                    env.clock.record("playback", time.perf_counter() - started)
+
+            def unload(self):
+                pass
+
+        mixer.music = Music()
+        mixer.init = lambda *args, **kwargs: None
+        mixer.quit = lambda: None
+        mixer.get_init = lambda: True
+        pygame.mixer = mixer
+        return pygame, mixer
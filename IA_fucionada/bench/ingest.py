@@ -0,0 +1,139 @@
+"""
+Carga masiva de turnos en el esquema talkia: por fila (sp_insertar_turno) vs. por lotes.
+
+Genera turnos sintéticos (12 por sesión, alumnos identificados por external_id,
+tema, modelo y tokens) y los escribe en un SQLite local de tres maneras:
+
+- fila: como una llamada a sp_insertar_turno por turno (buscar alumno, IF NOT EXISTS
+  de la sesión, insertar y confirmar), sin índice sobre alumnos.external_id
+- fila_indice: lo mismo con el índice único ux_alumnos_external_id
+- lote: turn_store.ingest_turns(), sentencias de conjunto y un commit por lote
+
+Por modo reporta filas/s. Los modos por fila son lentos: usan --filas-por-fila.
+
+    cd IA_fucionada
+    python -m bench.ingest --turnos 1000000
+    python -m bench.ingest --turnos 200000 --modo lote --lote 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from .run import SRC_DIR
+
+sys.path.insert(0, str(SRC_DIR))
+
+from turn_store import connect, ingest_turns  # noqa: E402
+
+MODES = ["fila", "fila_indice", "lote"]
+TOPICS = ["matemáticas", "historia", "examen", "tarea", "ciencias", None]
+MODELS = ["llama-3.1-8b-instant", "llama-3.3-70b-versatile"]
+PHRASES = ["¿Me explica otra vez las fracciones?", "La fotosíntesis ocurre en las hojas.",
+           "¿Cuándo es el examen de historia?", "Repasa los capítulos 3 y 4 para el viernes.",
+           "No entendí la tarea de ciencias.", "Muy bien, sigue practicando."]
+
+
+def synthetic_turns(count: int, students: int = 5000, per_session: int = 12, seed: int = 7, first: int = 0):
+    """Turnos como los que guarda la llamada: alternan Alumno y Profesora dentro de cada sesión.
+
+    Un turno cada 7 s desde el 1 de enero de 2026; `first` continúa la serie (turnos nuevos).
+    """
+    rnd = random.Random(f"{seed}-{first}")
+    start = time.mktime((2026, 1, 1, 8, 0, 0, 0, 0, -1))
+    for i in range(first, first + count):
+        session = i // per_session
+        alumno = rnd.randrange(students) if i % per_session == 0 else None
+        professor = i % 2 == 1
+        yield {
+            "sesion_id": f"sesion-{session:08d}",
+            "alumno_external_id": f"alumno-{alumno}" if alumno is not None else None,
+            "maestro_id": rnd.randint(1, 20) if alumno is not None else None,
+            "rol_emisor": "Profesora" if professor else "Alumno",
+            "transcripcion": rnd.choice(PHRASES),
+            "tema": rnd.choice(TOPICS),
+            "duracion_audio": round(rnd.uniform(1, 12), 2),
+            "modelo_ia_usado": rnd.choice(MODELS) if professor else None,
+            "tokenes_consumidos": rnd.randint(40, 400) if professor else None,
+            "fecha_turno": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start + i * 7)),
+        }
+
+
+def insert_row_by_row(db, turns) -> int:
+    """Lo que hace sp_insertar_turno por cada turno, más la búsqueda del alumno por external_id."""
+    rows = 0
+    students = {}
+    for t in turns:
+        cur = db.cursor()
+        alumno_id = None
+        external_id = t["alumno_external_id"]
+        if external_id:
+            cur.execute("SELECT alumno_id FROM alumnos WHERE external_id = ?", (external_id,))
+            found = cur.fetchone()
+            if found is None:
+                cur.execute("INSERT INTO alumnos (external_id) VALUES (?)", (external_id,))
+                alumno_id = cur.lastrowid
+            else:
+                alumno_id = found[0]
+            students[t["sesion_id"]] = alumno_id
+        cur.execute("SELECT 1 FROM sesiones_llamada WHERE sesion_id = ?", (t["sesion_id"],))
+        if cur.fetchone() is None:
+            cur.execute("INSERT INTO sesiones_llamada (sesion_id, alumno_id, iniciada_en) VALUES (?, ?, ?)",
+                        (t["sesion_id"], students.get(t["sesion_id"]), t["fecha_turno"]))
+        cur.execute("INSERT INTO turnos_conversacion (sesion_id, rol_emisor, transcripcion, tema, duracion_audio, "
+                    "modelo_ia_usado, tokenes_consumidos, fecha_turno) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (t["sesion_id"], t["rol_emisor"], t["transcripcion"], t["tema"], t["duracion_audio"],
+                     t["modelo_ia_usado"], t["tokenes_consumidos"], t["fecha_turno"]))
+        # Cada CALL es su propia transacción (autocommit)
+        db.commit()
+        rows += 1
+    return rows
+
+
+def bench_mode(mode: str, count: int, batch_size: int, students: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db, ph = connect(f"sqlite:///{os.path.join(tmp, 'talkia.db')}")
+        if mode == "fila":
+            db.execute("DROP INDEX ux_alumnos_external_id")
+        turns = list(synthetic_turns(count, students))
+        start = time.perf_counter()
+        if mode == "lote":
+            rows = ingest_turns(db, ph, turns, batch_size)
+        else:
+            rows = insert_row_by_row(db, turns)
+        wall = time.perf_counter() - start
+        sessions, linked = db.execute("SELECT COUNT(*), COUNT(alumno_id) FROM sesiones_llamada").fetchone()
+        db.close()
+    return {"turnos": rows, "sesiones": sessions, "sesiones_con_alumno": linked, "wall_s": round(wall, 3),
+            "filas_s": round(rows / wall) if wall else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filas/s al cargar turnos: por fila vs. por lotes")
+    parser.add_argument("--turnos", type=int, default=1_000_000, help="Turnos del modo lote")
+    parser.add_argument("--filas-por-fila", type=int, default=50_000, help="Turnos de los modos por fila")
+    parser.add_argument("--alumnos", type=int, default=5000, help="external_id distintos")
+    parser.add_argument("--lote", type=int, default=5000, help="Turnos por lote (modo lote)")
+    parser.add_argument("--modo", action="append", choices=MODES, help="Se puede repetir; por defecto todos")
+    parser.add_argument("--out", help="Guarda el resultado JSON en este archivo")
+    args = parser.parse_args()
+
+    result = {"config": {"turnos": args.turnos, "filas_por_fila": args.filas_por_fila, "alumnos": args.alumnos,
+                         "lote": args.lote}, "modes": {}}
+    for mode in args.modo or MODES:
+        count = args.turnos if mode == "lote" else min(args.turnos, args.filas_por_fila)
+        result["modes"][mode] = stats = bench_mode(mode, count, args.lote, args.alumnos)
+        print(f"💾 {mode}: {stats['turnos']} turnos en {stats['wall_s']}s ({stats['filas_s']} filas/s)",
+              file=sys.stderr)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Tableros desde los resúmenes diarios vs. desde los turnos crudos.
+
+Carga turnos sintéticos (los de bench/ingest.py, un turno cada 7 s desde enero de
+2026) y evaluaciones de una parte de las respuestas de la profesora en un SQLite
+local. Después:
+
+1. corre turn_rollup.refresh() por primera vez (todos los días)
+2. agrega --nuevos turnos y evaluaciones y mide la corrida incremental (desde la marca)
+3. mide cada consulta de turn_rollup.DASHBOARD_QUERIES sobre los últimos --dias
+   días, contra los turnos crudos y contra los resúmenes, y verifica que den lo mismo
+
+    cd IA_fucionada
+    python -m bench.rollup --turnos 1000000
+    python -m bench.rollup --turnos 200000 --dias 7 --repeticiones 10
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from .ingest import synthetic_turns
+from .run import SRC_DIR
+
+sys.path.insert(0, str(SRC_DIR))
+
+from turn_rollup import DASHBOARD_QUERIES, dashboard, refresh  # noqa: E402
+from turn_store import connect, ingest_turns  # noqa: E402
+
+
+def add_evaluations(db, after_id: int):
+    """Una evaluación (1 a 5, una hora después) por cada quinta respuesta de la profesora."""
+    db.execute("INSERT INTO evaluaciones (turno_id, evaluador, puntuacion, fecha_evaluacion) "
+               "SELECT turno_id, 'AlumnoExigente', turno_id % 5 + 1, datetime(fecha_turno, '+1 hour') "
+               "FROM turnos_conversacion WHERE rol_emisor = 'Profesora' AND turno_id % 10 = 0 AND turno_id > ?",
+               (after_id,))
+    db.commit()
+
+
+def load(db, ph, first: int, count: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    last_id = db.execute("SELECT COALESCE(MAX(turno_id), 0) FROM turnos_conversacion").fetchone()[0]
+    ingest_turns(db, ph, synthetic_turns(count, first=first), batch_size)
+    add_evaluations(db, last_id)
+    return time.perf_counter() - start
+
+
+def time_query(db, ph, name: str, since: str, until: str, source: str, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = dashboard(db, ph, name, since, until, source)
+        samples.append(time.perf_counter() - start)
+    return rows, round(statistics.median(samples) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tableros desde resúmenes vs. turnos crudos")
+    parser.add_argument("--turnos", type=int, default=1_000_000, help="Turnos cargados antes del primer resumen")
+    parser.add_argument("--nuevos", type=int, default=10_000, help="Turnos agregados antes de la corrida incremental")
+    parser.add_argument("--dias", type=int, default=30, help="Días que abarca cada consulta de tablero")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--lote", type=int, default=5000)
+    parser.add_argument("--out", help="Guarda el resultado JSON en este archivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db, ph = connect(f"sqlite:///{os.path.join(tmp, 'talkia.db')}")
+        result = {"config": vars(args).copy()}
+        result["config"].pop("out")
+        result["load_s"] = round(load(db, ph, 0, args.turnos, args.lote), 2)
+        result["rollup_full"] = refresh(db, ph)
+        load(db, ph, args.turnos, args.nuevos, args.lote)
+        result["rollup_incremental"] = refresh(db, ph)
+
+        newest = db.execute("SELECT MAX(fecha_turno) FROM turnos_conversacion").fetchone()[0][:10]
+        until = (datetime.date.fromisoformat(newest) + datetime.timedelta(days=1)).isoformat()
+        since = (datetime.date.fromisoformat(until) - datetime.timedelta(days=args.dias)).isoformat()
+        result["queries"] = {}
+        for name in DASHBOARD_QUERIES:
+            raw_rows, raw_ms = time_query(db, ph, name, since, until, "crudo", args.repeticiones)
+            rollup_rows, rollup_ms = time_query(db, ph, name, since, until, "resumen", args.repeticiones)
+            result["queries"][name] = {"rows": len(rollup_rows), "raw_ms": raw_ms, "rollup_ms": rollup_ms,
+                                       "speedup": round(raw_ms / rollup_ms, 1) if rollup_ms else None,
+                                       "same_result": raw_rows == rollup_rows}
+            print(f"📊 {name}: crudo {raw_ms} ms, resumen {rollup_ms} ms "
+                  f"({'iguales' if raw_rows == rollup_rows else '⚠️ distintos'})", file=sys.stderr)
+        db.close()
+
+    for key in ("rollup_full", "rollup_incremental"):
+        for stats in result[key].values():
+            stats["ranges"] = len(stats["ranges"])
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    if not all(q["same_result"] for q in result["queries"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Ejecuta llamadas completas de cada punto de entrada contra fake_groq y reporta JSON.
+
+Puntos de entrada:
+- profesor: IA_Maestro/src/profesor_llamada.py (micrófono -> filtro -> LLM -> limpieza -> gTTS -> mixer)
+- llamada:  llamada_completa.py (alumno IA <-> profesora IA, sin streaming para separar etapas)
+- server:   IA_Maestro/src/server.py (webhooks /voice y /respond con el cliente de pruebas de Flask)
+
+El alumno de profesor habla por el micrófono falso (ver fakes.py). "response" es la
+latencia de toma de turno: del fin de su frase al siguiente audio de la profesora.
+Con --barge-in-after el alumno interrumpe cada respuesta; con --barge-in la
+profesora se calla ("overlap" mide cuánto siguió sonando encima del alumno).
+Con --tpm el Groq falso aplica una cuota de tokens por minuto con encabezados
+x-ratelimit-*, para ver cuánto espera de verdad el limitador de llamada_completa.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+from typing import Optional
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+SRC_DIR = ROOT / "IA_Maestro" / "src"
+sys.path.insert(0, str(SRC_DIR))
+sys.path.insert(0, str(ROOT))
+
+from fake_groq import FakeGroqServer  # noqa: E402
+
+from .fakes import FakeAudioEnvironment  # noqa: E402
+from .stages import SleepSkipper, StageClock  # noqa: E402
+
+ENTRIES = ["profesor", "llamada", "server"]
+
+# Preguntas del alumno simulado (la última de cada llamada es la despedida)
+PREGUNTAS = [
+    "¿Cómo se suman fracciones con distinto denominador?",
+    "¿Qué es la fotosíntesis?",
+    "¿Cuándo es el examen de historia?",
+    "¿Me explica el teorema de Pitágoras?",
+    "¿Qué tarea hay para mañana?",
+]
+
+
+def _phrases(call: int, turns: int):
+    return [PREGUNTAS[(call + i) % len(PREGUNTAS)] for i in range(turns)]
+
+
+def prepare_environment(base_url: str, cache_dir: str):
+    # Antes de importar los scripts: leen estas variables al cargarse
+    os.environ.update({
+        "GROQ_BASE_URL": base_url,
+        "GROQ_API_KEY": "bench-key",
+        # Vacía (no ausente) para que un .env local no la rellene con la clave cifrada real
+        "GROQ_API_KEY_ENCRYPTED": "",
+        "TTS_CACHE_DIR": cache_dir,
+        "LLAMADA_STREAMING": "0",
+        "TWIML_PLAY_AUDIO": "0",
+        # El micrófono falso no necesita 2 s de calibración
+        "MIC_CALIBRATION_S": "0.2",
+        # Sin --tpm el Groq falso no tiene cuota: el limitador no debe frenar con la del plan gratuito.
+        # Con --tpm arranca igual de optimista y aprende la cuota real de los encabezados
+        "GROQ_LIMIT_RPM": "100000",
+        "GROQ_LIMIT_TPM": "10000000",
+    })
+    os.environ.pop("SESSION_SQLITE_PATH", None)
+
+
+def run_profesor(clock: StageClock, env: FakeAudioEnvironment, calls: int, turns: int, barge_in: bool = False):
+    import profesor_llamada as mod
+
+    mod.is_school_related = clock.wrap("filter", mod.is_school_related)
+    mod.chat = clock.wrap("llm", mod.chat)
+    mod.clean_for_speech = clock.wrap("clean", mod.clean_for_speech)
+    argv = sys.argv
+    sys.argv = ["profesor_llamada.py"] + (["--barge-in"] if barge_in else [])
+    try:
+        for call in range(calls):
+            env.script(_phrases(call, turns))
+            with clock.measure("call"):
+                mod.run_call_simulation()
+    finally:
+        sys.argv = argv
+
+
+def run_llamada(clock: StageClock, env: FakeAudioEnvironment, calls: int, turns: int, barge_in: bool = False):
+    import llamada_completa as mod
+
+    mod.USAR_BARGE_IN = barge_in
+    mod.llamar_groq = clock.wrap("llm", mod.llamar_groq)
+    mod.clean_for_speech = clock.wrap("clean", mod.clean_for_speech)
+    # "Presiona Enter para iniciar la llamada"
+    mod.input = lambda prompt="": ""
+    # La cantidad de turnos la decide el propio script (máximo 6)
+    for _call in range(calls):
+        with clock.measure("call"):
+            mod.iniciar_llamada_completa()
+
+
+def run_server(clock: StageClock, env: FakeAudioEnvironment, calls: int, turns: int, barge_in: bool = False):
+    import server as mod
+
+    mod.groq_chat = clock.wrap("llm", mod.groq_chat)
+    mod.clean_for_speech = clock.wrap("clean", mod.clean_for_speech)
+    client = mod.app.test_client()
+    for call in range(calls):
+        call_sid = f"CAbench{call:06d}"
+        with clock.measure("call"):
+            with clock.measure("request"):
+                client.post("/voice")
+            for text in _phrases(call, turns) + [env.farewell]:
+                with clock.measure("request"):
+                    client.post("/respond", data={"CallSid": call_sid, "SpeechResult": text})
+
+
+RUNNERS = {"profesor": run_profesor, "llamada": run_llamada, "server": run_server}
+
+
+def run_benchmark(entries, calls: int, turns: int, llm_latency: float, jitter: float, rate_429: float,
+                  asr_delay: float, tts_delay: float, playback_s_per_char: float, seed: int,
+                  real_sleeps: bool = False, verbose: bool = False, barge_in: bool = False,
+                  barge_in_after: Optional[float] = None, speech_s_per_char: float = 0.01,
+                  reaction_s: float = 0.2, tpm: Optional[float] = None, unique_replies: bool = False) -> dict:
+    random.seed(seed)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_tts_") as cache_dir, \
+            FakeGroqServer(latency=llm_latency, jitter=jitter, rate_429=rate_429, seed=seed,
+                           tpm=tpm, unique_replies=unique_replies) as fake:
+        prepare_environment(fake.base_url, cache_dir)
+        # Los scripts guardan referencias a los módulos al importarse: un solo entorno, reloj por entrada
+        env = FakeAudioEnvironment(StageClock(), asr_delay=asr_delay, tts_delay=tts_delay,
+                                   playback_s_per_char=playback_s_per_char, speech_s_per_char=speech_s_per_char,
+                                   reaction_s=reaction_s, barge_in_after=barge_in_after).install()
+        for entry in entries:
+            clock = StageClock()
+            env.clock = clock
+            requests_before = sum(fake.calls.values())
+            limited_before = fake.rate_limited
+            skip = contextlib.nullcontext() if real_sleeps else \
+                SleepSkipper(clock, {"profesor_llamada", "llamada_completa"})
+            output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            start = time.perf_counter()
+            with skip, output:
+                RUNNERS[entry](clock, env, calls, turns, barge_in=barge_in)
+            results[entry] = {
+                "wall_s": round(time.perf_counter() - start, 3),
+                "stages": clock.summary(),
+                "llm_requests": sum(fake.calls.values()) - requests_before,
+                "llm_rate_limited": fake.rate_limited - limited_before,
+            }
+    return {
+        "config": {
+            "calls": calls, "turns": turns, "llm_latency_s": llm_latency, "jitter_s": jitter,
+            "rate_429": rate_429, "asr_delay_s": asr_delay, "tts_delay_s": tts_delay,
+            "playback_s_per_char": playback_s_per_char, "seed": seed, "real_sleeps": real_sleeps,
+            "barge_in": barge_in, "barge_in_after_s": barge_in_after, "speech_s_per_char": speech_s_per_char,
+            "reaction_s": reaction_s, "tpm": tpm, "unique_replies": unique_replies,
+        },
+        "entries": results,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_delta_ms: float = 1.0) -> list:
+    """Etapas cuyo p50 empeoró más que la tolerancia respecto a una corrida anterior."""
+    regressions = []
+    for entry, data in result["entries"].items():
+        old_entry = baseline.get("entries", {}).get(entry)
+        if not old_entry:
+            continue
+        for stage, stats in data["stages"].items():
+            old = old_entry["stages"].get(stage)
+            if not old or stage == "sleep":
+                continue
+            new_ms, old_ms = stats["p50_ms"], old["p50_ms"]
+            if new_ms > old_ms * (1 + tolerance) and new_ms - old_ms > min_delta_ms:
+                regressions.append({"entry": entry, "stage": stage, "baseline_p50_ms": old_ms, "p50_ms": new_ms})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark por etapas de una llamada con Groq falso")
+    parser.add_argument("--entry", choices=ENTRIES + ["all"], default="all")
+    parser.add_argument("--calls", type=int, default=3, help="Llamadas completas por punto de entrada")
+    parser.add_argument("--turns", type=int, default=4, help="Preguntas del alumno antes de despedirse")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Segundos de respuesta del Groq falso")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variación aleatoria extra (0..jitter) del LLM")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fracción de peticiones con 429")
+    parser.add_argument("--asr-delay", type=float, default=0.0, help="Segundos simulados de reconocimiento")
+    parser.add_argument("--tts-delay", type=float, default=0.0, help="Segundos simulados de síntesis por frase")
+    parser.add_argument("--playback-per-char", type=float, default=0.0, help="Segundos de audio por carácter")
+    parser.add_argument("--speech-per-char", type=float, default=0.01, help="Segundos de voz del alumno por carácter")
+    parser.add_argument("--reaction", type=float, default=0.2, help="Segundos que tarda el alumno en contestar")
+    parser.add_argument("--barge-in-after", type=float, default=None,
+                        help="El alumno interrumpe cada audio de la profesora a los N segundos")
+    parser.add_argument("--barge-in", action="store_true", help="La profesora se calla cuando el alumno habla encima")
+    parser.add_argument("--tpm", type=float, default=None,
+                        help="Cuota de tokens por minuto del Groq falso (por defecto sin cuota)")
+    parser.add_argument("--unique-replies", action="store_true",
+                        help="Cada respuesta del Groq falso es distinta (la caché de voz no la tiene)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--real-sleeps", action="store_true", help="No saltar las pausas de ritmo/eco de los scripts")
+    parser.add_argument("--verbose", action="store_true", help="Muestra la salida de los scripts")
+    parser.add_argument("--out", help="Guarda el resultado JSON en este archivo")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento permitido del p50 (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    entries = ENTRIES if args.entry == "all" else [args.entry]
+    result = run_benchmark(entries, args.calls, args.turns, args.llm_latency, args.jitter, args.rate_429,
+                           args.asr_delay, args.tts_delay, args.playback_per_char, args.seed,
+                           real_sleeps=args.real_sleeps, verbose=args.verbose, barge_in=args.barge_in,
+                           barge_in_after=args.barge_in_after, speech_s_per_char=args.speech_per_char,
+                           reaction_s=args.reaction, tpm=args.tpm,
+                           unique_replies=args.unique_replies)
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            result["regressions"] = compare(result, json.load(f), args.tolerance)
+        exit_code = 1 if result["regressions"] else 0
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    sys.exit(exit_code)
@@ -0,0 +1,88 @@
+"""
+Medición de tiempos por etapa (reconocimiento, filtro, LLM, limpieza, TTS, reproducción).
+"""
+import functools
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set
+
+from load_test import percentile
+
+# Orden en que se reportan las etapas de una llamada
+STAGE_ORDER = ["recognition", "filter", "llm", "clean", "tts", "playback", "response", "turn", "overlap",
+               "request", "sleep", "call"]
+
+
+class StageClock:
+    """Acumula duraciones por etapa desde cualquier hilo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def wrap(self, stage: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def _timed(*args, **kwargs):
+            with self.measure(stage):
+                return fn(*args, **kwargs)
+        return _timed
+
+    def summary(self) -> dict:
+        def ms(v):
+            return round(v * 1000, 3) if v is not None else None
+
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+        stages = sorted(samples, key=lambda s: (STAGE_ORDER.index(s) if s in STAGE_ORDER else len(STAGE_ORDER), s))
+        return {
+            stage: {
+                "count": len(samples[stage]),
+                "total_s": round(sum(samples[stage]), 4),
+                "mean_ms": ms(sum(samples[stage]) / len(samples[stage])),
+                "p50_ms": ms(percentile(samples[stage], 50)),
+                "p95_ms": ms(percentile(samples[stage], 95)),
+                "max_ms": ms(max(samples[stage])),
+            }
+            for stage in stages
+        }
+
+
+class SleepSkipper:
+    """Reemplaza time.sleep: las pausas largas de los scripts (ritmo, eco, backoff) se
+    registran como etapa "sleep" sin esperar; las esperas cortas de sondeo sí se hacen."""
+
+    def __init__(self, clock: StageClock, modules: Set[str], min_seconds: float = 0.25):
+        self.clock = clock
+        self.modules = modules
+        self.min_seconds = min_seconds
+        self._real_sleep: Optional[Callable[[float], None]] = None
+
+    def _sleep(self, seconds: float):
+        caller = sys._getframe(1).f_globals.get("__name__")
+        if caller in self.modules and seconds >= self.min_seconds:
+            self.clock.record("sleep", seconds)
+            return
+        self._real_sleep(seconds)
+
+    def __enter__(self):
+        self._real_sleep = time.sleep
+        time.sleep = self._sleep
+        return self
+
+    def __exit__(self, *exc):
+        time.sleep = self._real_sleep
@@ -0,0 +1,146 @@
+"""
+Reporte de arranque en frío por punto de entrada, a partir de `python -X importtime`.
+
+Importa cada script en un intérprete nuevo (sin ejecutar la llamada) y reporta:
+- wall_ms: tiempo total del proceso (intérprete + imports)
+- import_ms: tiempo acumulado del import del script según -X importtime
+- heavy_loaded: backends pesados que se cargaron al importar (deberían ser pocos)
+- top_packages: paquetes que más tiempo propio consumieron
+
+    cd IA_fucionada
+    python -m bench.startup
+    python -m bench.startup --runs 7 --out startup.json
+    python -m bench.startup --baseline startup.json   # código 1 si algún arranque empeora
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from .run import ROOT, SRC_DIR
+
+# Punto de entrada -> (módulo, directorio desde el que se ejecuta normalmente)
+ENTRY_MODULES = {
+    "profesor": ("profesor_llamada", SRC_DIR),
+    "llamada": ("llamada_completa", ROOT),
+    "server": ("server", SRC_DIR),
+    "server_async": ("server_async", SRC_DIR),
+}
+
+HEAVY_PACKAGES = ["groq", "gtts", "requests", "pygame", "pyttsx3", "speech_recognition",
+                  "httpx", "flask", "quart", "vosk", "pywhispercpp", "numpy"]
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """Líneas "import time: self [us] | cumulative | name" -> dicts con tiempos en ms."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # encabezado
+        raw_name = parts[2].rstrip()
+        name = raw_name.strip()
+        rows.append({
+            "name": name,
+            "depth": (len(raw_name) - len(raw_name.lstrip(" ")) - 1) // 2,
+            "self_ms": int(parts[0]) / 1000,
+            "cumulative_ms": int(parts[1]) / 1000,
+        })
+    return rows
+
+
+def _run_once(code: str, cwd, importtime: bool) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(SRC_DIR), str(ROOT), env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=str(cwd), env=env, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, text=True, encoding="utf-8", errors="replace")
+    wall_ms = (time.perf_counter() - start) * 1000
+    return {"wall_ms": wall_ms, "returncode": proc.returncode, "stderr": proc.stderr}
+
+
+def measure_entry(module: str, cwd, runs: int, top: int) -> dict:
+    walls, imports = [], []
+    rows: List[dict] = []
+    for _ in range(runs):
+        result = _run_once(f"import {module}", cwd, importtime=True)
+        if result["returncode"] != 0:
+            error_lines = [l for l in result["stderr"].splitlines() if not l.startswith("import time:")]
+            return {"module": module, "error": error_lines[-1] if error_lines else "falló el import"}
+        rows = parse_importtime(result["stderr"])
+        own = next((r for r in reversed(rows) if r["name"] == module), None)
+        walls.append(result["wall_ms"])
+        imports.append(own["cumulative_ms"] if own else 0.0)
+
+    # Tiempo propio agregado por paquete raíz (de la última corrida)
+    by_package: Dict[str, float] = defaultdict(float)
+    for row in rows:
+        by_package[row["name"].split(".")[0]] += row["self_ms"]
+    loaded = {row["name"].split(".")[0] for row in rows}
+    return {
+        "module": module,
+        "wall_ms": round(statistics.median(walls), 1),
+        "import_ms": round(statistics.median(imports), 1),
+        "heavy_loaded": [p for p in HEAVY_PACKAGES if p in loaded],
+        "top_packages": {name: round(ms, 1) for name, ms in
+                         sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]},
+    }
+
+
+def startup_report(entries, runs: int = 5, top: int = 8) -> dict:
+    interpreter = statistics.median(_run_once("pass", ROOT, importtime=False)["wall_ms"] for _ in range(runs))
+    return {
+        "config": {"runs": runs, "python": sys.version.split()[0]},
+        "interpreter_ms": round(interpreter, 1),
+        "entries": {entry: measure_entry(*ENTRY_MODULES[entry], runs=runs, top=top) for entry in entries},
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_delta_ms: float = 20.0) -> list:
+    """Puntos de entrada cuyo import_ms empeoró más que la tolerancia."""
+    regressions = []
+    for entry, data in result["entries"].items():
+        old: Optional[dict] = baseline.get("entries", {}).get(entry)
+        if not old or "import_ms" not in old or "import_ms" not in data:
+            continue
+        new_ms, old_ms = data["import_ms"], old["import_ms"]
+        if new_ms > old_ms * (1 + tolerance) and new_ms - old_ms > min_delta_ms:
+            regressions.append({"entry": entry, "baseline_import_ms": old_ms, "import_ms": new_ms})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío por punto de entrada")
+    parser.add_argument("--entry", choices=list(ENTRY_MODULES) + ["all"], default="all")
+    parser.add_argument("--runs", type=int, default=5, help="Procesos nuevos por punto de entrada (se reporta la mediana)")
+    parser.add_argument("--top", type=int, default=8, help="Paquetes más lentos a mostrar")
+    parser.add_argument("--out", help="Guarda el resultado JSON en este archivo")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento permitido (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    entries = list(ENTRY_MODULES) if args.entry == "all" else [args.entry]
+    result = startup_report(entries, runs=args.runs, top=args.top)
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            result["regressions"] = compare(result, json.load(f), args.tolerance)
+        exit_code = 1 if result["regressions"] else 0
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
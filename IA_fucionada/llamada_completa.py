@@ -5,24 +5,59 @@ Sistema integrado que permite conversación en tiempo real entre ambas IAs.
 import os
 import sys
 import time
-import tempfile
+import contextlib
 import threading
 import random
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-# Importaciones comunes
-import pyttsx3
-import speech_recognition as sr
-from pygame import mixer
-from gtts import gTTS
-import requests
-
 # Cargar variables de entorno (busca .env en IA_Maestro)
 import pathlib
 base_dir = pathlib.Path(__file__).parent
 env_path = base_dir / "IA_Maestro" / ".env"
 load_dotenv(dotenv_path=env_path)
 
+# Módulos compartidos con la profesora (streaming de voz, etc.)
+sys.path.insert(0, str(base_dir / "IA_Maestro" / "src"))
+from history_manager import HistoryManager
+from streaming_tts import GTTSBackend, Pyttsx3Backend, StreamingSpeaker, iter_sse_deltas, split_sentences
+from tts_cache import default_cache, gtts_synth
+from lazy_import import BackgroundTask, lazy_import, preload
+from audio_input import AudioInput, MicrophoneSource
+from asr import NoSpeechError, SpeechRecognizer
+from tts_worker import Pyttsx3Worker
+from rate_limiter import GroqRateLimiter, estimate_request_tokens
+from llm_transport import LLMConnectionError, LLMTimeout, get_transport
+from topic_filter import TOPIC_KEYWORDS_PATH, ReloadingClassifier
+from turn_store import default_store
+
+# Backends pesados: se importan la primera vez que se usan (ver lazy_import.py)
+pyttsx3 = lazy_import("pyttsx3")
+mixer = lazy_import("pygame.mixer")
+gtts = lazy_import("gtts")
+httpx = lazy_import("httpx")
+
+# GROQ_BASE_URL permite apuntar a un servidor local (fake_groq / benchmarks)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/")
+GROQ_CHAT_URL = GROQ_BASE_URL + "/openai/v1/chat/completions"
+# Segundos para leer la respuesta de Groq; la conexión tiene su propio límite (LLM_CONNECT_TIMEOUT)
+GROQ_TIMEOUT = 10
+
+# Streaming: la voz empieza con la primera oración mientras se genera el resto (LLAMADA_STREAMING=0 lo desactiva)
+USAR_STREAMING = os.getenv("LLAMADA_STREAMING", "1") != "0"
+
+MODELO_GROQ = "llama-3.1-8b-instant"
+MAX_TOKENS_RESPUESTA = 150
+
+# Cuota de Groq compartida por todas las peticiones del proceso (ver rate_limiter.py)
+limitador = GroqRateLimiter()
+
+# Tema de cada turno (columna tema de turnos_conversacion), con las mismas listas que la profesora
+CLASIFICADOR_TEMAS = ReloadingClassifier(TOPIC_KEYWORDS_PATH)
+
+# Dúplex: si alguien habla encima de la voz, la voz se corta y su frase queda lista para escuchar()
+USAR_BARGE_IN = os.getenv("LLAMADA_BARGE_IN", "0") == "1"
+
 # Validaciones tempranas de archivos requeridos cuando se usa clave cifrada
 def validar_entorno_maestro():
     env_exists = env_path.exists()
@@ -46,44 +81,44 @@ def get_groq_api_key():
     api_key = os.getenv("GROQ_API_KEY_ENCRYPTED")
     if api_key:
         try:
-            base_dir = pathlib.Path(__file__).parent
-            crypto_helper_path = base_dir / "IA_Maestro" / "src" / "crypto_helper.py"
             cipher_key_path = base_dir / "IA_Maestro" / ".cipher_key"
-            if crypto_helper_path.exists() and cipher_key_path.exists():
-                # Carga dinámica para evitar errores de resolución de importación
-                import importlib.util
-                spec = importlib.util.spec_from_file_location("crypto_helper", str(crypto_helper_path))
-                crypto_helper = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(crypto_helper)
-                # Ejecutar descifrado dentro de IA_Maestro para que encuentre .cipher_key
-                original_dir = os.getcwd()
-                os.chdir(str(base_dir / "IA_Maestro"))
-                decrypted = crypto_helper.decrypt_api_key(api_key)
-                os.chdir(original_dir)
-                return decrypted
+            if cipher_key_path.exists():
+                # Ruta explícita a la clave: no hace falta cambiar de directorio
+                from crypto_helper import decrypt_api_key
+                return decrypt_api_key(api_key, key_path=cipher_key_path)
         except Exception as e:
             print(f"⚠️ Error descifrando GROQ_API_KEY_ENCRYPTED: {e}")
     return None
 
 
-GROQ_API_KEY = get_groq_api_key()
-if not GROQ_API_KEY:
-    env_ok, cipher_ok = validar_entorno_maestro()
-    print("❌ Error: Falta GROQ_API_KEY")
-    if env_ok:
-        print("ℹ️ Detecté IA_Maestro/.env, pero no se pudo obtener la clave.")
-        if not cipher_ok:
-            print("⚠️ Falta IA_Maestro/.cipher_key (necesario para descifrar la clave cifrada).")
+# Se resuelve al iniciar la llamada, no al importar el módulo
+GROQ_API_KEY = None
+
+
+def cargar_api_key():
+    """Obtiene la clave una sola vez; termina el programa con ayuda si no hay ninguna."""
+    global GROQ_API_KEY
+    if GROQ_API_KEY:
+        return GROQ_API_KEY
+    GROQ_API_KEY = get_groq_api_key()
+    if not GROQ_API_KEY:
+        env_ok, cipher_ok = validar_entorno_maestro()
+        print("❌ Error: Falta GROQ_API_KEY")
+        if env_ok:
+            print("ℹ️ Detecté IA_Maestro/.env, pero no se pudo obtener la clave.")
+            if not cipher_ok:
+                print("⚠️ Falta IA_Maestro/.cipher_key (necesario para descifrar la clave cifrada).")
+            else:
+                print("⚠️ No se pudo descifrar GROQ_API_KEY_ENCRYPTED. Verifica que el valor esté correcto y sin comillas.")
+            print("✔️ Alternativa: expón temporalmente la clave plana en esta sesión con:")
+            print("   $env:GROQ_API_KEY = \"TU_API_KEY_REAL\"")
         else:
-            print("⚠️ No se pudo descifrar GROQ_API_KEY_ENCRYPTED. Verifica que el valor esté correcto y sin comillas.")
-        print("✔️ Alternativa: expón temporalmente la clave plana en esta sesión con:")
-        print("   $env:GROQ_API_KEY = \"TU_API_KEY_REAL\"")
-    else:
-        print("ℹ️ No encontré IA_Maestro/.env. Puedes crearla o usar la clave plana temporal.")
-    sys.exit(1)
+            print("ℹ️ No encontré IA_Maestro/.env. Puedes crearla o usar la clave plana temporal.")
+        sys.exit(1)
 
-print(f"✅ API Key cargada: ...{GROQ_API_KEY[-8:]}")
-print(f"ℹ️  Usando modelo: llama-3.1-8b-instant\n")
+    print(f"✅ API Key cargada: ...{GROQ_API_KEY[-8:]}")
+    print(f"ℹ️  Usando modelo: {MODELO_GROQ}\n")
+    return GROQ_API_KEY
 
 
 PROMPT_PROFESORA = (
@@ -104,6 +139,32 @@ PROMPT_ALUMNO = (
     "A veces agradece o saluda de forma amigable. Responde en español."
 )
 
+# Saludos variados para el alumno
+SALUDOS_ALUMNO = [
+    "¡Buenos días profesora García! Tengo algunas dudas sobre la escuela.",
+    "Hola profe, ¿cómo está? Necesito su ayuda con unas tareas.",
+    "Buenos días profesora, disculpe que la moleste. Tengo unas preguntas.",
+    "¡Hola profesora García! Espero no interrumpir, tengo unas dudas.",
+    "Buenos días profe, ¿tiene un momento? Necesito preguntarle algo de la escuela.",
+]
+
+DESPEDIDA_PROFESORA = "¡Hasta luego Carlos! Cualquier duda que tengas, no dudes en llamarme."
+CIERRE_PROFESORA = "Bueno Carlos, creo que por hoy es suficiente. Si tienes más dudas mañana seguimos. ¡Hasta luego!"
+
+NOMBRE_PROFESORA = "👩‍🏫 Profe García"
+NOMBRE_ALUMNO = "🎓 Carlos"
+
+PALABRAS_DESPEDIDA_PROFESORA = ["adiós", "adios", "hasta luego", "nos vemos", "que te vaya bien",
+                                "hasta pronto", "me tengo que ir", "chao", "bye"]
+PALABRAS_DESPEDIDA_ALUMNO = ["adiós", "adios", "hasta luego", "gracias profesora",
+                             "me tengo que ir", "entendí todo", "ya entendí",
+                             "muchas gracias", "chao", "bye", "nos vemos"]
+
+
+def es_despedida(texto, palabras):
+    return any(palabra in texto.lower() for palabra in palabras)
+
+# Estas frases fijas se pueden sintetizar por adelantado: python IA_Maestro/src/tts_cache.py --prewarm
 PREGUNTAS_INICIALES = [
     # Matemáticas
     "Profe, ¿podría explicarme cómo se resuelven las fracciones?",
@@ -168,143 +229,194 @@ def clean_for_speech(text: str) -> str:
 class SistemaVoz:
     """Maneja síntesis y reconocimiento de voz"""
     
-    def __init__(self, use_fast=True):
-        self.use_fast = use_fast and pyttsx3 is not None
-        mixer.init()
+    def __init__(self, use_fast=True, barge_in=None):
+        self.use_fast = use_fast and pyttsx3.available()
+        self.barge_in = USAR_BARGE_IN if barge_in is None else barge_in
+        # Segundos que sonó la última frase (duracion_audio del turno guardado)
+        self.ultima_duracion = None
         
         if self.use_fast:
-            self.engine = pyttsx3.init()
-            try:
-                voices = self.engine.getProperty('voices')
-                # Buscar voces en español
-                self.voz_fem = None
-                self.voz_masc = None
-                
-                for v in voices:
-                    if 'spanish' in v.name.lower() or 'es' in v.id.lower():
-                        if 'female' in v.name.lower() or 'helena' in v.name.lower() or 'zira' in v.name.lower():
-                            self.voz_fem = v
-                        elif 'male' in v.name.lower() or 'pablo' in v.name.lower():
-                            self.voz_masc = v
-                
-                # Fallback si no hay voces específicas
-                if not self.voz_fem:
-                    self.voz_fem = voices[0] if len(voices) > 0 else None
-                if not self.voz_masc:
-                    self.voz_masc = voices[1] if len(voices) > 1 else voices[0] if len(voices) > 0 else None
-                
-                self.engine.setProperty('rate', 170)
-                self.engine.setProperty('volume', 0.9)
-            except Exception as e:
-                print(f"⚠️ Error configurando voces: {e}")
-                self.voz_fem = None
-                self.voz_masc = None
+            # Un solo motor pyttsx3 en su hilo; la voz de cada personaje se elige una vez
+            # (profesora: femenina, 150 wpm; alumno: masculina, 165 wpm; ver tts_worker.PERSONAS)
+            self.voz = Pyttsx3Worker().start()
         else:
-            self.tts_cache = {}
+            # Caché en disco: las frases fijas y repetidas no se vuelven a pedir a gTTS
+            self.tts_cache = default_cache()
+            # pygame mixer solo hace falta para reproducir los mp3 de gTTS
+            mixer.init()
         
-        # Reconocimiento
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
-        self.calibrar_microfono()
+        # Reconocimiento: el micrófono se abre la primera vez que alguien escucha. Con barge-in
+        # hace falta ya durante la voz, así que se abre en segundo plano mientras suena el saludo
+        self.recognizer = None
+        self.entrada = None
+        self.calibracion = None
+        if self.barge_in:
+            self.calibracion = BackgroundTask(self.calibrar_microfono, name="calibracion-microfono")
     
     def calibrar_microfono(self):
-        """Calibra el micrófono"""
+        """Abre el micrófono una sola vez; el umbral de ruido se sigue ajustando solo en segundo plano"""
         print("🎤 Calibrando micrófono...")
         try:
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=2)
-            print("✅ Micrófono listo\n")
+            # Backend de ASR_BACKEND (google, vosk, whisper) con un solo pool de hilos
+            self.recognizer = SpeechRecognizer()
+            self.recognizer.warm()
+            # La calibración sigue en el hilo de captura; la primera escucha espera solo si no terminó
+            self.entrada = AudioInput(MicrophoneSource(sample_rate=getattr(self.recognizer.backend, "SAMPLE_RATE", None)),
+                                      calibration_s=2.0, phrase_time_limit=15).start()
+            self.recognizer.attach(self.entrada)
+            print("✅ Micrófono abierto\n")
         except Exception as e:
+            self.entrada = None
             print(f"⚠️ Error calibrando: {e}\n")
+
+    def reproduciendo(self, detener):
+        """Marca la reproducción en el micrófono: el eco no cuenta como frase.
+        Con barge-in, la voz de alguien encima llama a detener() (ver audio_input.AudioInput.playback)"""
+        if self.entrada is None:
+            return contextlib.nullcontext()
+        return self.entrada.playback(on_barge_in=detener if self.barge_in else None)
     
     def hablar(self, texto, nombre=""):
         """Sintetiza voz con distinción por género"""
         print(f"{nombre}: {texto}")
         texto_limpio = clean_for_speech(texto)
+        self.ultima_duracion = None
         
         if self.use_fast:
             try:
-                # Seleccionar voz según el personaje
-                if "profesora" in nombre.lower() or "garcía" in nombre.lower() or "👩‍🏫" in nombre:
-                    if self.voz_fem:
-                        self.engine.setProperty('voice', self.voz_fem.id)
-                        self.engine.setProperty('rate', 150)
-                else:  # Alumno
-                    if self.voz_masc:
-                        self.engine.setProperty('voice', self.voz_masc.id)
-                        self.engine.setProperty('rate', 165)
-                
                 print(f"   🔊 Reproduciendo audio...")
-                self.engine.say(texto_limpio)
-                self.engine.runAndWait()
-                time.sleep(0.5)
+                inicio = time.perf_counter()
+                with self.reproduciendo(self.voz.cancel):
+                    self.voz.speak(texto_limpio, self.personaje(nombre))
+                self.ultima_duracion = time.perf_counter() - inicio
                 print(f"   ✅ Audio completado")
             except KeyboardInterrupt:
-                self.engine.stop()
+                self.voz.cancel()
                 raise
             except Exception as e:
                 print(f"   ⚠️ Error TTS: {e}")
         else:
             try:
-                # Usar gTTS con español (México para profesora, España para alumno)
-                if "profesora" in nombre.lower() or "garcía" in nombre.lower() or "👩‍🏫" in nombre:
-                    tts = gTTS(text=texto_limpio, lang='es', tld='com.mx', slow=False)
-                else:
-                    tts = gTTS(text=texto_limpio, lang='es', tld='es', slow=False)
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-                    tmp_path = tmp.name
-                tts.save(tmp_path)
+                audio_path = self.sintetizar_gtts(texto_limpio, nombre)
                 
                 print(f"   🔊 Reproduciendo audio con gTTS...")
-                mixer.music.load(tmp_path)
+                mixer.music.load(audio_path)
                 mixer.music.set_volume(1.0)
-                mixer.music.play()
-                while mixer.music.get_busy():
-                    time.sleep(0.1)
-                time.sleep(0.3)
+                inicio = time.perf_counter()
+                with self.reproduciendo(mixer.music.stop):
+                    mixer.music.play()
+                    while mixer.music.get_busy():
+                        time.sleep(0.05)
+                self.ultima_duracion = time.perf_counter() - inicio
                 print(f"   ✅ Audio completado")
-                
-                # Limpiar archivo temporal
-                try:
-                    os.remove(tmp_path)
-                except:
-                    pass
             except KeyboardInterrupt:
                 mixer.music.stop()
                 raise
             except Exception as e:
                 print(f"   ⚠️ Error TTS: {e}")
     
+    def sintetizar_gtts(self, texto_limpio, nombre):
+        """MP3 de gTTS en la caché: español de México para profesora, de España para alumno"""
+        tld = 'com.mx' if self.es_profesora(nombre) else 'es'
+        return self.tts_cache.get_or_create(
+            texto_limpio, gtts_synth(texto_limpio, tld=tld), lang='es', tld=tld, engine='gtts')
+
+    def backend_stream(self, nombre):
+        if self.use_fast:
+            return Pyttsx3Backend(self.voz, self.personaje(nombre))
+        # Misma regla que hablar(): México para profesora, España para alumno
+        return GTTSBackend(lang='es', tld='com.mx' if self.es_profesora(nombre) else 'es', volume=1.0,
+                           cache=self.tts_cache)
+
+    def preparar(self, texto, nombre="", por_oraciones=False, cancelado=None):
+        """Sintetiza el audio de `texto` en la caché sin reproducirlo; hablar() lo encuentra listo.
+        por_oraciones=True lo parte igual que hablar_stream(). Con pyttsx3 no hay nada que
+        preparar (sintetiza al hablar). Devuelve True si quedó todo sintetizado"""
+        if self.use_fast:
+            return False
+        if not por_oraciones:
+            self.sintetizar_gtts(clean_for_speech(texto), nombre)
+            return True
+        backend = self.backend_stream(nombre)
+        for oracion in split_sentences(texto):
+            if cancelado is not None and cancelado.is_set():
+                return False
+            limpia = clean_for_speech(oracion)
+            if limpia:
+                backend.synthesize(limpia)
+        return True
+
+    def es_profesora(self, nombre):
+        return "profesora" in nombre.lower() or "garcía" in nombre.lower() or "👩‍🏫" in nombre
+
+    def personaje(self, nombre):
+        return "profesora" if self.es_profesora(nombre) else "alumno"
+
+    def hablar_stream(self, tokens, nombre="", al_terminar=None):
+        """Habla una respuesta que llega en streaming, oración por oración. Devuelve el texto completo.
+        al_terminar(texto) se llama cuando ya llegó todo el texto, aunque todavía esté sonando"""
+        print(f"{nombre}: ", end="", flush=True)
+        speaker = StreamingSpeaker(self.backend_stream(nombre), clean=clean_for_speech)
+        with self.reproduciendo(speaker.interrupt):
+            try:
+                texto = speaker.speak_stream(tokens, on_token=lambda tok: print(tok, end="", flush=True),
+                                             on_text=al_terminar)
+            except Exception as e:
+                if not speaker.spoken:
+                    print()
+                    raise
+                # Lo que ya sonó no se puede retirar: queda como la respuesta del turno (sin repetirlo)
+                print(f"\n   ⚠️ Se cortó la respuesta ({type(e).__name__}: {e}); se conserva lo ya dicho", end="")
+                texto = " ".join(speaker.spoken)
+        print()
+        self.ultima_duracion = speaker.last_metrics.get("audio_s")
+        ttfa = speaker.last_metrics.get("first_audio_s")
+        if ttfa is not None:
+            print(f"   ⏱️ Primer audio en {ttfa:.2f}s ({speaker.last_metrics['sentences']} oraciones)")
+        if speaker.last_metrics.get("interrupted"):
+            print("   ✋ Interrumpida")
+        return texto
+
     def detener(self):
         """Detiene el motor de voz y limpia recursos"""
         try:
-            if self.use_fast and hasattr(self, 'engine'):
-                self.engine.stop()
-            mixer.music.stop()
-            mixer.quit()
+            if self.use_fast and hasattr(self, 'voz'):
+                self.voz.stop()
+            if mixer.loaded:
+                mixer.music.stop()
+                mixer.quit()
+            if self.entrada is not None:
+                self.entrada.stop()
+            if self.recognizer is not None:
+                self.recognizer.close()
         except Exception:
             pass
     
     def escuchar(self, quien_escucha=""):
         """Reconoce voz del micrófono"""
         print(f"\n🎤 {quien_escucha} escuchando...")
+        # Primera escucha: se abre y calibra el micrófono; si ya se está abriendo, se espera aquí
+        if self.calibracion is None:
+            self.calibracion = BackgroundTask(self.calibrar_microfono, name="calibracion-microfono")
+        self.calibracion.wait()
+        if self.entrada is None:
+            print("   ❌ Micrófono no disponible\n")
+            return ""
         
         try:
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                print("   🔊 Hable ahora...")
-                audio = self.recognizer.listen(source, timeout=8, phrase_time_limit=15)
+            # El micrófono ya está abierto y calibrado: sin medio segundo de calibración por turno
+            print("   🔊 Hable ahora...")
+            frase = self.entrada.listen(timeout=8)
+            if frase is None:
+                print("   ⏱️ Tiempo agotado, no se escuchó nada\n")
+                return ""
             
             print("   ⏳ Procesando...")
-            texto = self.recognizer.recognize_google(audio, language='es-ES')
+            texto = self.recognizer.transcribe(frase)
             print(f"   ✓ Captado: \"{texto}\"\n")
-            return texto.strip()
+            return texto
             
-        except sr.WaitTimeoutError:
-            print("   ⏱️ Tiempo agotado, no se escuchó nada\n")
-            return ""
-        except sr.UnknownValueError:
+        except NoSpeechError:
             print("   ❓ No se entendió, intente de nuevo\n")
             return ""
         except Exception as e:
@@ -316,49 +428,66 @@ class SistemaVoz:
 # FUNCIONES GROQ API
 # ============================================================================
 
-def llamar_groq(prompt_sistema, historial, temperatura=0.5, max_reintentos=3):
-    """Llama a Groq API con logging detallado y manejo de rate limit"""
+def _esperar_cuota(mensajes, avisar=True):
+    """Reserva la petición en la cuota de Groq; solo espera si de verdad no alcanza."""
+    esperado = limitador.acquire(estimate_request_tokens(mensajes, MAX_TOKENS_RESPUESTA))
+    if esperado > 0.05 and avisar:
+        print(f"   ⏳ Cuota de Groq: esperé {esperado:.1f}s")
+
+
+def _rate_limit(response, intento):
+    """429: el limitador pausa lo que diga retry-after (o backoff 1s, 2s, 4s si no lo dice)."""
+    limitador.update(response.headers)
+    if not response.headers.get("retry-after"):
+        limitador.pause(2 ** intento)
+    print(f"⚠️ Rate limit (429). Reintentando cuando haya cuota...")
+
+
+def llamar_groq(prompt_sistema, historial, temperatura=0.5, max_reintentos=3, avisar=True, cuota_reservada=False,
+                uso=None):
+    """Llama a Groq API con logging detallado y manejo de rate limit.
+    avisar=False no imprime el progreso (turnos adelantados en segundo plano);
+    cuota_reservada=True si el primer intento ya se reservó con limitador.try_acquire();
+    uso (dict) recibe total_tokens de la respuesta"""
     for intento in range(max_reintentos):
         try:
-            url = "https://api.groq.com/openai/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            mensajes = [{"role": "system", "content": prompt_sistema}] + historial
+            mensajes = [{"role": "system", "content": prompt_sistema}] + list(historial)
             
             data = {
                 "messages": mensajes,
-                "model": "llama-3.1-8b-instant",
+                "model": MODELO_GROQ,
                 "temperature": temperatura,
-                "max_tokens": 150
+                "max_tokens": MAX_TOKENS_RESPUESTA
             }
             
             if intento > 0:
                 print(f"   🔄 Reintento {intento + 1}/{max_reintentos}...")
-            else:
+            elif avisar:
                 print(f"   🔄 Llamando a Groq API (temp={temperatura})...")
             
-            response = requests.post(url, headers=headers, json=data, timeout=10)
+            if intento > 0 or not cuota_reservada:
+                _esperar_cuota(mensajes, avisar)
+            response = get_transport(GROQ_API_KEY, GROQ_BASE_URL).post_chat(data, read_timeout=GROQ_TIMEOUT)
             
             if response.status_code == 200:
+                limitador.update(response.headers)
                 result = response.json()
                 contenido = result['choices'][0]['message']['content'].strip()
-                print(f"   ✅ Respuesta recibida ({len(contenido)} chars)")
+                if uso is not None:
+                    uso["total_tokens"] = (result.get("usage") or {}).get("total_tokens")
+                if avisar:
+                    print(f"   ✅ Respuesta recibida ({len(contenido)} chars)")
                 return contenido
             elif response.status_code == 429:
-                wait_time = 2 ** intento  # Backoff exponencial: 1s, 2s, 4s
-                print(f"⚠️ Rate limit (429). Esperando {wait_time}s...")
-                time.sleep(wait_time)
+                _rate_limit(response, intento)
                 continue
             else:
                 print(f"❌ Error Groq HTTP {response.status_code}: {response.text[:200]}")
                 return None
-        except requests.exceptions.Timeout:
-            print(f"❌ Timeout: Groq API no respondió en 10 segundos")
+        except LLMTimeout:
+            print(f"❌ Timeout: Groq API no respondió en {GROQ_TIMEOUT} segundos")
             return None
-        except requests.exceptions.ConnectionError as e:
+        except LLMConnectionError as e:
             print(f"❌ Error de conexión: {e}")
             return None
         except KeyboardInterrupt:
@@ -372,6 +501,160 @@ def llamar_groq(prompt_sistema, historial, temperatura=0.5, max_reintentos=3):
     return None
 
 
+def llamar_groq_stream(prompt_sistema, historial, voz, nombre, temperatura=0.5, max_reintentos=3, al_terminar=None,
+                       uso=None):
+    """Como llamar_groq, pero con stream=True: habla cada oración en cuanto llega."""
+    for intento in range(max_reintentos):
+        try:
+            data = {
+                "messages": [{"role": "system", "content": prompt_sistema}] + list(historial),
+                "model": MODELO_GROQ,
+                "temperature": temperatura,
+                "max_tokens": MAX_TOKENS_RESPUESTA,
+                "stream": True,
+            }
+            if intento > 0:
+                print(f"   🔄 Reintento {intento + 1}/{max_reintentos}...")
+            else:
+                print(f"   🔄 Llamando a Groq API en streaming (temp={temperatura})...")
+
+            _esperar_cuota(data["messages"])
+            with get_transport(GROQ_API_KEY, GROQ_BASE_URL).stream_chat(data, read_timeout=GROQ_TIMEOUT) as response:
+                if response.status_code == 200:
+                    limitador.update(response.headers)
+                    contenido = voz.hablar_stream(iter_sse_deltas(response, uso), nombre, al_terminar=al_terminar)
+                    return contenido or None
+                elif response.status_code == 429:
+                    _rate_limit(response, intento)
+                    continue
+                else:
+                    response.read()
+                    print(f"❌ Error Groq HTTP {response.status_code}: {response.text[:200]}")
+                    return None
+        except LLMTimeout:
+            print(f"❌ Timeout: Groq API no respondió en {GROQ_TIMEOUT} segundos")
+            return None
+        except LLMConnectionError as e:
+            print(f"❌ Error de conexión: {e}")
+            return None
+        except KeyboardInterrupt:
+            print(f"\n⚠️ Llamada a API cancelada")
+            raise
+        except Exception as e:
+            print(f"❌ Error API inesperado: {type(e).__name__}: {e}")
+            return None
+
+    print(f"❌ Agotados {max_reintentos} reintentos")
+    return None
+
+
+class TurnScheduler:
+    """Canal de la conversación: prepara el turno siguiente mientras suena el actual.
+
+    Cada turno depende solo del texto anterior, así que en cuanto ese texto existe
+    un hilo de fondo pide la respuesta del que habla después y sintetiza su audio en
+    la caché de voz. El audio se sigue reproduciendo en el hilo principal, en orden;
+    al llegar su turno, hablar() lo encuentra listo. Solo se adelanta una petición si
+    la cuota de Groq alcanza sin esperar; si no, el turno se pide como antes, a su hora.
+    """
+
+    def __init__(self, limitador, voz):
+        self.limitador = limitador
+        self.voz = voz
+        # Un solo hilo para toda la llamada: a lo sumo un turno preparándose a la vez
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="turno-siguiente")
+        self._pendiente = None
+        self.stats = {"adelantados": 0, "sin_cuota": 0, "cancelados": 0, "audios": 0}
+
+    def adelantar(self, nombre, prompt_sistema, mensajes, temperatura):
+        """Pide ya la respuesta de `nombre` a `mensajes` (su historial con el texto nuevo al final) y la sintetiza."""
+        costo = estimate_request_tokens([{"role": "system", "content": prompt_sistema}] + mensajes,
+                                        MAX_TOKENS_RESPUESTA)
+        if not self.limitador.try_acquire(costo):
+            self.stats["sin_cuota"] += 1
+            return
+        uso = {}
+        self._encolar(nombre, uso, self._generar, prompt_sistema, mensajes, temperatura, uso)
+        self.stats["adelantados"] += 1
+
+    def preparar(self, nombre, texto):
+        """Sintetiza ya una frase fija que `nombre` dirá en el turno siguiente (se habla con hablar())."""
+        self._encolar(nombre, None, self._sintetizar, texto, False)
+
+    def _encolar(self, nombre, uso, trabajo, *args):
+        """uso: dict que `trabajo` llena con los tokens de Groq (None si no llama a Groq); lo entrega tomar()"""
+        self.cancelar()
+        cancelado = threading.Event()
+        self._pendiente = (nombre, self._pool.submit(trabajo, nombre, *args, cancelado=cancelado), cancelado, uso)
+
+    def _generar(self, nombre, prompt_sistema, mensajes, temperatura, uso, cancelado):
+        respuesta = llamar_groq(prompt_sistema, mensajes, temperatura, avisar=False, cuota_reservada=True, uso=uso)
+        if respuesta and not cancelado.is_set():
+            # Se habla con hablar_stream() en streaming: mismas oraciones, mismas entradas de caché
+            self._sintetizar(nombre, respuesta, USAR_STREAMING, cancelado=cancelado)
+        return respuesta
+
+    def _sintetizar(self, nombre, texto, por_oraciones, cancelado):
+        try:
+            if self.voz.preparar(texto, nombre, por_oraciones=por_oraciones, cancelado=cancelado):
+                self.stats["audios"] += 1
+        except Exception:
+            # Si falla aquí, hablar() vuelve a sintetizar a su hora
+            pass
+        return texto
+
+    def tomar(self, nombre, uso=None):
+        """Texto preparado para `nombre` (espera si aún se genera o sintetiza) o None para pedirlo ahora.
+        Si el texto vino de Groq, `uso` (dict) recibe sus tokens"""
+        pendiente, self._pendiente = self._pendiente, None
+        if pendiente is None:
+            return None
+        if pendiente[0] != nombre:
+            self._cancelar(pendiente)
+            return None
+        texto = pendiente[1].result()
+        if uso is not None and pendiente[3]:
+            uso.update(pendiente[3])
+        return texto
+
+    def cancelar(self):
+        """Descarta el turno preparado (despedida, fin de la llamada): no se sintetiza lo que falte."""
+        pendiente, self._pendiente = self._pendiente, None
+        if pendiente is not None:
+            self._cancelar(pendiente)
+
+    def _cancelar(self, pendiente):
+        _nombre, futuro, cancelado, _uso = pendiente
+        cancelado.set()
+        futuro.cancel()
+        self.stats["cancelados"] += 1
+
+    def cerrar(self):
+        self.cancelar()
+        self._pool.shutdown(wait=False)
+
+
+def generar_y_hablar(voz, prompt_sistema, historial, nombre, temperatura, adelantada=None, al_terminar=None,
+                     uso=None):
+    """Genera la respuesta del personaje y la dice en voz alta. Devuelve el texto o None.
+    adelantada: respuesta ya generada por TurnScheduler; al_terminar(texto) se llama
+    en cuanto se conoce el texto, antes de que termine de sonar; uso (dict) recibe los tokens"""
+    if adelantada:
+        if USAR_STREAMING:
+            return voz.hablar_stream(iter([adelantada]), nombre, al_terminar=al_terminar)
+        respuesta = adelantada
+    elif USAR_STREAMING:
+        return llamar_groq_stream(prompt_sistema, historial, voz, nombre, temperatura=temperatura,
+                                  al_terminar=al_terminar, uso=uso)
+    else:
+        respuesta = llamar_groq(prompt_sistema, historial, temperatura=temperatura, uso=uso)
+    if respuesta:
+        if al_terminar:
+            al_terminar(respuesta)
+        voz.hablar(respuesta, nombre)
+    return respuesta
+
+
 # ============================================================================
 # CONVERSACIÓN PRINCIPAL
 # ============================================================================
@@ -387,6 +670,10 @@ def iniciar_llamada_completa():
     print("⏹️ Presiona Ctrl+C para detener")
     print("=" * 70)
     
+    cargar_api_key()
+    # Mientras se espera el Enter, los backends de audio y HTTP se importan de fondo
+    preload(httpx, gtts, mixer)
+    
     try:
         input("\n▶️ Presiona Enter para iniciar la llamada (Ctrl+C para cancelar)...")
     except KeyboardInterrupt:
@@ -396,58 +683,87 @@ def iniciar_llamada_completa():
     # Sistema de voz compartido (use_fast=False para usar gTTS con voces españolas)
     voz = SistemaVoz(use_fast=False)
     
-    # Historiales separados
-    historial_profesora = []
-    historial_alumno = []
+    # Historiales separados, con presupuesto de tokens (los turnos viejos se resumen)
+    historial_profesora = HistoryManager(labels={"user": "Carlos", "assistant": "Profesora"})
+    historial_alumno = HistoryManager(labels={"user": "Profesora", "assistant": "Carlos"})
+    
+    # Sin pausas fijas entre turnos: mientras suena un turno, el siguiente ya se pide y se
+    # sintetiza de fondo; el limitador solo espera cuando la cuota de Groq no alcanza
+    turnos_llm = TurnScheduler(limitador, voz)
+    
+    # Turnos al esquema talkia (TALKIA_DB_URL): solo se encolan, un hilo aparte los guarda por lotes
+    turnos_db = default_store()
+    sesion_id = turnos_db.start_session(contexto_inicial="llamada_completa: Carlos (alumno) ↔ Profesora García")
+    
+    def guardar_turno(rol, texto, uso=None):
+        """Encola el turno con lo que sonó su audio; uso es el dict de tokens si el texto vino de Groq"""
+        turnos_db.add_turn(sesion_id, rol, texto, tema=CLASIFICADOR_TEMAS.topic(texto),
+                           duracion_audio=voz.ultima_duracion,
+                           modelo_ia_usado=MODELO_GROQ if uso is not None else None,
+                           tokenes_consumidos=(uso or {}).get("total_tokens"))
     
-    # Saludos variados para el alumno
-    saludos_alumno = [
-        "¡Buenos días profesora García! Tengo algunas dudas sobre la escuela.",
-        "Hola profe, ¿cómo está? Necesito su ayuda con unas tareas.",
-        "Buenos días profesora, disculpe que la moleste. Tengo unas preguntas.",
-        "¡Hola profesora García! Espero no interrumpir, tengo unas dudas.",
-        "Buenos días profe, ¿tiene un momento? Necesito preguntarle algo de la escuela.",
-    ]
+    def cerrar_sesion_db():
+        turnos_db.end_session(sesion_id)
+        # Lo que quede en la cola se escribe antes de salir
+        turnos_db.flush()
+    
+    def adelantar_profesora(texto):
+        turnos_llm.adelantar(NOMBRE_PROFESORA, PROMPT_PROFESORA,
+                             list(historial_profesora) + [{"role": "user", "content": texto}], 0.4)
+    
+    def adelantar_alumno(texto):
+        turnos_llm.adelantar(NOMBRE_ALUMNO, PROMPT_ALUMNO,
+                             list(historial_alumno) + [{"role": "user", "content": texto}], 0.6)
     
     # ===== SALUDO INICIAL DEL ALUMNO (ALEATORIO) =====
-    saludo = random.choice(saludos_alumno)
+    saludo = random.choice(SALUDOS_ALUMNO)
+    primera_pregunta = random.choice(PREGUNTAS_INICIALES)
     print("\n" + "="*70)
     print("🎓 ALUMNO INICIA LLAMADA")
     print("="*70)
-    voz.hablar(saludo, "🎓 Carlos")
+    adelantar_profesora(saludo)
+    voz.hablar(saludo, NOMBRE_ALUMNO)
+    guardar_turno("Alumno", saludo)
     
     historial_alumno.append({"role": "assistant", "content": saludo})
     historial_profesora.append({"role": "user", "content": saludo})
     
-    time.sleep(1)
-    
     # ===== RESPUESTA PROFESORA AL SALUDO =====
     print("\n" + "="*70)
     print("👩‍🏫 PROFESORA RESPONDE")
     print("="*70)
     
+    # Mientras la profesora saluda se sintetiza la primera pregunta del alumno
+    def al_terminar_saludo(texto):
+        turnos_llm.preparar(NOMBRE_ALUMNO, primera_pregunta)
+    
     # Primer intento de respuesta de la profesora con reintento
-    respuesta_profesora = llamar_groq(PROMPT_PROFESORA, historial_profesora, temperatura=0.4)
+    uso = {}
+    respuesta_profesora = generar_y_hablar(voz, PROMPT_PROFESORA, historial_profesora, NOMBRE_PROFESORA, 0.4,
+                                           adelantada=turnos_llm.tomar(NOMBRE_PROFESORA, uso),
+                                           al_terminar=al_terminar_saludo, uso=uso)
     if not respuesta_profesora:
-        time.sleep(0.8)
-        respuesta_profesora = llamar_groq(PROMPT_PROFESORA, historial_profesora, temperatura=0.4)
+        respuesta_profesora = generar_y_hablar(voz, PROMPT_PROFESORA, historial_profesora, NOMBRE_PROFESORA, 0.4,
+                                               al_terminar=al_terminar_saludo, uso=uso)
     if not respuesta_profesora:
         print("❌ La profesora no respondió en el saludo. Cancelando llamada.")
+        turnos_llm.cerrar()
+        cerrar_sesion_db()
         return
     
-    voz.hablar(respuesta_profesora, "👩‍🏫 Profe García")
     historial_profesora.append({"role": "assistant", "content": respuesta_profesora})
     historial_alumno.append({"role": "user", "content": respuesta_profesora})
-    
-    time.sleep(1.5)
+    guardar_turno("Profesora", respuesta_profesora, uso)
     
     # ===== PRIMERA PREGUNTA DEL ALUMNO =====
     print("\n" + "="*70)
     print("🎓 ALUMNO HACE PRIMERA PREGUNTA")
     print("="*70)
     
-    primera_pregunta = random.choice(PREGUNTAS_INICIALES)
-    voz.hablar(primera_pregunta, "🎓 Carlos")
+    turnos_llm.tomar(NOMBRE_ALUMNO)
+    adelantar_profesora(primera_pregunta)
+    voz.hablar(primera_pregunta, NOMBRE_ALUMNO)
+    guardar_turno("Alumno", primera_pregunta)
     
     historial_alumno.append({"role": "assistant", "content": primera_pregunta})
     historial_profesora.append({"role": "user", "content": primera_pregunta})
@@ -462,14 +778,21 @@ def iniciar_llamada_completa():
     try:
         while turnos < max_turnos:
             turnos += 1
-            time.sleep(2)  # Delay para evitar rate limit
             
             # --- PROFESORA RESPONDE ---
             print("\n" + "="*70)
             print(f"👩‍🏫 PROFESORA RESPONDE (Turno {turnos})")
             print("="*70)
             
-            respuesta_profesora = llamar_groq(PROMPT_PROFESORA, historial_profesora, temperatura=0.4, max_reintentos=3)
+            # Mientras la profesora habla ya se pide la respuesta del alumno (salvo si se despide)
+            def al_terminar_profesora(texto):
+                if not es_despedida(texto, PALABRAS_DESPEDIDA_PROFESORA):
+                    adelantar_alumno(texto)
+            
+            uso = {}
+            respuesta_profesora = generar_y_hablar(voz, PROMPT_PROFESORA, historial_profesora, NOMBRE_PROFESORA, 0.4,
+                                                   adelantada=turnos_llm.tomar(NOMBRE_PROFESORA, uso),
+                                                   al_terminar=al_terminar_profesora, uso=uso)
             if not respuesta_profesora:
                 fails_prof += 1
                 print("⚠️ No hubo respuesta de la profesora.")
@@ -477,31 +800,41 @@ def iniciar_llamada_completa():
                     print("❌ Múltiples fallos de respuesta de la profesora. Cancelando llamada.")
                     break
                 else:
-                    print("↻ Esperando antes de reintentar...")
-                    time.sleep(3)
+                    # Las esperas por cuota ya las hizo el limitador
+                    print("↻ Reintentando...")
                     continue
             else:
                 fails_prof = 0
             
-            voz.hablar(respuesta_profesora, "👩‍🏫 Profe García")
             historial_profesora.append({"role": "assistant", "content": respuesta_profesora})
             historial_alumno.append({"role": "user", "content": respuesta_profesora})
+            guardar_turno("Profesora", respuesta_profesora, uso)
             
-            # Detectar despedidas
-            palabras_despedida = ["adiós", "adios", "hasta luego", "nos vemos", "que te vaya bien", 
-                                  "hasta pronto", "me tengo que ir", "chao", "bye"]
-            if any(palabra in respuesta_profesora.lower() for palabra in palabras_despedida):
+            # Detectar despedidas (no queda turno siguiente: se descarta lo que se estuviera preparando)
+            if es_despedida(respuesta_profesora, PALABRAS_DESPEDIDA_PROFESORA):
                 print("\n✅ Profesora se despidió. Fin de llamada.")
+                turnos_llm.cancelar()
                 break
             
-            time.sleep(2)  # Delay para evitar rate limit
-            
             # --- ALUMNO RESPONDE/PREGUNTA ---
             print("\n" + "="*70)
             print(f"🎓 ALUMNO RESPONDE (Turno {turnos})")
             print("="*70)
             
-            respuesta_alumno = llamar_groq(PROMPT_ALUMNO, historial_alumno, temperatura=0.6, max_reintentos=3)
+            # Y mientras habla el alumno, la de la profesora; si se despide o es el último
+            # turno, la profesora dirá una frase fija y solo hace falta sintetizarla
+            def al_terminar_alumno(texto):
+                if es_despedida(texto, PALABRAS_DESPEDIDA_ALUMNO):
+                    turnos_llm.preparar(NOMBRE_PROFESORA, DESPEDIDA_PROFESORA)
+                elif turnos >= max_turnos:
+                    turnos_llm.preparar(NOMBRE_PROFESORA, CIERRE_PROFESORA)
+                else:
+                    adelantar_profesora(texto)
+            
+            uso = {}
+            respuesta_alumno = generar_y_hablar(voz, PROMPT_ALUMNO, historial_alumno, NOMBRE_ALUMNO, 0.6,
+                                                adelantada=turnos_llm.tomar(NOMBRE_ALUMNO, uso),
+                                                al_terminar=al_terminar_alumno, uso=uso)
             if not respuesta_alumno:
                 fails_alum += 1
                 print("⚠️ No hubo respuesta del alumno.")
@@ -509,51 +842,77 @@ def iniciar_llamada_completa():
                     print("❌ Múltiples fallos de respuesta del alumno. Cancelando llamada.")
                     break
                 else:
-                    print("↻ Esperando antes de reintentar...")
-                    time.sleep(3)
+                    print("↻ Reintentando...")
                     continue
             else:
                 fails_alum = 0
             
-            voz.hablar(respuesta_alumno, "🎓 Carlos")
             historial_alumno.append({"role": "assistant", "content": respuesta_alumno})
             historial_profesora.append({"role": "user", "content": respuesta_alumno})
+            guardar_turno("Alumno", respuesta_alumno, uso)
             
             # Detectar despedidas
-            palabras_despedida_alumno = ["adiós", "adios", "hasta luego", "gracias profesora", 
-                                         "me tengo que ir", "entendí todo", "ya entendí", 
-                                         "muchas gracias", "chao", "bye", "nos vemos"]
-            if any(palabra in respuesta_alumno.lower() for palabra in palabras_despedida_alumno):
+            if es_despedida(respuesta_alumno, PALABRAS_DESPEDIDA_ALUMNO):
                 print("\n✅ Alumno se despidió. Fin de llamada.")
                 
                 # La profesora responde la despedida
-                time.sleep(1.5)
                 print("\n" + "="*70)
                 print("👩‍🏫 PROFESORA SE DESPIDE")
                 print("="*70)
-                despedida_prof = "¡Hasta luego Carlos! Cualquier duda que tengas, no dudes en llamarme."
-                voz.hablar(despedida_prof, "👩‍🏫 Profe García")
+                turnos_llm.tomar(NOMBRE_PROFESORA)
+                voz.hablar(DESPEDIDA_PROFESORA, NOMBRE_PROFESORA)
+                guardar_turno("Profesora", DESPEDIDA_PROFESORA)
                 break
             
             # Límite de turnos alcanzado
             if turnos >= max_turnos:
                 print("\n⏰ Límite de turnos alcanzado. Finalizando llamada...")
-                time.sleep(1.5)
                 print("\n" + "="*70)
                 print("👩‍🏫 PROFESORA FINALIZA LLAMADA")
                 print("="*70)
-                cierre_prof = "Bueno Carlos, creo que por hoy es suficiente. Si tienes más dudas mañana seguimos. ¡Hasta luego!"
-                voz.hablar(cierre_prof, "👩‍🏫 Profe García")
+                turnos_llm.tomar(NOMBRE_PROFESORA)
+                voz.hablar(CIERRE_PROFESORA, NOMBRE_PROFESORA)
+                guardar_turno("Profesora", CIERRE_PROFESORA)
                 break
     
     except KeyboardInterrupt:
         print("\n\n⏹️ Llamada interrumpida por el usuario (Ctrl+C)")
+        turnos_llm.cerrar()
+        cerrar_sesion_db()
         voz.detener()
         return
     
+    turnos_llm.cerrar()
+    cerrar_sesion_db()
+    
     print("\n" + "="*70)
     print("📞 LLAMADA FINALIZADA")
     print("="*70)
+    print(f"🧮 Tokens de historial ahorrados en el último turno: "
+          f"profesora {historial_profesora.last_tokens_saved}, alumno {historial_alumno.last_tokens_saved}")
+    if voz.use_fast:
+        tts = voz.voz.stats()
+        print(f"🔊 Voz: {tts['spoken']} frases, espera en cola p95 {tts['queue_wait']['p95_ms']} ms, "
+              f"habla media {tts['speak']['mean_ms']} ms")
+    else:
+        cache = voz.tts_cache.stats()
+        print(f"🗂️ Caché de voz: {cache['hits']} aciertos, {cache['misses']} síntesis nuevas "
+              f"(tasa de acierto {cache['hit_rate']})")
+    cuota = limitador.stats()
+    canal = turnos_llm.stats
+    print(f"⏱️ Cuota Groq: {cuota['waits']} esperas ({cuota['waited_s']}s). Turnos adelantados: "
+          f"{canal['adelantados']} ({canal['sin_cuota']} sin cuota), {canal['audios']} audios "
+          f"sintetizados de antemano, {canal['cancelados']} cancelados")
+    red = get_transport(GROQ_API_KEY, GROQ_BASE_URL).stats()
+    print(f"🌐 Conexiones a Groq: {red['connections_new']} nuevas, {red['connections_reused']} reutilizadas "
+          f"en {red['requests']} peticiones (TLS medio {red['tls_handshake_ms_mean']} ms)")
+    if voz.entrada is not None:
+        mic = voz.entrada.stats()
+        print(f"🎤 Micrófono: {mic['echo_dropped']} ecos descartados, {mic['barge_ins']} interrupciones")
+    if turnos_db.enabled:
+        db = turnos_db.stats()
+        print(f"💾 Turnos guardados: {db['turns_written']} en {db['batches']} lotes (flush p95 "
+              f"{db['flush_ms']['p95']} ms, {db['backlog']} en cola, {db['dropped']} descartados)")
     voz.detener()
 
 
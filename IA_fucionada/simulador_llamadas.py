@@ -0,0 +1,247 @@
+"""
+SIMULADOR EN LOTE: miles de llamadas Alumno Carlos ↔ Profesora García, sin audio.
+
+Misma conversación que llamada_completa.py (saludo de SALUDOS_ALUMNO, primera
+pregunta de PREGUNTAS_INICIALES, hasta 6 turnos, despedidas y cierre), pero sin
+voz ni micrófono ni input(): muchas conversaciones a la vez con asyncio, un
+límite global de conversaciones en vuelo y el limitador de cuota de Groq.
+
+Cada conversación terminada se agrega como una línea al JSONL de salida. Si el
+proceso se interrumpe, volver a ejecutarlo con la misma salida retoma: las
+conversaciones ya guardadas con estado "ok" se omiten (la semilla de cada una
+depende de su número, así que el saludo y la pregunta inicial no cambian).
+
+    python simulador_llamadas.py --conversaciones 1000 --concurrencia 50 --salida transcripciones.jsonl
+    python simulador_llamadas.py --conversaciones 200 --fake-groq 0.3     # contra fake_groq local
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import aiohttp
+
+# llamada_completa agrega IA_Maestro/src al path (history_manager, rate_limiter, load_test...)
+import llamada_completa as llamada
+from history_manager import HistoryManager
+from load_test import percentile, start_fake_groq
+from rate_limiter import GROQ_LIMIT_RPM, GROQ_LIMIT_TPM, GroqRateLimiter, estimate_request_tokens
+
+MAX_TURNOS = 6
+MAX_REINTENTOS = 3
+
+
+class SimuladorLlamadas:
+    """Corre conversaciones sin audio contra la API de Groq (o fake_groq) y las guarda en JSONL."""
+
+    def __init__(self, url, api_key, limitador, concurrencia=20, seed=1234, timeout=30.0):
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self.limitador = limitador
+        self.concurrencia = concurrencia
+        self.seed = seed
+        self.timeout = timeout
+        self.latencias = []
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.rate_limited = 0
+
+    async def chat(self, session, prompt_sistema, historial, temperatura):
+        """Una respuesta de Groq (texto o None), respetando la cuota y los 429."""
+        mensajes = [{"role": "system", "content": prompt_sistema}] + list(historial)
+        data = {
+            "messages": mensajes,
+            "model": llamada.MODELO_GROQ,
+            "temperature": temperatura,
+            "max_tokens": llamada.MAX_TOKENS_RESPUESTA,
+        }
+        costo = estimate_request_tokens(mensajes, llamada.MAX_TOKENS_RESPUESTA)
+        for intento in range(MAX_REINTENTOS):
+            await self.limitador.acquire_async(costo)
+            inicio = time.perf_counter()
+            try:
+                async with session.post(self.url, json=data, headers=self.headers) as r:
+                    self.limitador.update(r.headers)
+                    if r.status == 429:
+                        self.rate_limited += 1
+                        if not r.headers.get("retry-after"):
+                            self.limitador.pause(2 ** intento)
+                        continue
+                    if r.status != 200:
+                        return None
+                    result = await r.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return None
+            self.latencias.append(time.perf_counter() - inicio)
+            uso = result.get("usage") or {}
+            self.tokens["prompt"] += uso.get("prompt_tokens", 0)
+            self.tokens["completion"] += uso.get("completion_tokens", 0)
+            return result["choices"][0]["message"]["content"].strip() or None
+        return None
+
+    async def conversacion(self, session, numero):
+        """Una llamada completa; devuelve el registro que va al JSONL."""
+        rnd = random.Random(f"{self.seed}-{numero}")
+        historial_profesora = HistoryManager(labels={"user": "Carlos", "assistant": "Profesora"})
+        historial_alumno = HistoryManager(labels={"user": "Profesora", "assistant": "Carlos"})
+        turnos = []
+        inicio = time.perf_counter()
+
+        def decir(quien, texto, fuente):
+            turnos.append({"rol": quien, "texto": texto, "fuente": fuente})
+            if quien == "alumno":
+                historial_alumno.append({"role": "assistant", "content": texto})
+                historial_profesora.append({"role": "user", "content": texto})
+            else:
+                historial_profesora.append({"role": "assistant", "content": texto})
+                historial_alumno.append({"role": "user", "content": texto})
+
+        async def responde(quien):
+            if quien == "profesora":
+                return await self.chat(session, llamada.PROMPT_PROFESORA, historial_profesora, 0.4)
+            return await self.chat(session, llamada.PROMPT_ALUMNO, historial_alumno, 0.6)
+
+        def registro(estado, fin):
+            return {"id": numero, "seed": self.seed, "estado": estado, "fin": fin,
+                    "duracion_s": round(time.perf_counter() - inicio, 3), "turnos": turnos}
+
+        decir("alumno", rnd.choice(llamada.SALUDOS_ALUMNO), "fijo")
+        saludo_profesora = await responde("profesora") or await responde("profesora")
+        if not saludo_profesora:
+            return registro("error", "sin_saludo_profesora")
+        decir("profesora", saludo_profesora, "llm")
+        decir("alumno", rnd.choice(llamada.PREGUNTAS_INICIALES), "fijo")
+
+        # Mismas reglas que el loop de iniciar_llamada_completa()
+        fallos = {"profesora": 0, "alumno": 0}
+        turno = 0
+        while turno < MAX_TURNOS:
+            turno += 1
+            respuesta = await responde("profesora")
+            if not respuesta:
+                fallos["profesora"] += 1
+                if fallos["profesora"] >= 2:
+                    return registro("error", "fallos_profesora")
+                continue
+            fallos["profesora"] = 0
+            decir("profesora", respuesta, "llm")
+            if llamada.es_despedida(respuesta, llamada.PALABRAS_DESPEDIDA_PROFESORA):
+                return registro("ok", "despedida_profesora")
+
+            respuesta = await responde("alumno")
+            if not respuesta:
+                fallos["alumno"] += 1
+                if fallos["alumno"] >= 2:
+                    return registro("error", "fallos_alumno")
+                continue
+            fallos["alumno"] = 0
+            decir("alumno", respuesta, "llm")
+            if llamada.es_despedida(respuesta, llamada.PALABRAS_DESPEDIDA_ALUMNO):
+                decir("profesora", llamada.DESPEDIDA_PROFESORA, "fijo")
+                return registro("ok", "despedida_alumno")
+            if turno >= MAX_TURNOS:
+                decir("profesora", llamada.CIERRE_PROFESORA, "fijo")
+                return registro("ok", "limite_turnos")
+        return registro("ok", "limite_turnos")
+
+    async def correr(self, pendientes, salida):
+        """Corre las conversaciones `pendientes` y agrega cada una a `salida` en cuanto termina."""
+        sem = asyncio.Semaphore(self.concurrencia)
+        resumen = {"ok": 0, "error": 0}
+        connector = aiohttp.TCPConnector(limit=self.concurrencia)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            async def una(numero):
+                async with sem:
+                    reg = await self.conversacion(session, numero)
+                salida.write(json.dumps(reg, ensure_ascii=False) + "\n")
+                salida.flush()
+                resumen[reg["estado"]] += 1
+
+            await asyncio.gather(*(una(n) for n in pendientes))
+        return resumen
+
+
+def completadas(path):
+    """Números de las conversaciones ya guardadas con estado "ok"; corta una última línea a medias."""
+    hechas = set()
+    if not os.path.exists(path):
+        return hechas
+    with open(path, "rb+") as f:
+        datos = f.read()
+        if datos and not datos.endswith(b"\n"):
+            # Interrumpido mientras se escribía: se descarta la línea incompleta
+            f.truncate(datos.rfind(b"\n") + 1)
+            datos = datos[:datos.rfind(b"\n") + 1]
+    for linea in datos.decode("utf-8").splitlines():
+        try:
+            reg = json.loads(linea)
+        except ValueError:
+            continue
+        if reg.get("estado") == "ok":
+            hechas.add(reg["id"])
+    return hechas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula llamadas alumno ↔ profesora en lote, sin audio")
+    parser.add_argument("--conversaciones", type=int, default=100)
+    parser.add_argument("--concurrencia", type=int, default=20, help="Conversaciones en vuelo a la vez")
+    parser.add_argument("--salida", default="transcripciones.jsonl", help="JSONL donde se agregan las transcripciones")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--rpm", type=float, default=None, help=f"Peticiones por minuto (por defecto {GROQ_LIMIT_RPM:g})")
+    parser.add_argument("--tpm", type=float, default=None, help=f"Tokens por minuto (por defecto {GROQ_LIMIT_TPM:g})")
+    parser.add_argument("--fake-groq", type=float, default=None, metavar="LATENCIA",
+                        help="Levanta fake_groq local con esta latencia (sin cuota ni clave)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    proc = None
+    if args.fake_groq is not None:
+        proc, base_url = start_fake_groq(args.fake_groq)
+        url = base_url + "/openai/v1/chat/completions"
+        api_key = "fake-key"
+        # El Groq falso no tiene cuota: sin límite salvo que se pida uno
+        limitador = GroqRateLimiter(args.rpm or 1e9, args.tpm or 1e12)
+    else:
+        url = llamada.GROQ_CHAT_URL
+        api_key = llamada.cargar_api_key()
+        limitador = GroqRateLimiter(args.rpm or GROQ_LIMIT_RPM, args.tpm or GROQ_LIMIT_TPM)
+
+    hechas = completadas(args.salida)
+    pendientes = [n for n in range(args.conversaciones) if n not in hechas]
+    print(f"📞 {len(pendientes)} conversaciones por simular ({len(hechas)} ya guardadas en {args.salida}), "
+          f"concurrencia {args.concurrencia}")
+
+    simulador = SimuladorLlamadas(url, api_key, limitador, args.concurrencia, args.seed, args.timeout)
+    inicio = time.perf_counter()
+    resumen = {"ok": 0, "error": 0}
+    try:
+        with open(args.salida, "a", encoding="utf-8") as salida:
+            resumen = asyncio.run(simulador.correr(pendientes, salida))
+    except KeyboardInterrupt:
+        print(f"\n⏹️ Interrumpido. Lo terminado ya está en {args.salida}; vuelve a ejecutar para continuar.")
+        sys.exit(130)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+    wall = time.perf_counter() - inicio
+
+    tokens = simulador.tokens["prompt"] + simulador.tokens["completion"]
+    cuota = limitador.stats()
+    p50 = percentile(simulador.latencias, 50)
+    p95 = percentile(simulador.latencias, 95)
+    print(f"✅ {resumen['ok']} conversaciones ok, {resumen['error']} con error en {wall:.1f}s")
+    if wall:
+        print(f"⏱️ {resumen['ok'] / wall * 60:.1f} conversaciones/min, {tokens / wall:.0f} tokens/s "
+              f"({simulador.tokens['completion'] / wall:.0f} generados/s)")
+    if p50 is not None:
+        print(f"🔄 {len(simulador.latencias)} peticiones a Groq: p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, "
+              f"{simulador.rate_limited} con 429, {cuota['waits']} esperas de cuota ({cuota['waited_s']}s)")
+
+
+if __name__ == "__main__":
+    main()
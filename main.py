@@ -1,9 +1,22 @@
+import json
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
 import web
 
+# Módulos de IA_Maestro (call_log, faq_index, turn_store): leen el esquema talkia de TALKIA_DB_URL
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "IA_fucionada", "IA_Maestro", "src"))
+
+from call_log import CallLog  # noqa: E402
+from faq_index import FAQ_TOP_N, FAQIndex  # noqa: E402
+
 urls = (
     "/", "Index",
     "/page_2", "Segundo",
     "/page_3", "Tercero",
+    "/page_3/buscar", "BuscarFAQ",
     "/page_4", "Cuarto",
     "/page_5", "Quinto"
 )
@@ -12,6 +25,17 @@ render = web.template.render("templates/")
 
 app = web.application(urls, globals())
 
+REGISTRO = CallLog()
+FILTROS = ("desde", "hasta", "tema", "alumno")
+# Preguntas de los alumnos; se pone al día con los turnos nuevos al abrir page_3 (como mucho cada FAQ_REFRESH_S)
+FAQ = FAQIndex()
+
+
+def enlace_registro(filtros, **extra):
+    """URL de page_2 con los filtros actuales y los parámetros extra que tengan valor."""
+    params = dict(filtros, **{k: v for k, v in extra.items() if v})
+    return "/page_2?" + urlencode(params) if params else "/page_2"
+
 class Index:
     def GET(self):
         return render.index_html()
@@ -19,12 +43,43 @@ class Index:
 
 class Segundo:
     def GET(self):
-        return render.page_2()
+        i = web.input(desde="", hasta="", tema="", alumno="", cursor="", sesion="", turno="")
+        filtros = {k: i[k].strip() for k in FILTROS if i[k].strip()}
+        if not REGISTRO.enabled:
+            return render.page_2(None, None, filtros, {})
+
+        pagina = REGISTRO.sessions(cursor=i.cursor, **filtros)
+        for s in pagina["sesiones"]:
+            s["enlace"] = enlace_registro(filtros, cursor=i.cursor, sesion=s["sesion_id"])
+        detalle = REGISTRO.turns(i.sesion, i.turno) if i.sesion else None
+        enlaces = {
+            "primera": enlace_registro(filtros) if i.cursor else "",
+            "siguiente": enlace_registro(filtros, cursor=pagina["siguiente"]) if pagina["siguiente"] else "",
+            "turnos_siguientes": enlace_registro(filtros, cursor=i.cursor, sesion=i.sesion,
+                                                 turno=detalle["siguiente"]) if detalle and detalle["siguiente"] else "",
+        }
+        return render.page_2(pagina, detalle, filtros, enlaces)
 
 
 class Tercero:
     def GET(self):
-        return render.page_3()
+        i = web.input(q="")
+        if not FAQ.enabled:
+            return render.page_3(None, i.q, None, {})
+        FAQ.refresh()
+        resultados = FAQ.search(i.q) if i.q.strip() else None
+        return render.page_3(FAQ.top(FAQ_TOP_N), i.q, resultados, FAQ.stats())
+
+
+class BuscarFAQ:
+    def GET(self):
+        i = web.input(q="")
+        inicio = time.perf_counter()
+        FAQ.refresh()
+        resultados = FAQ.search(i.q) if i.q.strip() else []
+        web.header("Content-Type", "application/json; charset=utf-8")
+        return json.dumps({"q": i.q, "resultados": resultados,
+                           "ms": round((time.perf_counter() - inicio) * 1000, 3)}, ensure_ascii=False)
 
 
 class Cuarto:
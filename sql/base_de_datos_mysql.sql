@@ -46,8 +46,16 @@ CREATE TABLE IF NOT EXISTS usuarios (
 -- 3) TABLA: turnos_conversacion
 -- ============================================================================
 
+-- Particionada por mes de fecha_turno: las consultas por rango de fechas y el
+-- job de resúmenes (IA_Maestro/src/turn_rollup.py) solo leen los meses que tocan,
+-- y un mes viejo se archiva o borra con DROP PARTITION en lugar de DELETE.
+-- MySQL exige que la columna de partición esté en la clave primaria y no admite
+-- claves foráneas en tablas particionadas: sesion_id y evaluaciones.turno_id
+-- los valida la aplicación (turn_store.py crea la sesión antes que sus turnos).
+-- turn_rollup.py agrega los meses siguientes antes de que se llenen en pmax.
+
 CREATE TABLE IF NOT EXISTS turnos_conversacion (
-    turno_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    turno_id BIGINT NOT NULL AUTO_INCREMENT,
     sesion_id CHAR(36) NOT NULL,
 
     rol_emisor VARCHAR(50) NOT NULL,
@@ -59,10 +67,38 @@ CREATE TABLE IF NOT EXISTS turnos_conversacion (
     tokenes_consumidos INT NULL,
     fecha_turno TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
 
-    CONSTRAINT fk_turnos_sesion FOREIGN KEY (sesion_id)
-        REFERENCES sesiones_llamada(sesion_id)
+    PRIMARY KEY (turno_id, fecha_turno)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(fecha_turno)) (
+    PARTITION p_anteriores VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+    PARTITION p2026_01 VALUES LESS THAN (UNIX_TIMESTAMP('2026-02-01 00:00:00')),
+    PARTITION p2026_02 VALUES LESS THAN (UNIX_TIMESTAMP('2026-03-01 00:00:00')),
+    PARTITION p2026_03 VALUES LESS THAN (UNIX_TIMESTAMP('2026-04-01 00:00:00')),
+    PARTITION p2026_04 VALUES LESS THAN (UNIX_TIMESTAMP('2026-05-01 00:00:00')),
+    PARTITION p2026_05 VALUES LESS THAN (UNIX_TIMESTAMP('2026-06-01 00:00:00')),
+    PARTITION p2026_06 VALUES LESS THAN (UNIX_TIMESTAMP('2026-07-01 00:00:00')),
+    PARTITION p2026_07 VALUES LESS THAN (UNIX_TIMESTAMP('2026-08-01 00:00:00')),
+    PARTITION p2026_08 VALUES LESS THAN (UNIX_TIMESTAMP('2026-09-01 00:00:00')),
+    PARTITION p2026_09 VALUES LESS THAN (UNIX_TIMESTAMP('2026-10-01 00:00:00')),
+    PARTITION p2026_10 VALUES LESS THAN (UNIX_TIMESTAMP('2026-11-01 00:00:00')),
+    PARTITION p2026_11 VALUES LESS THAN (UNIX_TIMESTAMP('2026-12-01 00:00:00')),
+    PARTITION p2026_12 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
 );
 
+-- Bases creadas con la versión anterior (tabla sin particionar), una sola vez:
+/*
+ALTER TABLE evaluaciones DROP FOREIGN KEY fk_evaluaciones_turnos;
+ALTER TABLE turnos_conversacion DROP FOREIGN KEY fk_turnos_sesion;
+ALTER TABLE turnos_conversacion DROP PRIMARY KEY, ADD PRIMARY KEY (turno_id, fecha_turno);
+ALTER TABLE turnos_conversacion PARTITION BY RANGE (UNIX_TIMESTAMP(fecha_turno)) (
+    PARTITION p_anteriores VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+    PARTITION p2026_01 VALUES LESS THAN (UNIX_TIMESTAMP('2026-02-01 00:00:00')),
+    -- ... un mes por partición, como arriba ...
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+*/
+
 -- ============================================================================
 -- 4) TABLA: evaluaciones
 -- ============================================================================
@@ -73,10 +109,9 @@ CREATE TABLE IF NOT EXISTS evaluaciones (
     evaluador VARCHAR(100) NULL,
     puntuacion INT NULL,
     comentario LONGTEXT NULL,
-    fecha_evaluacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    fecha_evaluacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 
-    CONSTRAINT fk_evaluaciones_turnos FOREIGN KEY (turno_id)
-        REFERENCES turnos_conversacion(turno_id)
+    -- Sin clave foránea hacia turnos_conversacion: la tabla está particionada
 );
 
 -- ============================================================================
@@ -89,8 +124,27 @@ CREATE INDEX ix_turnos_sesion_id
 CREATE INDEX ix_turnos_fecha_turno 
     ON turnos_conversacion (fecha_turno);
 
+-- Un alumno por external_id: permite INSERT IGNORE y búsqueda por índice
+CREATE UNIQUE INDEX ux_alumnos_external_id
+    ON alumnos (external_id);
+
+CREATE INDEX ix_evaluaciones_turno_id
+    ON evaluaciones (turno_id);
+
+CREATE INDEX ix_evaluaciones_fecha_evaluacion
+    ON evaluaciones (fecha_evaluacion);
+
+-- Registro de llamadas (page_2 de main.py): paginación por cursor de la más
+-- reciente a la más antigua, por alumno o por fecha. InnoDB agrega sesion_id
+-- (la clave primaria) al final de cada índice, que es el desempate del cursor.
+CREATE INDEX ix_sesiones_alumno_iniciada
+    ON sesiones_llamada (alumno_id, iniciada_en);
+
+CREATE INDEX ix_sesiones_iniciada_en
+    ON sesiones_llamada (iniciada_en);
+
 -- ============================================================================
--- 6) PROCEDIMIENTO almacenado
+-- 6) PROCEDIMIENTOS almacenados
 -- ============================================================================
 
 DELIMITER $$
@@ -102,11 +156,9 @@ CREATE PROCEDURE sp_insertar_turno(
     IN p_tema VARCHAR(100)
 )
 BEGIN
-    -- Crear sesión si no existe
-    IF NOT EXISTS (SELECT 1 FROM sesiones_llamada WHERE sesion_id = p_sesion_id) THEN
-        INSERT INTO sesiones_llamada (sesion_id)
-        VALUES (p_sesion_id);
-    END IF;
+    -- Crear sesión si no existe (por la PRIMARY KEY, sin consulta previa)
+    INSERT IGNORE INTO sesiones_llamada (sesion_id)
+    VALUES (p_sesion_id);
 
     -- Insertar turno
     INSERT INTO turnos_conversacion(
@@ -118,8 +170,105 @@ BEGIN
     SELECT LAST_INSERT_ID() AS turno_id;
 END $$
 
+-- Carga por lotes: un arreglo JSON de turnos por llamada, con sentencias de
+-- conjunto en lugar de una llamada a sp_insertar_turno por fila.
+-- Cada elemento: sesion_id, rol_emisor, transcripcion y, opcionales, tema,
+-- duracion_audio, modelo_ia_usado, tokenes_consumidos, fecha_turno y
+-- alumno_external_id (el alumno se crea si no existe).
+CREATE PROCEDURE sp_insertar_turnos_lote(
+    IN p_turnos JSON
+)
+BEGIN
+    DROP TEMPORARY TABLE IF EXISTS tmp_turnos_lote;
+    CREATE TEMPORARY TABLE tmp_turnos_lote AS
+    SELECT t.*
+    FROM JSON_TABLE(p_turnos, '$[*]' COLUMNS (
+        fila FOR ORDINALITY,
+        sesion_id CHAR(36) PATH '$.sesion_id',
+        rol_emisor VARCHAR(50) PATH '$.rol_emisor',
+        transcripcion LONGTEXT PATH '$.transcripcion',
+        tema VARCHAR(100) PATH '$.tema',
+        duracion_audio DOUBLE PATH '$.duracion_audio',
+        modelo_ia_usado VARCHAR(100) PATH '$.modelo_ia_usado',
+        tokenes_consumidos INT PATH '$.tokenes_consumidos',
+        fecha_turno DATETIME PATH '$.fecha_turno',
+        alumno_external_id VARCHAR(100) PATH '$.alumno_external_id'
+    )) AS t;
+
+    START TRANSACTION;
+
+    -- Alumnos nuevos, todos en una sentencia (ux_alumnos_external_id)
+    INSERT IGNORE INTO alumnos (external_id)
+    SELECT DISTINCT alumno_external_id
+    FROM tmp_turnos_lote
+    WHERE alumno_external_id IS NOT NULL;
+
+    -- Sesiones nuevas; a las existentes solo se les completa el alumno
+    INSERT INTO sesiones_llamada (sesion_id, alumno_id, iniciada_en)
+    SELECT l.sesion_id, MAX(a.alumno_id), MIN(COALESCE(l.fecha_turno, CURRENT_TIMESTAMP))
+    FROM tmp_turnos_lote l
+    LEFT JOIN alumnos a ON a.external_id = l.alumno_external_id
+    GROUP BY l.sesion_id
+    ON DUPLICATE KEY UPDATE
+        alumno_id = COALESCE(sesiones_llamada.alumno_id, VALUES(alumno_id));
+
+    INSERT INTO turnos_conversacion (
+        sesion_id, rol_emisor, transcripcion, tema, duracion_audio,
+        modelo_ia_usado, tokenes_consumidos, fecha_turno
+    )
+    SELECT sesion_id, rol_emisor, transcripcion, tema, duracion_audio,
+           modelo_ia_usado, tokenes_consumidos, COALESCE(fecha_turno, CURRENT_TIMESTAMP)
+    FROM tmp_turnos_lote
+    ORDER BY fila;
+
+    SELECT ROW_COUNT() AS turnos_insertados;
+    COMMIT;
+
+    DROP TEMPORARY TABLE tmp_turnos_lote;
+END $$
+
 DELIMITER ;
 
+-- ============================================================================
+-- 7) RESÚMENES para tableros
+-- ============================================================================
+-- Los mantiene IA_Maestro/src/turn_rollup.py: en cada corrida recalcula solo los
+-- días con turnos o evaluaciones nuevos desde su marca (resumen_marcas), así que
+-- solo lee las particiones de esos días. Los tableros leen estas tablas en lugar
+-- de recorrer turnos_conversacion. tema y modelo_ia_usado NULL se guardan como ''.
+
+CREATE TABLE IF NOT EXISTS resumen_turnos_diario (
+    dia DATE NOT NULL,
+    tema VARCHAR(100) NOT NULL DEFAULT '',
+    modelo_ia_usado VARCHAR(100) NOT NULL DEFAULT '',
+    turnos INT NOT NULL,
+    turnos_alumno INT NOT NULL,
+    tokens BIGINT NOT NULL,
+    turnos_con_tokens INT NOT NULL,
+    duracion_audio DOUBLE NOT NULL,
+
+    PRIMARY KEY (dia, tema, modelo_ia_usado)
+);
+
+-- Puntuaciones por maestro (maestro_id de la sesión del turno evaluado; 0 = sin maestro)
+CREATE TABLE IF NOT EXISTS resumen_evaluaciones_diario (
+    dia DATE NOT NULL,
+    maestro_id INT NOT NULL DEFAULT 0,
+    evaluaciones INT NOT NULL,
+    evaluaciones_con_puntuacion INT NOT NULL,
+    puntuacion_total BIGINT NOT NULL,
+
+    PRIMARY KEY (dia, maestro_id)
+);
+
+-- Hasta qué turno_id / evaluacion_id llegó cada resumen
+CREATE TABLE IF NOT EXISTS resumen_marcas (
+    resumen VARCHAR(50) NOT NULL PRIMARY KEY,
+    ultimo_id BIGINT NOT NULL,
+    ultimo_dia DATE NULL,
+    actualizado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
 -- ============================================================================
 -- EJEMPLO DE USO (MySQL)
 -- ============================================================================
@@ -139,4 +288,19 @@ CALL sp_insertar_turno(
     'Claro, una fracción es una parte de un todo.',
     NULL
 );
+
+CALL sp_insertar_turnos_lote('[
+    {"sesion_id": "6f1c2d3e-0000-4000-8000-000000000001", "rol_emisor": "Alumno",
+     "transcripcion": "¿Cuándo es el examen de historia?", "tema": "examen",
+     "alumno_external_id": "alumno-17"},
+    {"sesion_id": "6f1c2d3e-0000-4000-8000-000000000001", "rol_emisor": "Profesora",
+     "transcripcion": "El viernes, repasa los capítulos 3 y 4.", "tema": "examen",
+     "modelo_ia_usado": "llama-3.1-8b-instant", "tokenes_consumidos": 42}
+]');
+
+-- Tablero: tokens promedio por modelo en el último mes, desde el resumen
+SELECT modelo_ia_usado, SUM(tokens) / NULLIF(SUM(turnos_con_tokens), 0) AS tokens_promedio
+FROM resumen_turnos_diario
+WHERE dia >= CURRENT_DATE - INTERVAL 30 DAY AND modelo_ia_usado <> ''
+GROUP BY modelo_ia_usado;
 */
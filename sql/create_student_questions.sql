@@ -102,6 +102,14 @@ BEGIN
 END
 GO
 
+-- Un alumno por ExternalStudentId: la búsqueda de sp_InsertQuestion y de la carga por lotes usa este índice
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_Students_ExternalStudentId' AND object_id = OBJECT_ID('dbo.Students'))
+BEGIN
+    CREATE UNIQUE NONCLUSTERED INDEX UX_Students_ExternalStudentId ON dbo.Students(ExternalStudentId)
+        WHERE ExternalStudentId IS NOT NULL;
+END
+GO
+
 -- 8) (Opcional) Full-Text Search para contenido en QuestionText
 -- Nota: la búsqueda full-text requiere que el servicio de Full-Text esté instalado y que el usuario tenga permisos apropiados.
 -- Si desea habilitarla, ejecute los siguientes comandos (descomentar si procede):
@@ -174,7 +182,73 @@ BEGIN
 END
 GO
 
--- 10) Ejemplo de uso (INSERT simple)
+-- 10) Carga por lotes: muchas preguntas en una llamada, con sentencias de conjunto
+-- (alumnos y sesiones que falten se crean de una vez, sin consulta por fila)
+IF OBJECT_ID('dbo.sp_InsertQuestionsBulk','P') IS NOT NULL
+    DROP PROCEDURE dbo.sp_InsertQuestionsBulk;
+GO
+
+IF TYPE_ID(N'dbo.QuestionBatch') IS NULL
+BEGIN
+    CREATE TYPE dbo.QuestionBatch AS TABLE (
+        RowNum INT NOT NULL PRIMARY KEY,
+        SessionId UNIQUEIDENTIFIER NULL,
+        ExternalStudentId NVARCHAR(100) NULL,
+        QuestionText NVARCHAR(MAX) NOT NULL,
+        QuestionNormalized NVARCHAR(1000) NULL,
+        QuestionLanguage NVARCHAR(10) NULL,
+        IsSchoolRelated BIT NULL,
+        Metadata NVARCHAR(MAX) NULL,
+        ReceivedBy NVARCHAR(100) NULL,
+        CreatedAt DATETIMEOFFSET(7) NULL
+    );
+END
+GO
+
+CREATE PROCEDURE dbo.sp_InsertQuestionsBulk
+    @Questions dbo.QuestionBatch READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+    DECLARE @Now DATETIMEOFFSET(7) = SYSUTCDATETIME();
+
+    BEGIN TRANSACTION;
+
+    -- Alumnos nuevos, todos en una sentencia
+    INSERT INTO dbo.Students(ExternalStudentId, CreatedAt)
+    SELECT DISTINCT q.ExternalStudentId, @Now
+    FROM @Questions q
+    WHERE q.ExternalStudentId IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM dbo.Students s WITH (UPDLOCK, HOLDLOCK)
+                      WHERE s.ExternalStudentId = q.ExternalStudentId);
+
+    -- Sesiones nuevas (empiezan con su primera pregunta del lote)
+    INSERT INTO dbo.Sessions(SessionId, StudentId, StartedAt)
+    SELECT q.SessionId, MAX(s.StudentId), MIN(COALESCE(q.CreatedAt, @Now))
+    FROM @Questions q
+    LEFT JOIN dbo.Students s ON s.ExternalStudentId = q.ExternalStudentId
+    WHERE q.SessionId IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM dbo.Sessions x WITH (UPDLOCK, HOLDLOCK)
+                      WHERE x.SessionId = q.SessionId)
+    GROUP BY q.SessionId;
+
+    -- Preguntas
+    INSERT INTO dbo.Questions(SessionId, StudentId, QuestionText, QuestionNormalized, QuestionLanguage,
+                              IsSchoolRelated, Metadata, ReceivedBy, CreatedAt)
+    SELECT q.SessionId, s.StudentId, q.QuestionText, q.QuestionNormalized, COALESCE(q.QuestionLanguage, 'es'),
+           COALESCE(q.IsSchoolRelated, 1), q.Metadata, q.ReceivedBy, COALESCE(q.CreatedAt, @Now)
+    FROM @Questions q
+    LEFT JOIN dbo.Students s ON s.ExternalStudentId = q.ExternalStudentId
+    ORDER BY q.RowNum;
+
+    SELECT @@ROWCOUNT AS QuestionsInserted;
+
+    COMMIT TRANSACTION;
+END
+GO
+
+-- 11) Ejemplo de uso (INSERT simple)
 -- Ejemplo 1: Insertar pregunta sin estudiante conocido
 -- EXEC dbo.sp_InsertQuestion @QuestionText = N'¿Cómo se calcula el área de un triángulo?', @ReceivedBy = N'alumno_escolar.py';
 
@@ -186,4 +260,11 @@ GO
 -- INSERT INTO @qid EXEC dbo.sp_InsertQuestion @QuestionText = N'¿Qué son los números primos?';
 -- SELECT * FROM @qid;
 
+-- Ejemplo 4: Carga por lotes
+-- DECLARE @lote dbo.QuestionBatch;
+-- INSERT INTO @lote(RowNum, SessionId, ExternalStudentId, QuestionText, ReceivedBy) VALUES
+--     (1, NEWID(), N'user123', N'¿Qué es la fotosíntesis?', N'importacion'),
+--     (2, NEWID(), N'user456', N'¿Cuándo es el examen de historia?', N'importacion');
+-- EXEC dbo.sp_InsertQuestionsBulk @Questions = @lote;
+
 -- FIN DEL SCRIPT